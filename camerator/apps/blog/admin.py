@@ -1,10 +1,12 @@
 from django.contrib import admin
 
 from apps.blog.models import Comment, CommentReply, Gallery, Post, PostCategory
+from utils.mixins.admin import BatchDeletionAdminMixin
+from utils.page_cache import page_cache
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BatchDeletionAdminMixin, admin.ModelAdmin):
     list_display = (
         "title",
         "author",
@@ -38,6 +40,8 @@ class CommentAdmin(admin.ModelAdmin):
 
     def approve_comments(self, request, queryset):
         queryset.update(active=True)
+        # update() sends no post_save.
+        page_cache.invalidate(Comment)
 
 
 @admin.register(CommentReply)
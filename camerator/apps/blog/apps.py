@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.blog"
+
+    def ready(self):
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+
+        from apps.blog.models import Comment, CommentReply, Post, PostCategory
+        from utils.page_cache import page_cache
+
+        for model in (Post, PostCategory, Comment, CommentReply):
+            post_save.connect(page_cache.invalidate_sender, sender=model)
+            post_delete.connect(page_cache.invalidate_sender, sender=model)
+        m2m_changed.connect(
+            page_cache.invalidate_relation, sender=Post.category.through
+        )
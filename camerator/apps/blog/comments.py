@@ -0,0 +1,44 @@
+"""
+Comment threads of the post detail page. Active comments are read a page at a time from a ``(created_date, id)``
+cursor instead of an offset, so the last page of a long thread costs as much as the first, and the replies of a page
+are loaded in one extra query.
+"""
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+
+from apps.blog.models import Comment, CommentReply, Post
+from utils.pagination import KeysetPage, KeysetPaginator
+
+
+def load_comment_thread(
+    post: Post, cursor: str | None = None, page_size: int | None = None
+) -> KeysetPage:
+    """The active comments of ``post`` after ``cursor`` with their replies, oldest first."""
+    page_size = page_size or settings.COMMENT_THREAD_PAGE_SIZE
+    queryset = Comment.objects.filter(post=post, active=True).only(
+        "id", "post_id", "name", "body", "created_date"
+    )
+    page = KeysetPaginator(queryset, ("created_date", "id"), page_size).page(cursor)
+    prefetch_related_objects(
+        page.object_list,
+        Prefetch(
+            "replies",
+            queryset=CommentReply.objects.only(
+                "id", "comment_id", "body", "created_date"
+            ).order_by("created_date", "id"),
+        ),
+    )
+    return page
+
+
+def serialize_comment(comment: Comment) -> dict:
+    return {
+        "id": comment.id,
+        "name": comment.name,
+        "body": comment.body,
+        "created_date": comment.created_date,
+        "replies": [
+            {"id": reply.id, "body": reply.body, "created_date": reply.created_date}
+            for reply in comment.replies.all()
+        ],
+    }
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 10:17
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently, without locking the comments against writes.
+    atomic = False
+
+    dependencies = [
+        ("blog", "0001_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="comment",
+            index=models.Index(
+                fields=["post", "active", "created_date", "id"],
+                name="comment_thread_idx",
+            ),
+        ),
+    ]
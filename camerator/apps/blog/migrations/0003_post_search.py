@@ -0,0 +1,78 @@
+# Generated by Django 4.2 on 2026-10-18 10:22
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, TextField, Value
+
+import apps.blog.search
+
+BATCH_SIZE = 1000
+# apps.blog.search.TRANSLATE_FROM and TRANSLATE_TO as they were when the vectors were first filled.
+TRANSLATE_FROM = (
+    "\u06f0\u06f1\u06f2\u06f3\u06f4\u06f5\u06f6\u06f7\u06f8\u06f9"
+    "\u0660\u0661\u0662\u0663\u0664\u0665\u0666\u0667\u0668\u0669"
+    "\u064a\u0649\u0643\u0629\u06c0\u0623\u0625\u0671\u200c"
+    "\u0640\u064b\u064c\u064d\u064e\u064f\u0650\u0651\u0652\u0670"
+)
+TRANSLATE_TO = "01234567890123456789\u06cc\u06cc\u06a9\u0647\u0647\u0627\u0627\u0627 "
+
+
+def normalize_persian(expression):
+    return Func(
+        expression,
+        Value(TRANSLATE_FROM),
+        Value(TRANSLATE_TO),
+        function="translate",
+        output_field=TextField(),
+    )
+
+
+def fill_search_vectors(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    pks = Post.objects.filter(search_vector__isnull=True).values_list("pk", flat=True)
+    search_vector = SearchVector(
+        normalize_persian(F("title")), config="simple", weight="A"
+    ) + SearchVector(normalize_persian(F("caption")), config="simple", weight="B")
+    # Short batches, so that the posts aren't locked while all of them are computed.
+    while batch := list(pks[:BATCH_SIZE]):
+        Post.objects.filter(pk__in=batch).update(search_vector=search_vector)
+
+
+class Migration(migrations.Migration):
+    # The indexes are built concurrently, without locking the posts against writes.
+    atomic = False
+
+    dependencies = [
+        ("blog", "0002_comment_thread_index"),
+        # pg_trgm
+        ("user", "0008_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="post",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="post_search_vector_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="post",
+            index=django.contrib.postgres.indexes.GistIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    apps.blog.search.NormalizePersian("title"), name="gist_trgm_ops"
+                ),
+                name="post_title_trgm_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 10:29
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built concurrently, without locking the posts against writes.
+    atomic = False
+
+    dependencies = [
+        ("blog", "0003_post_search"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("status", "published")),
+                fields=["-created_date", "id"],
+                name="post_published_keyset_idx",
+            ),
+        ),
+    ]
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchRank, SearchVectorField, TrigramWordDistance
 from django.db import models
+from django.db.models import F, Prefetch, Q, Value
 from django.utils.timezone import now
 
+from apps.blog.search import NormalizePersian, normalize_persian, post_search_query, post_search_vector
+
 User = get_user_model()
 
 
@@ -24,6 +30,43 @@ class Gallery(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status=Post.PostChoices.PUBLISHED)
+
+    def for_cards(self, *fields):
+        """
+        Posts as the list and index pages render them: only the columns of a card (plus ``fields``) and their
+        categories in one extra query, so a page costs the same number of queries however many cards it has.
+        """
+        return self.only("id", "title", "slug", "image", *fields).prefetch_related(
+            Prefetch("category", queryset=PostCategory.objects.only("id", "title"))
+        )
+
+    def search(self, term: str):
+        """
+        Posts matching ``term`` by their title and caption, best matches first. If none do, the term is taken for a
+        typo and the ``POST_SEARCH_FALLBACK_LIMIT`` posts with the most similar title words are returned instead,
+        as long as they're similar from ``pg_trgm.word_similarity_threshold`` on.
+        """
+        query = post_search_query(term)
+        matches = (
+            self.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-id")
+        )
+        if matches.exists():
+            return matches
+        term = normalize_persian(term)
+        # Nearest first, which the GiST index reads in order without looking at every similar title.
+        return (
+            self.alias(normalized_title=NormalizePersian("title"))
+            .filter(normalized_title__trigram_word_similar=term)
+            .annotate(distance=TrigramWordDistance(term, "normalized_title"))
+            .order_by("distance")[: settings.POST_SEARCH_FALLBACK_LIMIT]
+        )
+
+
 class Post(models.Model):
     class PostChoices(models.TextChoices):
         PUBLISHED = "published"
@@ -42,13 +85,47 @@ class Post(models.Model):
     publish_date = models.DateTimeField(default=now, blank=True, null=True)
     status = models.CharField(choices=PostChoices.choices, default="draft")
     caption = models.TextField(blank=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"title", "caption"} & set(update_fields):
+            self.search_vector = post_search_vector(
+                Value(self.title), Value(self.caption)
+            )
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_vector"}
+        super().save(*args, **kwargs)
+        # The vector is computed by the database, it's read back only if it's used.
+        self.__dict__.pop("search_vector", None)
+
+    def mark_for_deletion(self):
+        """Unpublish the post while ``delete_in_batches_task`` deletes its comments."""
+        self.status = self.PostChoices.DRAFT
+        self.save(update_fields=["status", "updated_date"])
+
     class Meta:
         ordering = ["-created_date"]
         app_label = "blog"
+        indexes = [
+            # Serves the pages of the blog list, read from a cursor in this order.
+            models.Index(
+                fields=["-created_date", "id"],
+                name="post_published_keyset_idx",
+                condition=Q(status="published"),
+            ),
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+            # Serves the typo fallback of PostQuerySet.search().
+            GistIndex(
+                OpClass(NormalizePersian("title"), name="gist_trgm_ops"),
+                name="post_title_trgm_idx",
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -61,6 +138,13 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["created_date"]
+        indexes = [
+            # The comment threads of the detail page, a post's active comments from a (created_date, id) cursor on.
+            models.Index(
+                fields=["post", "active", "created_date", "id"],
+                name="comment_thread_idx",
+            )
+        ]
 
     def __str__(self):
         return f"Comment {self.body} by {self.name}"
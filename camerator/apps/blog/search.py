@@ -0,0 +1,76 @@
+"""
+Full-text search of the blog. Titles and captions are indexed as a ``tsvector`` of their normalized text, the Arabic
+forms of Persian letters and the Persian digits are written as the ones a Persian keyboard types and diacritics are
+dropped, so a search finds a post whichever variants its author or the reader typed. The normalization is done by
+``translate()`` in the database and by ``str.translate`` for search terms, from the same table.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import Func, TextField, Value
+from django.db.models.expressions import CombinedExpression
+
+from utils.validators import DIGITS
+
+# The text search configuration, Postgres has no Persian dictionary so words are only lowercased.
+SEARCH_CONFIG = "simple"
+PERSIAN_CHARACTERS: dict[int, int | str | None] = {
+    **DIGITS,
+    **{
+        ord(char): replacement
+        for char, replacement in {
+            "ي": "ی",
+            "ى": "ی",
+            "ك": "ک",
+            "ة": "ه",
+            "ۀ": "ه",
+            "أ": "ا",
+            "إ": "ا",
+            "ٱ": "ا",
+            # The zero-width non-joiner of compound words, often typed as a space.
+            "\u200c": " ",
+            # Tatweel, the harakat and the superscript alef.
+            "\u0640": None,
+            **{chr(code): None for code in range(0x064B, 0x0653)},
+            "\u0670": None,
+        }.items()
+    },
+}
+# translate() drops the characters of the first string that have none in the second, they have to come last.
+TRANSLATE_FROM = "".join(
+    [chr(code) for code, char in PERSIAN_CHARACTERS.items() if char is not None]
+    + [chr(code) for code, char in PERSIAN_CHARACTERS.items() if char is None]
+)
+TRANSLATE_TO = "".join(
+    chr(char) if isinstance(char, int) else char
+    for char in PERSIAN_CHARACTERS.values()
+    if char is not None
+)
+
+
+def normalize_persian(text: str) -> str:
+    return text.translate(PERSIAN_CHARACTERS)
+
+
+class NormalizePersian(Func):
+    """``normalize_persian`` in the database, immutable so that it can be indexed."""
+
+    function = "translate"
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(
+            expression, Value(TRANSLATE_FROM), Value(TRANSLATE_TO), **extra
+        )
+
+
+def post_search_vector(title, caption) -> CombinedExpression:
+    """The search vector of a post from expressions of its title and caption, titles weigh more."""
+    return SearchVector(
+        NormalizePersian(title), config=SEARCH_CONFIG, weight="A"
+    ) + SearchVector(NormalizePersian(caption), config=SEARCH_CONFIG, weight="B")
+
+
+def post_search_query(term: str) -> SearchQuery:
+    """A search term as typed in the search box: words, "quoted phrases", OR and -excluded words."""
+    return SearchQuery(
+        normalize_persian(term), config=SEARCH_CONFIG, search_type="websearch"
+    )
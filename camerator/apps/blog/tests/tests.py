@@ -1,7 +1,21 @@
-from django.test import TestCase
-from apps.blog.models import Post, PostCategory, Gallery, Comment, CommentReply
-from django.utils.timezone import now
+import base64
+import re
+import time
+
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.text import slugify
+from django.utils.timezone import now
+
+from apps.blog.models import Comment, CommentReply, Gallery, Post, PostCategory
+from utils.page_cache import CSRF_TOKEN_PLACEHOLDER, page_cache
+from utils.redis import get_redis_connection
+from utils.testcases import QueryCountTestCaseMixin, RedisTestCaseMixin
 
 User = get_user_model()
 
@@ -137,3 +151,330 @@ class TestCommentReplyModel(TestCase):
         )
         self.assertEqual(comment_reply.comment, self.comment)
         self.assertEqual(comment_reply.body, "Test Reply")
+
+
+class TestPostListView(RedisTestCaseMixin, QueryCountTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        categories = [
+            PostCategory.objects.create(title=f"Category {number}")
+            for number in range(3)
+        ]
+        for number in range(12):
+            post = Post.objects.create(
+                title=f"Post {number}",
+                author=user,
+                slug=f"post-{number}",
+                image="test_image.jpg",
+                status=Post.PostChoices.PUBLISHED,
+                caption="Caption",
+            )
+            post.category.add(*categories[: number % 3 + 1])
+
+    def test_query_count(self):
+        # The posts, their categories and the total, which is cached for the next pages.
+        with self.assertNumStatements(3):
+            response = self.client.get(reverse("blog:list-view"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["posts"]), 9)
+        self.assertEqual(response.context["approximate_count"], 12)
+        self.assertContains(response, "Category 2")
+
+        with self.assertNumStatements(2):
+            response = self.client.get(
+                reverse("blog:list-view"),
+                {"cursor": response.context["page_obj"].next_cursor},
+            )
+        self.assertEqual(len(response.context["posts"]), 3)
+
+    def test_cursors(self):
+        # Posts created in the same instant are ordered by their id.
+        Post.objects.filter(title__in=["Post 7", "Post 8", "Post 9"]).update(
+            created_date=Post.objects.get(title="Post 8").created_date
+        )
+        expected = [
+            *[f"Post {number}" for number in range(11, 9, -1)],
+            "Post 7",
+            "Post 8",
+            "Post 9",
+            *[f"Post {number}" for number in range(6, -1, -1)],
+        ]
+        with override_settings(POST_LIST_COUNT_CACHE_TTL=0):
+            pages, cursor = [], None
+            while True:
+                response = self.client.get(
+                    reverse("blog:list-view"), {"cursor": cursor} if cursor else {}
+                )
+                page = response.context["page_obj"]
+                pages.append([post.title for post in page])
+                if not (cursor := page.next_cursor):
+                    break
+            self.assertIsNone(response.context["approximate_count"])
+            self.assertEqual(pages, [expected[:9], expected[9:]])
+
+            response = self.client.get(
+                reverse("blog:list-view"), {"cursor": page.previous_cursor}
+            )
+        page = response.context["page_obj"]
+        self.assertEqual([post.title for post in page], expected[:9])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("blog:list-view"), {"cursor": "page-2"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_keeps_page_numbers(self):
+        response = self.client.get(reverse("blog:list-view"), {"q": "post", "page": 2})
+        self.assertFalse(response.context["cursor_pagination"])
+        self.assertEqual(len(response.context["posts"]), 3)
+
+    def test_unused_columns_are_not_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("blog:list-view"))
+        post_queries = [
+            query["sql"] for query in queries if 'FROM "blog_post"' in query["sql"]
+        ]
+        self.assertTrue(post_queries)
+        self.assertFalse([sql for sql in post_queries if "caption" in sql])
+
+    def test_detail_does_not_load_the_search_vector(self):
+        post = Post.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("blog:detail-view", kwargs={"slug": post.slug})
+            )
+        self.assertEqual(response.status_code, 200)
+        post_queries = [
+            query["sql"] for query in queries if 'FROM "blog_post"' in query["sql"]
+        ]
+        self.assertTrue(post_queries)
+        self.assertFalse([sql for sql in post_queries if "search_vector" in sql])
+
+
+class TestCommentThread(RedisTestCaseMixin, QueryCountTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        self.post = Post.objects.create(
+            title="Test Post",
+            author=user,
+            slug="test-post",
+            image="test_image.jpg",
+            status=Post.PostChoices.PUBLISHED,
+        )
+        self.comments = [
+            Comment.objects.create(
+                post=self.post,
+                name=f"User {number}",
+                email="test@example.com",
+                body=f"Comment {number}",
+                active=True,
+            )
+            for number in range(5)
+        ]
+        # Comments created in the same instant are ordered by their id.
+        Comment.objects.filter(id__in=[c.id for c in self.comments[1:3]]).update(
+            created_date=self.comments[1].created_date
+        )
+        Comment.objects.create(
+            post=self.post, name="Spammer", email="spam@example.com", body="Spam"
+        )
+        for comment in self.comments:
+            for number in range(2):
+                CommentReply.objects.create(comment=comment, body=f"Reply {number}")
+
+    @override_settings(COMMENT_THREAD_PAGE_SIZE=2)
+    def test_detail_view(self):
+        # The post, its categories and author, its comments and their replies.
+        with self.assertNumStatements(5):
+            response = self.client.get(
+                reverse("blog:detail-view", kwargs={"slug": self.post.slug})
+            )
+        self.assertEqual(response.context["comments"], self.comments[:2])
+        self.assertContains(response, "Reply 1")
+        self.assertContains(response, response.context["comments_next_cursor"])
+
+    @override_settings(COMMENT_THREAD_PAGE_SIZE=2)
+    def test_load_more(self):
+        url = reverse("blog:comment-thread", kwargs={"slug": self.post.slug})
+        pages, cursor = [], None
+        while True:
+            with self.assertNumStatements(3):
+                data = self.client.get(url, {"cursor": cursor} if cursor else {}).json()
+            pages.append([comment["body"] for comment in data["comments"]])
+            if not (cursor := data["next_cursor"]):
+                break
+
+        self.assertEqual(
+            pages,
+            [["Comment 0", "Comment 1"], ["Comment 2", "Comment 3"], ["Comment 4"]],
+        )
+        self.assertEqual(
+            [reply["body"] for reply in data["comments"][0]["replies"]],
+            ["Reply 0", "Reply 1"],
+        )
+        self.assertNotIn("email", data["comments"][0])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse("blog:comment-thread", kwargs={"slug": self.post.slug}),
+            {"cursor": "not-a-cursor"},
+        )
+        self.assertEqual(response.status_code, 400)
+        cursor = base64.urlsafe_b64encode(b'{"v": [null, null], "f": true}').decode()
+        response = self.client.get(
+            reverse("blog:comment-thread", kwargs={"slug": self.post.slug}),
+            {"cursor": cursor},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestPostSearch(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        # Written with the Arabic yeh and kaf.
+        self.titled = self.create_post("عكاسي از طبيعت", "Landscapes")
+        self.captioned = self.create_post("Portraits", "نکاتی درباره عکاسی پرتره")
+        self.other = self.create_post("Street photography", "Night walks in Tehran")
+
+    def create_post(self, title: str, caption: str) -> Post:
+        return Post.objects.create(
+            title=title,
+            author=self.user,
+            slug=slugify(title, allow_unicode=True),
+            image="test_image.jpg",
+            status=Post.PostChoices.PUBLISHED,
+            caption=caption,
+        )
+
+    def test_variants_match(self):
+        # Titles rank above captions, whichever letters the term is typed with.
+        for term in ["عکاسی", "عكاسي", "عـکّاسی"]:
+            self.assertEqual(
+                list(Post.objects.search(term)), [self.titled, self.captioned]
+            )
+        self.assertEqual(list(Post.objects.search("street -tehran")), [])
+        self.assertEqual(list(Post.objects.search("NIGHT walks")), [self.other])
+
+    def test_typo_fallback(self):
+        self.assertEqual(list(Post.objects.search("photograpy")), [self.other])
+        self.assertEqual(list(Post.objects.search("zzzz")), [])
+
+    def test_search_vector_follows_saves(self):
+        self.other.caption = "عکاسی شبانه"
+        self.other.save(update_fields=["caption"])
+        self.assertIn(self.other, Post.objects.search("عکاسی"))
+        self.assertIn("'شبانه':", self.other.search_vector)
+
+        self.other.status = Post.PostChoices.DRAFT
+        with self.assertNumQueries(1):
+            self.other.save(update_fields=["status"])
+
+    def test_list_view(self):
+        response = self.client.get(reverse("blog:list-view"), {"q": "عكاسي"})
+        self.assertEqual(list(response.context["posts"]), [self.titled, self.captioned])
+
+
+class TestPageCache(RedisTestCaseMixin, QueryCountTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        self.category = PostCategory.objects.create(title="Category")
+        self.post = Post.objects.create(
+            title="Test Post",
+            author=user,
+            slug="test-post",
+            image="test_image.jpg",
+            status=Post.PostChoices.PUBLISHED,
+        )
+        self.url = reverse("blog:detail-view", kwargs={"slug": self.post.slug})
+
+    def test_cached_until_invalidated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        with self.assertNumStatements(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertContains(response, "Test Post")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Renamed Post"
+            self.post.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertContains(response, "Renamed Post")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.category.add(self.category)
+        self.assertEqual(self.client.get(self.url)["X-Page-Cache"], "miss")
+
+        # Logged in visitors have pages of their own.
+        self.client.force_login(self.post.author)
+        self.assertEqual(self.client.get(self.url)["X-Page-Cache"], "miss")
+
+    def test_csrf_tokens_are_per_visitor(self):
+        Client().get(self.url)
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "hit")
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="(\w+)"', response.content.decode()
+        )[1]
+
+        response = client.post(
+            reverse("blog:comment-form", kwargs={"slug": self.post.slug}),
+            {
+                "name": "Visitor",
+                "email": "visitor@example.com",
+                "body": "Nice",
+                "csrfmiddlewaretoken": token,
+            },
+            follow=True,
+        )
+        self.assertContains(response, "Your commment has been submited successfully")
+        # The page with the message isn't served from the cache.
+        self.assertNotIn("X-Page-Cache", response)
+
+    def test_outdated_page_is_served_while_rendered(self):
+        response = self.client.get(self.url)
+        lock_key = f"{page_cache.get_key(response.wsgi_request)}:lock"
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.filter(pk=self.post.pk).update(title="Renamed Post")
+            page_cache.invalidate(Post)
+
+        # Another request holds the lock.
+        get_redis_connection().set(lock_key, 1)
+        with self.assertNumStatements(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "stale")
+        self.assertContains(response, "Test Post")
+
+        get_redis_connection().delete(lock_key)
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertContains(response, "Renamed Post")
+
+    @override_settings(PAGE_CACHE_WAIT_TIMEOUT=0.1)
+    def test_waits_for_first_render(self):
+        response = self.client.get(reverse("blog:list-view"))
+        lock_key = f"{page_cache.get_key(response.wsgi_request)}:lock"
+        get_redis_connection().delete(page_cache.get_key(response.wsgi_request))
+        get_redis_connection().set(lock_key, 1)
+
+        started = time.monotonic()
+        response = self.client.get(reverse("blog:list-view"))
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Test Post")
+
+    def test_key_without_resolver_match(self):
+        request = RequestFactory().get(self.url)
+        request.user = AnonymousUser()
+        self.assertIn(self.url, page_cache.get_key(request))
@@ -9,6 +9,11 @@ urlpatterns = [
     re_path(
         r"(?P<slug>[-\w]+)/detail/", views.PostDetailView.as_view(), name="detail-view"
     ),
+    re_path(
+        r"(?P<slug>[-\w]+)/comments/",
+        views.CommentThreadView.as_view(),
+        name="comment-thread",
+    ),
     re_path(
         r"(?P<slug>[-\w]+)/comment/form",
         views.CommentCreateView.as_view(),
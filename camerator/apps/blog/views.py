@@ -1,43 +1,101 @@
+from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.views import View
 from django.views.generic import CreateView, DetailView, ListView
 
+from apps.blog.comments import load_comment_thread, serialize_comment
 from apps.blog.forms import CommentForm, CommentReplyForm
-from apps.blog.models import Comment, Post, PostCategory
+from apps.blog.models import Comment, CommentReply, Post, PostCategory
+from utils.mixins.views import CachedPageMixin
+from utils.pagination import InvalidCursor, KeysetPaginator
 
 
-class PostListView(ListView):
+class PostListView(CachedPageMixin, ListView):
     template_name = "blog/post-list.html"
     context_object_name = "posts"
     paginate_by = 9
+    # Posts are paged from a cursor in this order, searches are ordered by rank and keep page numbers.
+    keyset_ordering = ("-created_date", "id")
+    page_cache_dependencies = (Post, PostCategory)
 
     def get_queryset(self):
-        queryset = Post.objects.filter(status=Post.PostChoices.PUBLISHED)
-        if search_q := self.request.GET.get("q"):
-            queryset = queryset.filter(title__icontains=search_q)
+        queryset = Post.objects.published().for_cards("created_date")
         if category_id := self.request.GET.get("category"):
             queryset = queryset.filter(category__id=category_id)
+        if search_q := self.request.GET.get("q"):
+            queryset = queryset.search(search_q)
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        if self.request.GET.get("q"):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, self.keyset_ordering, page_size)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["categories"] = PostCategory.objects.all()
+        context["cursor_pagination"] = isinstance(context["paginator"], KeysetPaginator)
+        if context["cursor_pagination"]:
+            context["approximate_count"] = self.get_approximate_count()
         return context
 
+    def get_approximate_count(self) -> int | None:
+        """
+        The number of posts listed, counted once per ``POST_LIST_COUNT_CACHE_TTL`` rather than on every page.
+        ``None`` if the TTL is 0.
+        """
+        if not settings.POST_LIST_COUNT_CACHE_TTL:
+            return None
+        return cache.get_or_set(
+            f"blog:post-list:count:{self.request.GET.get('category', '')}",
+            self.get_queryset().count,
+            settings.POST_LIST_COUNT_CACHE_TTL,
+        )
+
 
-class PostDetailView(DetailView):
+class PostDetailView(CachedPageMixin, DetailView):
     model = Post
+    # The page never shows the search vector, which can be large.
+    queryset = Post.objects.defer("search_vector")
     slug_field = "slug"
     template_name = "blog/post-detail.html"
     context_object_name = "post"
+    page_cache_dependencies = (Post, PostCategory, Comment, CommentReply)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["comments"] = Comment.objects.filter(post=context["post"])
+        thread = load_comment_thread(context["post"])
+        context["comments"] = thread.object_list
+        context["comments_next_cursor"] = thread.next_cursor
         return context
 
 
+class CommentThreadView(View):
+    """The next page of a post's comment thread as JSON, for the "load more" button of the detail page."""
+
+    def get(self, request, slug):
+        post = get_object_or_404(Post.objects.only("id"), slug=slug)
+        try:
+            thread = load_comment_thread(post, request.GET.get("cursor"))
+        except InvalidCursor as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        return JsonResponse(
+            {
+                "comments": [serialize_comment(comment) for comment in thread],
+                "next_cursor": thread.next_cursor,
+            }
+        )
+
+
 class CommentCreateView(CreateView):
     model = Comment
     form_class = CommentForm
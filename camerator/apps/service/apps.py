@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ServiceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.service"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from apps.service.models import Service
+        from utils.page_cache import page_cache
+
+        post_save.connect(page_cache.invalidate_sender, sender=Service)
+        post_delete.connect(page_cache.invalidate_sender, sender=Service)
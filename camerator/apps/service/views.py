@@ -1,9 +1,11 @@
 from django.views.generic import ListView
 
 from apps.service.models import Service
+from utils.mixins.views import CachedPageMixin
 
 
-class ServiceListView(ListView):
+class ServiceListView(CachedPageMixin, ListView):
     model = Service
     template_name = "service/service-list.html"
     context_object_name = "services"
+    page_cache_dependencies = (Service,)
@@ -3,12 +3,12 @@ from django.contrib.auth import admin as auth_admin
 from django.utils.translation import gettext_lazy as _
 
 from apps.user.forms import UserAdminChangeForm, UserAdminCreationForm
-from apps.user.models import AuthRequest, User
-from utils.mixins.admin import TimestampableAdminMixin
+from apps.user.models import AuthRequest, DeletionJob, User
+from utils.mixins.admin import BatchDeletionAdminMixin, PrefixSearchAdminMixin, TimestampableAdminMixin
 
 
 @admin.register(User)
-class UserAdmin(auth_admin.UserAdmin):
+class UserAdmin(BatchDeletionAdminMixin, PrefixSearchAdminMixin, auth_admin.UserAdmin):
     form = UserAdminChangeForm
     add_form = UserAdminCreationForm
     fieldsets = (
@@ -52,18 +52,46 @@ class UserAdmin(auth_admin.UserAdmin):
         "last_name",
         "national_code",
     )
+    prefix_search_fields = ("username", "national_code")
 
 
 @admin.register(AuthRequest)
-class AuthRequestAdmin(TimestampableAdminMixin, admin.ModelAdmin):
+class AuthRequestAdmin(
+    PrefixSearchAdminMixin, TimestampableAdminMixin, admin.ModelAdmin
+):
     list_display = (
         "id",
         "mobile",
         "otp_code",
         "user_is_registered",
+        "delivery_status",
         "formatted_created_at",
         "formatted_updated_at",
     )
     search_fields = ("mobile",)
-    list_filter = ("mobile",)
+    prefix_search_fields = ("mobile",)
+    list_filter = ("mobile", "delivery_status")
     ordering = ("-created_at",)
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(TimestampableAdminMixin, admin.ModelAdmin):
+    list_display = (
+        "object_repr",
+        "content_type",
+        "status",
+        "formatted_progress",
+        "requested_by",
+        "formatted_created_at",
+        "formatted_updated_at",
+    )
+    list_filter = ("status", "content_type")
+    ordering = ("-created_at",)
+    readonly_fields = [field.name for field in DeletionJob._meta.fields]
+
+    @admin.display(description=_("Progress"))
+    def formatted_progress(self, obj):
+        return f"{obj.deleted_count}/{obj.total} ({obj.progress:.0%})"
+
+    def has_add_permission(self, request):
+        return False
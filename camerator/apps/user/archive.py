@@ -0,0 +1,83 @@
+"""
+Retention of the ``AuthRequest`` table. Finished requests older than ``AUTH_REQUEST_RETENTION_DAYS`` are written to
+gzipped JSON lines files under ``AUTH_REQUEST_ARCHIVE_ROOT`` and deleted, one bounded batch at a time.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from apps.user.models import AuthRequest
+
+
+def get_archivable_auth_requests(now: datetime) -> QuerySet[AuthRequest]:
+    cutoff = now - timedelta(days=settings.AUTH_REQUEST_RETENTION_DAYS)
+    return (
+        AuthRequest.objects.filter(created_at__lt=cutoff)
+        .filter(
+            ~Q(request_status=AuthRequest.RequestStatuses.PENDING)
+            | Q(expire_datetime__lt=now)
+        )
+        .order_by("created_at", "id")
+    )
+
+
+def archive_auth_requests(
+    batch_size: int | None = None, max_batches: int | None = None
+) -> int:
+    """
+    Archive and delete old auth requests, returns how many were archived. Batches are read with keyset pagination
+    on ``(created_at, id)``, so every batch is an index range scan however large the table is. Each batch is
+    written to its own file, synced to disk, and only then deleted in a transaction of its own, so a crash loses at
+    most the batch in flight (it's archived again by the next run).
+    """
+    batch_size = batch_size or settings.AUTH_REQUEST_ARCHIVE_BATCH_SIZE
+    max_batches = max_batches or settings.AUTH_REQUEST_ARCHIVE_MAX_BATCHES
+    now = timezone.now()
+    queryset = get_archivable_auth_requests(now)
+    fields = [field.attname for field in AuthRequest._meta.fields if field.concrete]
+    directory = Path(settings.AUTH_REQUEST_ARCHIVE_ROOT) / now.strftime("%Y/%m/%d")
+
+    archived = 0
+    last_row: dict | None = None
+    for batch in range(max_batches):
+        batch_queryset = queryset
+        if last_row is not None:
+            batch_queryset = queryset.filter(
+                Q(created_at__gt=last_row["created_at"])
+                | Q(created_at=last_row["created_at"], id__gt=last_row["id"])
+            )
+        rows = list(batch_queryset.values(*fields)[:batch_size])
+        if not rows:
+            break
+
+        write_archive(
+            directory / f"auth-requests-{now:%H%M%S}-{batch:04d}.jsonl.gz", rows
+        )
+        with transaction.atomic():
+            AuthRequest.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        archived += len(rows)
+        last_row = rows[-1]
+        if len(rows) < batch_size:
+            break
+    return archived
+
+
+def write_archive(path: Path, rows: list[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    with open(temporary_path, "wb") as file:
+        with gzip.open(file, "wb") as archive:
+            for row in rows:
+                line = json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+                archive.write(line.encode())
+        file.flush()
+        os.fsync(file.fileno())
+    temporary_path.rename(path)
@@ -0,0 +1,75 @@
+"""
+Batched deletion. ``Model.delete()`` collects every row that cascades from an object in Python and deletes them all
+in one transaction, which for a prolific user means every post, comment and reply locked at once. A ``DeletionJob``
+deletes the same rows bottom-up instead, ``DELETION_BATCH_SIZE`` rows per short transaction, and the object itself
+last, once nothing cascades from it anymore.
+"""
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import ForeignObjectRel
+
+from apps.user.models import DeletionJob
+
+
+def get_cascade_plan(
+    model: type[models.Model], lookup: str = "", seen: frozenset = frozenset()
+) -> list[tuple[type[models.Model], str]]:
+    """
+    Models that are deleted along with ``model`` through ``CASCADE`` foreign keys, each with its lookup to the root
+    object. Dependants come before the models they depend on, so deleting in this order never cascades further.
+    """
+    seen = seen | {model}
+    plan = []
+    # The reverse relations Options.related_objects lists, which the stubs don't declare.
+    relations = [
+        field
+        for field in model._meta.get_fields(include_hidden=True)
+        if isinstance(field, ForeignObjectRel) and not field.many_to_many
+    ]
+    for relation in relations:
+        if relation.on_delete is not models.CASCADE or relation.related_model in seen:
+            continue
+        related_lookup = (
+            f"{relation.field.name}__{lookup}" if lookup else relation.field.name
+        )
+        plan += get_cascade_plan(relation.related_model, related_lookup, seen)
+        plan.append((relation.related_model, related_lookup))
+    return plan
+
+
+def count_cascade(model: type[models.Model], pks: list) -> dict[str, int]:
+    """Rows that cascade from the given objects by model label, one count per model."""
+    return {
+        related_model._meta.label: related_model._base_manager.filter(
+            **{f"{lookup}__in": pks}
+        ).count()
+        for related_model, lookup in get_cascade_plan(model)
+    }
+
+
+def run_deletion_job(job: DeletionJob, max_batches: int) -> bool:
+    """Delete up to ``max_batches`` batches of the job, returns whether the job is finished."""
+    obj = job.get_object()
+    batch_size = settings.DELETION_BATCH_SIZE
+    batches = 0
+    if obj is not None:
+        for related_model, lookup in get_cascade_plan(type(obj)):
+            queryset = related_model._base_manager.filter(**{lookup: obj.pk})
+            while True:
+                if batches >= max_batches:
+                    return False
+                pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+                if not pks:
+                    break
+                with transaction.atomic():
+                    _, counts = related_model._base_manager.filter(pk__in=pks).delete()
+                    job.add_progress(counts)
+                batches += 1
+
+        with transaction.atomic():
+            _, counts = obj.delete()
+            job.add_progress(counts)
+
+    job.status = DeletionJob.Statuses.COMPLETED
+    job.save(update_fields=["status", "updated_at"])
+    return True
@@ -0,0 +1,164 @@
+"""
+Data exports. A user's profile, avatar, posts with their images, galleries and login history are written one by one
+into a ZIP file on disk: rows are read through server-side cursors and files are copied in chunks, so the memory a
+build takes doesn't grow with the data of the user.
+"""
+import io
+import json
+import logging
+import shutil
+import tempfile
+import zipfile
+from collections.abc import Iterable
+from datetime import timedelta
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.blog.models import Gallery, Post
+from apps.user.models import AuthRequest, User, UserDataExport
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = [
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "national_code",
+    "email",
+    "description",
+    "date_joined",
+    "last_login",
+]
+POST_FIELDS = [
+    "id",
+    "title",
+    "slug",
+    "status",
+    "caption",
+    "image",
+    "gallery_id",
+    "created_date",
+    "updated_date",
+    "publish_date",
+]
+GALLERY_FIELDS = ["id", "title", "description", "created_date", "updated_date"]
+# The OTP codes of old requests are left out, they're of no use to the user.
+AUTH_REQUEST_FIELDS = [
+    "id",
+    "mobile",
+    "user_is_registered",
+    "request_status",
+    "delivery_status",
+    "resend_count",
+    "created_at",
+    "expire_datetime",
+]
+
+
+class UserDataExportBuilder:
+    def __init__(self, archive: zipfile.ZipFile):
+        self.archive = archive
+
+    def write_json(self, name: str, data: dict) -> None:
+        self.archive.writestr(name, json.dumps(data, cls=DjangoJSONEncoder, indent=2))
+
+    def write_json_lines(self, name: str, rows: Iterable[dict]) -> None:
+        with self.archive.open(name, "w", force_zip64=True) as entry, io.TextIOWrapper(
+            entry, encoding="utf-8"
+        ) as text:
+            for row in rows:
+                text.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+
+    def copy_file(self, name: str, storage: Storage, path: str) -> bool:
+        try:
+            source = storage.open(path, "rb")
+        except OSError:
+            logger.warning("File %s of a data export is missing.", path)
+            return False
+        with source, self.archive.open(name, "w", force_zip64=True) as entry:
+            shutil.copyfileobj(source, entry, settings.USER_DATA_EXPORT_FILE_CHUNK_SIZE)
+        return True
+
+    def build(self, user: User) -> None:
+        chunk_size = settings.USER_DATA_EXPORT_CHUNK_SIZE
+        profile = {field: getattr(user, field) for field in PROFILE_FIELDS}
+        image_field = User._meta.get_field("image")
+        if user.image and user.image.name != image_field.default:
+            avatar = f"avatar/{PurePosixPath(user.image.name).name}"
+            if self.copy_file(avatar, user.image.storage, user.image.name):
+                profile["image"] = avatar
+        self.write_json("profile.json", profile)
+
+        posts = Post.objects.filter(author=user).order_by("id")
+        self.write_json_lines(
+            "posts.jsonl",
+            posts.values(*POST_FIELDS)
+            .annotate(
+                categories=ArrayAgg(
+                    "category__title",
+                    distinct=True,
+                    filter=Q(category__isnull=False),
+                    default=[],
+                )
+            )
+            .iterator(chunk_size=chunk_size),
+        )
+        storage = Post._meta.get_field("image").storage
+        for post_id, image in posts.values_list("id", "image").iterator(
+            chunk_size=chunk_size
+        ):
+            if image:
+                self.copy_file(
+                    f"posts/{post_id}/{PurePosixPath(image).name}", storage, image
+                )
+
+        self.write_json_lines(
+            "galleries.jsonl",
+            Gallery.objects.filter(id__in=posts.values("gallery_id"))
+            .order_by("id")
+            .values(*GALLERY_FIELDS)
+            .iterator(chunk_size=chunk_size),
+        )
+        self.write_json_lines(
+            "login_history.jsonl",
+            AuthRequest.objects.filter(mobile=user.username)
+            .order_by("created_at", "id")
+            .values(*AUTH_REQUEST_FIELDS)
+            .iterator(chunk_size=chunk_size),
+        )
+
+
+def build_user_data_export(export: UserDataExport) -> None:
+    """Build the archive of an export in a temporary file and move it to the export storage."""
+    with tempfile.TemporaryFile() as file:
+        with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            UserDataExportBuilder(archive).build(export.user)
+        file.seek(0)
+        export.file.save(
+            f"{export.user_id}-{timezone.now():%Y%m%d%H%M%S}.zip",
+            File(file),
+            save=False,
+        )
+        export.size = export.file.size
+    export.status = UserDataExport.Statuses.READY
+    export.save(update_fields=["file", "size", "status", "updated_at"])
+
+
+def delete_expired_user_data_exports() -> int:
+    """Delete exports past their TTL along with their files, returns how many were deleted."""
+    cutoff = timezone.now() - timedelta(days=settings.USER_DATA_EXPORT_TTL_DAYS)
+    deleted = 0
+    for export in UserDataExport.objects.filter(created_at__lt=cutoff).iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        deleted += 1
+    return deleted
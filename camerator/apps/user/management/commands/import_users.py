@@ -0,0 +1,186 @@
+"""
+Import users from a CSV file with a ``mobile`` column and optional ``first_name``, ``last_name`` and
+``national_code`` columns:
+
+    $ python manage.py import_users photographers.csv --rejects photographers.rejects.csv
+
+The file is read in batches. Each batch is validated at once, copied into a temporary table with ``COPY`` and
+inserted from it with ``ON CONFLICT DO NOTHING``, so mobiles that are already registered are skipped. Imported users
+get an unusable password, they log in with OTP codes. Rows that aren't imported are written to the rejects file with
+the reason.
+"""
+import csv
+import itertools
+import secrets
+import time
+from collections.abc import Iterator
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+
+from apps.user.models import User
+from utils.uuids import uuid7
+from utils.validators import normalize_digits, validate_mobiles, validate_national_codes
+
+COLUMNS = ["mobile", "first_name", "last_name", "national_code"]
+
+
+class Reasons:
+    INVALID_MOBILE = "invalid mobile"
+    INVALID_NATIONAL_CODE = "invalid national code"
+    NAME_TOO_LONG = "name too long"
+    DUPLICATE_ROW = "duplicate row"
+    ALREADY_REGISTERED = "already registered"
+
+
+def copy_value(value) -> str:
+    if value is None:
+        return r"\N"
+    # Quoted values are never read as NULL, whatever they hold.
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV file, skipping registered mobiles and writing rejected rows to a file."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("path", type=Path)
+        parser.add_argument(
+            "--rejects",
+            type=Path,
+            help="CSV file of the rows that weren't imported, next to the imported file by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(
+        self, *args, path: Path, rejects: Path | None, batch_size: int, **options
+    ) -> None:
+        rejects = rejects or path.with_suffix(".rejects.csv")
+        self.fields = [field for field in User._meta.fields if field.concrete]
+        # Columns the rows don't set are the same for every user, they're prepared once from an empty one.
+        self.defaults = {
+            field.attname: field.get_db_prep_save(
+                field.pre_save(User(), True), connection
+            )
+            for field in self.fields
+        }
+        name_max_length = User._meta.get_field("first_name").max_length
+        assert name_max_length is not None
+        self.name_max_length = name_max_length
+        self.seen: set[str] = set()
+        imported = rejected = 0
+        started = time.perf_counter()
+
+        with path.open(newline="", encoding="utf-8-sig") as source, rejects.open(
+            "w", newline="", encoding="utf-8"
+        ) as rejects_file:
+            reader = csv.DictReader(source)
+            fieldnames = list(reader.fieldnames or [])
+            if "mobile" not in fieldnames:
+                raise CommandError(f"{path} has no mobile column.")
+            rejects_writer = csv.writer(rejects_file)
+            rejects_writer.writerow([*fieldnames, "reason"])
+
+            for rows in self.batches(reader, batch_size):
+                users, rejected_rows = self.validate(rows)
+                inserted = self.insert(users)
+                for row, user in users:
+                    if user["username"] not in inserted:
+                        rejected_rows.append((row, Reasons.ALREADY_REGISTERED))
+                rejects_writer.writerows(
+                    [*(row.get(column) for column in fieldnames), reason]
+                    for row, reason in rejected_rows
+                )
+                imported += len(inserted)
+                rejected += len(rejected_rows)
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        f"{imported + rejected} rows read, {imported} users imported."
+                    )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {imported} users and rejected {rejected} rows in {elapsed:.1f}s "
+                f"({(imported + rejected) / elapsed:,.0f} rows/s). Rejected rows are in {rejects}."
+            )
+        )
+
+    @staticmethod
+    def batches(reader: csv.DictReader, batch_size: int) -> Iterator[list[dict]]:
+        while rows := list(itertools.islice(reader, batch_size)):
+            yield rows
+
+    def validate(
+        self, rows: list[dict]
+    ) -> tuple[list[tuple[dict, dict]], list[tuple[dict, str]]]:
+        """Split a batch into the users to insert and the rejected rows, each column is validated at once."""
+        columns = {
+            column: normalize_digits(row.get(column) or "" for row in rows)
+            for column in COLUMNS
+        }
+        valid_mobiles = validate_mobiles(columns["mobile"])
+        valid_national_codes = validate_national_codes(columns["national_code"])
+
+        users, rejected_rows = [], []
+        for index, row in enumerate(rows):
+            mobile, first_name, last_name, national_code = (
+                columns[column][index] for column in COLUMNS
+            )
+            if not valid_mobiles[index]:
+                reason = Reasons.INVALID_MOBILE
+            elif national_code and not valid_national_codes[index]:
+                reason = Reasons.INVALID_NATIONAL_CODE
+            elif max(len(first_name), len(last_name)) > self.name_max_length:
+                reason = Reasons.NAME_TOO_LONG
+            elif mobile in self.seen:
+                reason = Reasons.DUPLICATE_ROW
+            else:
+                self.seen.add(mobile)
+                user = {
+                    "id": uuid7(),
+                    "username": mobile,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "national_code": national_code or None,
+                    # As set_unusable_password() does, without its much slower random string.
+                    "password": UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30),
+                }
+                users.append((row, user))
+                continue
+            rejected_rows.append((row, reason))
+        return users, rejected_rows
+
+    def insert(self, users: list[tuple[dict, dict]]) -> set[str]:
+        """Copy the users into a temporary table and insert the new ones from it, returns their usernames."""
+        if not users:
+            return set()
+        buffer = StringIO()
+        for _, user in users:
+            values = {**self.defaults, **user}
+            buffer.write(
+                ",".join(copy_value(values[field.attname]) for field in self.fields)
+                + "\n"
+            )
+        buffer.seek(0)
+
+        quote_name = connection.ops.quote_name
+        table = quote_name(User._meta.db_table)
+        columns = ", ".join(quote_name(field.column) for field in self.fields)
+        username = quote_name(User._meta.get_field("username").column)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMPORARY TABLE user_import (LIKE {table})")
+            cursor.copy_expert(
+                f"COPY user_import ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM user_import "
+                f"ON CONFLICT ({username}) DO NOTHING RETURNING {username}"
+            )
+            inserted = {row[0] for row in cursor.fetchall()}
+            cursor.execute("DROP TABLE user_import")
+        return inserted
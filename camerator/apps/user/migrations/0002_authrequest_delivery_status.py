@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="authrequest",
+            name="delivery_status",
+            field=models.CharField(
+                choices=[("queued", "Queued"), ("sent", "Sent"), ("failed", "Failed")],
+                default="queued",
+                max_length=10,
+                verbose_name="Delivery status",
+            ),
+        ),
+    ]
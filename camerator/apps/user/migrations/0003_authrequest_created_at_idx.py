@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_authrequest_delivery_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="authrequest",
+            index=models.Index(
+                fields=["created_at", "id"], name="authrequest_created_at_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+import utils.uuids
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0003_authrequest_created_at_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="authrequest",
+            name="id",
+            field=models.UUIDField(
+                default=utils.uuids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="user",
+            name="id",
+            field=models.UUIDField(
+                default=utils.uuids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
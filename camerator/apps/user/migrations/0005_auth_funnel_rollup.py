@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0004_uuid7_primary_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthFunnelRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(unique=True, verbose_name="Hour")),
+                (
+                    "requests",
+                    models.PositiveIntegerField(default=0, verbose_name="Requests"),
+                ),
+                (
+                    "resends",
+                    models.PositiveIntegerField(default=0, verbose_name="Resends"),
+                ),
+                (
+                    "completions",
+                    models.PositiveIntegerField(default=0, verbose_name="Completions"),
+                ),
+                (
+                    "expirations",
+                    models.PositiveIntegerField(default=0, verbose_name="Expirations"),
+                ),
+                (
+                    "registrations",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Registrations"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Auth Funnel Rollup",
+                "verbose_name_plural": "Auth Funnel Rollups",
+            },
+        ),
+        migrations.AddField(
+            model_name="authrequest",
+            name="resend_count",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Resend count"
+            ),
+        ),
+    ]
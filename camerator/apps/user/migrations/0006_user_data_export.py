@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import apps.user.models
+import utils.uuids
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0005_auth_funnel_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserDataExport",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=utils.uuids.uuid7,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="تاریخ"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="تاریخ آخرین ویرایش"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("ready", "Ready"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        blank=True,
+                        storage=apps.user.models.get_user_data_export_storage,
+                        upload_to="users/exports/",
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField(blank=True, null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="data_exports",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Data Export",
+                "verbose_name_plural": "User Data Exports",
+            },
+        ),
+    ]
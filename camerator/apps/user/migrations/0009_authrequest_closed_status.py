@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0008_admin_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="authrequest",
+            name="request_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("completed", "Completed"),
+                    ("closed", "Closed"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+    ]
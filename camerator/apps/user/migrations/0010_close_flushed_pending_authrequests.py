@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 15:02
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def close_flushed_pending_requests(apps, schema_editor):
+    # Requests are only flushed pending once they've expired, none of these can still be verified. The ones that were
+    # closed unverified as completed can't be told apart from the verified ones and are left as they are.
+    AuthRequest = apps.get_model("user", "AuthRequest")
+    AuthRequest.objects.filter(
+        request_status="pending", expire_datetime__lt=timezone.now()
+    ).update(request_status="closed")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0009_authrequest_closed_status"),
+    ]
+
+    operations = [
+        migrations.RunPython(close_flushed_pending_requests, migrations.RunPython.noop),
+    ]
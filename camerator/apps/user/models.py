@@ -1,15 +1,24 @@
 from __future__ import annotations
 
-from datetime import timedelta
+import os
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from services.sms_service import SMSService, SMSServiceResult
-from utils.mixins.models import Timestampable, UUIDPrimaryKeyMixin
+from services.sms_service import OTPCode, SMSService, SMSServiceException, SMSServiceResult
+from utils.mixins.models import TimeOrderedUUIDPrimaryKeyMixin, Timestampable
 from utils.validators import MobileValidator
 
 
@@ -21,7 +30,7 @@ class UserManager(models.Manager["User"]):
     pass
 
 
-class User(AbstractUser, UUIDPrimaryKeyMixin):
+class User(AbstractUser, TimeOrderedUUIDPrimaryKeyMixin):
     username_validator = UnicodeUsernameValidator()
     username = models.CharField(
         _("Phone Number"),
@@ -48,20 +57,101 @@ class User(AbstractUser, UUIDPrimaryKeyMixin):
     description = models.TextField(blank=True, null=True)
     REQUIRED_FIELDS = []
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Admin search: trigram indexes serve the icontains lookups (UPPER(column) LIKE UPPER('%term%')) and
+            # digit-only terms are prefix searches, the username has the _like index of its unique constraint.
+            *(
+                GinIndex(
+                    OpClass(Upper(field), name="gin_trgm_ops"),
+                    name=f"user_{field}_trgm_idx",
+                )
+                for field in ["username", "first_name", "last_name", "national_code"]
+            ),
+            models.Index(
+                fields=["national_code"],
+                opclasses=["varchar_pattern_ops"],
+                name="user_national_code_like_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.username} ({self.first_name} {self.last_name})"
 
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        self.invalidate_snapshot()
+        if not self.is_active:
+            self.close_pending_codes()
+
+    def delete(self, *args, **kwargs):
+        user_id = self.id
+        result = super().delete(*args, **kwargs)
+        self.invalidate_snapshot(user_id)
+        self.close_pending_codes()
+        return result
+
+    def close_pending_codes(self) -> None:
+        """
+        Close the OTP codes already sent to the user, logging in with a code doesn't look the user up again when it
+        was requested by a registered user.
+        """
+        from apps.user.otp_store import otp_state_store
+
+        otp_state_store.close_mobile(self.username)
+
+    def mark_for_deletion(self) -> None:
+        """Lock the user out while ``delete_in_batches_task`` deletes their data."""
+        self.is_active = False
+        self.save(update_fields=["is_active"])
 
-class AuthRequest(UUIDPrimaryKeyMixin, Timestampable, models.Model):
+    def invalidate_snapshot(self, user_id: uuid.UUID | None = None) -> None:
+        """
+        Drop the cached snapshot of the user now and again once the transaction commits, so a request that cached
+        the old row in between doesn't keep it.
+        """
+        from apps.user.snapshot import user_snapshot_cache
+
+        user_id = user_id or self.id
+        assert user_id is not None
+        user_snapshot_cache.delete(user_id)
+        transaction.on_commit(partial(user_snapshot_cache.delete, user_id))
+
+
+class AuthRequest(TimeOrderedUUIDPrimaryKeyMixin, Timestampable, models.Model):
     """Data history of each authentication request."""
 
     class Meta:
         verbose_name = _("Auth Request")
         verbose_name_plural = _("Auth Requests")
+        indexes = [
+            # Admin ordering and the keyset iteration of the archive task.
+            models.Index(
+                fields=["created_at", "id"], name="authrequest_created_at_idx"
+            ),
+            # Admin search, as on User.
+            GinIndex(
+                OpClass(Upper("mobile"), name="gin_trgm_ops"),
+                name="authrequest_mobile_trgm_idx",
+            ),
+            models.Index(
+                fields=["mobile"],
+                opclasses=["varchar_pattern_ops"],
+                name="authrequest_mobile_like_idx",
+            ),
+        ]
 
     class RequestStatuses(models.TextChoices):
         PENDING = "pending", _("Pending")
+        # The code was verified.
         COMPLETED = "completed", _("Completed")
+        # Closed without its code verified: it expired, or a code sent later logged the user in.
+        CLOSED = "closed", _("Closed")
+
+    class DeliveryStatuses(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed")
 
     mobile = models.CharField(max_length=11, validators=[MobileValidator()])
     otp_code = models.CharField(max_length=6, null=True, blank=True)
@@ -77,6 +167,18 @@ class AuthRequest(UUIDPrimaryKeyMixin, Timestampable, models.Model):
     request_status = models.CharField(
         max_length=10, choices=RequestStatuses.choices, default=RequestStatuses.PENDING
     )
+    delivery_status = models.CharField(
+        max_length=10,
+        choices=DeliveryStatuses.choices,
+        default=DeliveryStatuses.QUEUED,
+        verbose_name=_("Delivery status"),
+    )
+    resend_count = models.PositiveSmallIntegerField(
+        default=0, verbose_name=_("Resend count")
+    )
+    # Not a column, the id of the registered user is kept with the pending request in the OTP state store. It's read
+    # back from there as a string.
+    user_id: uuid.UUID | str | None = None
 
     def __str__(self) -> str:
         return self.mobile + " - " + str(self.created_at)
@@ -85,37 +187,287 @@ class AuthRequest(UUIDPrimaryKeyMixin, Timestampable, models.Model):
         return timezone.now() > self.expire_datetime
 
     def is_closed(self) -> bool:
-        return self.request_status == self.RequestStatuses.COMPLETED
+        return self.request_status != self.RequestStatuses.PENDING
+
+    def persist(self, *fields: str) -> None:
+        """
+        Write the request to the OTP state store, pending requests only live in redis. A new request is stored as a
+        whole and later calls only write the given fields. The row is inserted by ``flush_otp_requests_task`` once the
+        request is completed or expired.
+        """
+        from apps.user.otp_store import otp_state_store
+
+        otp_state_store.save(self, fields)
 
     def close_request(self) -> None:
-        self.request_status = self.RequestStatuses.COMPLETED
-        self.save()
+        self.request_status = self.RequestStatuses.CLOSED
+        self.persist("request_status")
+
+    def claim_request(self) -> bool:
+        """
+        Close the request if it's still pending. Of concurrent submissions of the same code only one gets ``True``,
+        so the code logs in (and signs up) exactly once.
+        """
+        from apps.user.otp_store import otp_state_store
+
+        return otp_state_store.close(self)
 
     def send_otp_code(self) -> None:
-        result: SMSServiceResult = SMSService.send_otp_code(self.mobile)
+        """Deliver the stored OTP code (or a freshly generated one) through the SMS service right away."""
+        result: SMSServiceResult = SMSService.send_otp_code(self.mobile, self.otp_code)
         self.otp_code = result.kwargs["otp_code"]
-        self.save()
+        self.delivery_status = self.DeliveryStatuses.SENT
+        self.persist("otp_code", "delivery_status")
 
     def resend_otp_code(self) -> None:
         result: SMSServiceResult = SMSService.send_otp_code(self.mobile)
         self.otp_code = result.kwargs["otp_code"]
         self.expire_datetime = two_min_from_now()
-        self.save()
+        self.resend_count += 1
+        self.delivery_status = self.DeliveryStatuses.SENT
+        self.persist("otp_code", "expire_datetime", "delivery_status", "resend_count")
 
-    def get_user_or_none(self) -> User | None:
-        user: User | None = User.objects.filter(username=self.mobile).last()
-        return user
+    def prepare_otp_code(self, reset_expiry: bool = False) -> None:
+        """Store a fresh OTP code waiting to be delivered."""
+        self.otp_code = OTPCode.generate()
+        self.delivery_status = self.DeliveryStatuses.QUEUED
+        fields = ["otp_code", "delivery_status"]
+        if reset_expiry:
+            self.expire_datetime = two_min_from_now()
+            self.resend_count += 1
+            fields += ["expire_datetime", "resend_count"]
+        self.persist(*fields)
+
+    def queue_otp_code(self, reset_expiry: bool = False) -> None:
+        """
+        Store a fresh OTP code and hand its delivery to celery. The task is only published once the current
+        transaction commits, so the request never waits on the SMS provider.
+        """
+        from apps.user.tasks import send_otp_code_task
+
+        self.prepare_otp_code(reset_expiry=reset_expiry)
+        transaction.on_commit(lambda: send_otp_code_task.delay(str(self.id)))
 
-    def create_new_user(self) -> User:
-        user: User = User.objects.create(
+    async def adeliver_otp_code(self) -> None:
+        """
+        Deliver the prepared OTP code from an async view. Waiting on the provider only suspends the coroutine, and
+        a failed send falls back to the celery task, so the code still gets its retries.
+        """
+        from apps.user.tasks import send_otp_code_task
+
+        try:
+            await SMSService.async_send_otp_code(self.mobile, self.otp_code)
+        except SMSServiceException:
+            await sync_to_async(send_otp_code_task.delay)(str(self.id))
+            return
+        self.delivery_status = self.DeliveryStatuses.SENT
+        await sync_to_async(self.persist)("delivery_status")
+
+    def mark_delivery_failed(self) -> None:
+        self.delivery_status = self.DeliveryStatuses.FAILED
+        self.persist("delivery_status")
+
+    def get_user(self) -> User | None:
+        """
+        The user with the request's mobile, with only its id and ``is_active``. One unordered lookup on the unique
+        username index.
+        """
+        users = User.objects.filter(username=self.mobile).only("id", "is_active")
+        return next(iter(users[:1]), None)
+
+    def upsert_user(self) -> User:
+        """
+        Create the user of the request with a single ``INSERT ... ON CONFLICT`` that returns its id. If someone signed
+        up with the same mobile in the meantime, their row is returned as it is instead of failing on the username,
+        with whether it's active.
+        """
+        user = User(
             username=self.mobile,
             first_name=self.first_name,
             last_name=self.last_name,
             national_code=self.national_code,
         )
+        fields = [field for field in User._meta.fields if field.concrete]
+        quote_name = connection.ops.quote_name
+        username = quote_name(User._meta.get_field("username").column)
+        sql = (
+            f"INSERT INTO {quote_name(User._meta.db_table)} "
+            f"({', '.join(quote_name(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({username}) DO UPDATE SET {username} = EXCLUDED.{username} "
+            f"RETURNING {quote_name(User._meta.get_field('id').column)}, xmax = 0, "
+            f"{quote_name(User._meta.get_field('is_active').column)}"
+        )
+        params = [
+            field.get_db_prep_save(field.pre_save(user, True), connection)
+            for field in fields
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            user_id, created, is_active = cursor.fetchone()
+        if not created:
+            user = User(id=user_id, username=self.mobile, is_active=is_active)
+        user._state.adding = False
         return user
 
     def disable_previous_codes(self) -> None:
-        AuthRequest.objects.filter(mobile=self.mobile).update(
-            request_status=AuthRequest.RequestStatuses.COMPLETED
+        from apps.user.otp_store import otp_state_store
+
+        otp_state_store.close_mobile(self.mobile)
+
+
+class AuthFunnelRollup(models.Model):
+    """
+    Counts of the auth requests created in an hour (UTC), kept up to date by ``rollup_auth_funnel_task``. They
+    outlive the archived requests, so the funnel can be read for any period without scanning ``AuthRequest``.
+    """
+
+    class Meta:
+        verbose_name = _("Auth Funnel Rollup")
+        verbose_name_plural = _("Auth Funnel Rollups")
+
+    hour = models.DateTimeField(unique=True, verbose_name=_("Hour"))
+    requests = models.PositiveIntegerField(default=0, verbose_name=_("Requests"))
+    resends = models.PositiveIntegerField(default=0, verbose_name=_("Resends"))
+    completions = models.PositiveIntegerField(default=0, verbose_name=_("Completions"))
+    expirations = models.PositiveIntegerField(default=0, verbose_name=_("Expirations"))
+    registrations = models.PositiveIntegerField(
+        default=0, verbose_name=_("Registrations")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.hour:%Y-%m-%d %H:00}"
+
+
+class UserDataExportStorage(FileSystemStorage):
+    """Exports hold personal data, they're kept out of ``MEDIA_ROOT`` and only served to their user."""
+
+    @property
+    def base_location(self) -> str:
+        return settings.USER_DATA_EXPORT_ROOT
+
+    @property
+    def location(self) -> str:
+        return os.path.abspath(self.base_location)
+
+
+def get_user_data_export_storage() -> FileSystemStorage:
+    return UserDataExportStorage()
+
+
+class UserDataExport(TimeOrderedUUIDPrimaryKeyMixin, Timestampable, models.Model):
+    """A ZIP archive of a user's data, built in the background by ``build_user_data_export_task``."""
+
+    class Meta:
+        verbose_name = _("User Data Export")
+        verbose_name_plural = _("User Data Exports")
+
+    class Statuses(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        READY = "ready", _("Ready")
+        FAILED = "failed", _("Failed")
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="data_exports"
+    )
+    status = models.CharField(
+        max_length=10, choices=Statuses.choices, default=Statuses.PENDING
+    )
+    file = models.FileField(
+        upload_to="users/exports/", storage=get_user_data_export_storage, blank=True
+    )
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.user_id} - {self.created_at}"
+
+    @property
+    def expire_datetime(self) -> datetime:
+        return self.created_at + timedelta(days=settings.USER_DATA_EXPORT_TTL_DAYS)
+
+    def is_expired(self) -> bool:
+        return timezone.now() > self.expire_datetime
+
+    def is_ready(self) -> bool:
+        return self.status == self.Statuses.READY and not self.is_expired()
+
+
+class DeletionJob(TimeOrderedUUIDPrimaryKeyMixin, Timestampable, models.Model):
+    """
+    Deletion of an object and everything that cascades from it, run in batches by ``delete_in_batches_task``. The
+    object is marked for deletion when the job is scheduled, the counts of the deleted rows are kept as progress.
+    """
+
+    class Meta:
+        verbose_name = _("Deletion Job")
+        verbose_name_plural = _("Deletion Jobs")
+
+    class Statuses(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        RUNNING = "running", _("Running")
+        COMPLETED = "completed", _("Completed")
+        FAILED = "failed", _("Failed")
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=64)
+    object_repr = models.CharField(max_length=255, verbose_name=_("Object"))
+    requested_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    status = models.CharField(
+        max_length=10, choices=Statuses.choices, default=Statuses.PENDING
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name=_("Total"))
+    # Deleted rows by model label, as returned by QuerySet.delete().
+    deleted = models.JSONField(default=dict, verbose_name=_("Deleted"))
+
+    def __str__(self) -> str:
+        return f"{self.content_type} {self.object_repr}"
+
+    @classmethod
+    def schedule(
+        cls, obj: models.Model, requested_by: User | None = None
+    ) -> DeletionJob:
+        """Mark the object for deletion and queue the job once the transaction commits."""
+        from apps.user.deletion import count_cascade
+        from apps.user.tasks import delete_in_batches_task
+
+        content_type = ContentType.objects.get_for_model(obj)
+        existing = cls.objects.filter(
+            content_type=content_type,
+            object_id=str(obj.pk),
+            status__in=[cls.Statuses.PENDING, cls.Statuses.RUNNING],
+        ).first()
+        if existing is not None:
+            return existing
+        if mark_for_deletion := getattr(obj, "mark_for_deletion", None):
+            mark_for_deletion()
+        job = cls.objects.create(
+            content_type=content_type,
+            object_id=str(obj.pk),
+            object_repr=str(obj)[:255],
+            requested_by=requested_by,
+            total=sum(count_cascade(type(obj), [obj.pk]).values()) + 1,
         )
+        transaction.on_commit(lambda: delete_in_batches_task.delay(str(job.id)))
+        return job
+
+    def get_object(self) -> models.Model | None:
+        model = self.content_type.model_class()
+        assert model is not None
+        return model._base_manager.filter(pk=self.object_id).first()
+
+    @property
+    def deleted_count(self) -> int:
+        return sum(self.deleted.values())
+
+    @property
+    def progress(self) -> float:
+        return min(self.deleted_count / self.total, 1.0) if self.total else 0.0
+
+    def add_progress(self, counts: dict[str, int]) -> None:
+        for label, count in counts.items():
+            if count:
+                self.deleted[label] = self.deleted.get(label, 0) + count
+        self.save(update_fields=["deleted", "updated_at"])
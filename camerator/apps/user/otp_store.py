@@ -0,0 +1,319 @@
+"""
+State of pending auth requests. Every step of the OTP flow (code sent, resent, verified) only touches a redis hash
+that expires with the request, and ``flush_otp_requests_task`` writes completed and expired requests to the
+``AuthRequest`` table in batches, so the table is an audit trail that costs one insert per request. Expired requests
+are kept for ``OTP_RESEND_WINDOW`` first, since their code can still be resent.
+"""
+import json
+import uuid
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import cast
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Field
+from django.utils import timezone
+from redis import Redis
+
+from apps.user.models import AuthRequest
+from utils.redis import get_redis_connection, redis_key
+
+# Updates a request only while its hash exists, so a late write never brings back a flushed or expired request.
+# KEYS: request hash, flush queue, mobile index. ARGV: request id, expire timestamp or "", flush score or "",
+# then field/value pairs.
+UPDATE_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 0 then
+    return 0
+end
+redis.call("hset", KEYS[1], unpack(ARGV, 4))
+if ARGV[2] ~= "" then
+    redis.call("expireat", KEYS[1], ARGV[2])
+    redis.call("sadd", KEYS[3], ARGV[1])
+    redis.call("expireat", KEYS[3], ARGV[2])
+end
+if ARGV[3] ~= "" then
+    redis.call("zadd", KEYS[2], ARGV[3], ARGV[1])
+end
+return 1
+"""
+
+# Drops flushed requests, unless they were given a later flush score (a resent code) while the batch was written.
+# KEYS: flush queue, then the request hashes. ARGV: max score, then the request ids.
+REMOVE_SCRIPT = """
+for i = 2, #KEYS do
+    local score = redis.call("zscore", KEYS[1], ARGV[i])
+    if score and tonumber(score) <= tonumber(ARGV[1]) then
+        redis.call("zrem", KEYS[1], ARGV[i])
+        redis.call("del", KEYS[i])
+    end
+end
+return 1
+"""
+
+# Closes a request only while it's pending, so of concurrent callers exactly one gets 1.
+# KEYS: request hash, flush queue. ARGV: request id, pending status, closed status, updated_at.
+CLOSE_SCRIPT = """
+if redis.call("hget", KEYS[1], "request_status") ~= ARGV[2] then
+    return 0
+end
+redis.call("hset", KEYS[1], "request_status", ARGV[3], "updated_at", ARGV[4])
+redis.call("zadd", KEYS[2], 0, ARGV[1])
+return 1
+"""
+
+
+class OTPStateStore:
+    fields = [
+        "mobile",
+        "otp_code",
+        "first_name",
+        "last_name",
+        "national_code",
+        "expire_datetime",
+        "user_is_registered",
+        "request_status",
+        "delivery_status",
+        "resend_count",
+        "created_at",
+        "updated_at",
+    ]
+    # Columns added after requests were already stored, hashes written before them are read with the field default.
+    optional_fields = ["resend_count"]
+    # Not columns of AuthRequest, only kept so the code endpoint doesn't have to look the user up again.
+    extra_fields = ["user_id"]
+
+    def __init__(self, connection: Redis | None = None):
+        self._connection = connection
+
+    @property
+    def redis(self) -> Redis:
+        return self._connection or get_redis_connection()
+
+    @staticmethod
+    def request_key(auth_request_id: uuid.UUID | str) -> str:
+        return redis_key("otp", "request", auth_request_id)
+
+    @staticmethod
+    def mobile_key(mobile: str) -> str:
+        return redis_key("otp", "mobile", mobile)
+
+    @property
+    def flush_key(self) -> str:
+        return redis_key("otp", "flush")
+
+    def get(self, auth_request_id: uuid.UUID | str) -> AuthRequest | None:
+        data = self.redis.hgetall(self.request_key(auth_request_id))
+        return self.load(auth_request_id, data)
+
+    def save(self, auth_request: AuthRequest, fields: Iterable[str] = ()) -> None:
+        """Store a new request as a whole, or only the given fields of one that's already stored."""
+        now = timezone.now()
+        auth_request.updated_at = now
+        if auth_request._state.adding:
+            auth_request.created_at = auth_request.created_at or now
+            self.add(auth_request)
+            auth_request._state.adding = False
+            return
+
+        fields = list(fields) + ["updated_at"]
+        expire_at: int | float | str = ""
+        if "expire_datetime" in fields:
+            expire_at = self.get_expire_timestamp(auth_request)
+        flush_score: int | float | str = ""
+        if "request_status" in fields and auth_request.is_closed():
+            flush_score = 0
+        elif "expire_datetime" in fields:
+            flush_score = self.get_flush_timestamp(auth_request)
+        args: list[str | bytes | int | float] = [
+            str(auth_request.id),
+            expire_at,
+            flush_score,
+        ]
+        for field, value in self.dump(auth_request, fields).items():
+            args += [field, value]
+        self.redis.eval(
+            UPDATE_SCRIPT,
+            3,
+            self.request_key(auth_request.id),
+            self.flush_key,
+            self.mobile_key(auth_request.mobile),
+            *args,
+        )
+
+    def add(self, auth_request: AuthRequest) -> None:
+        request_key = self.request_key(auth_request.id)
+        mobile_key = self.mobile_key(auth_request.mobile)
+        expire_at = self.get_expire_timestamp(auth_request)
+        flush_score = self.get_flush_timestamp(auth_request)
+        pipe = self.redis.pipeline()
+        pipe.hset(
+            request_key,
+            mapping=self.dump(auth_request, self.fields + self.extra_fields),
+        )
+        pipe.expireat(request_key, expire_at)
+        pipe.sadd(mobile_key, str(auth_request.id))
+        pipe.expireat(mobile_key, expire_at)
+        pipe.zadd(self.flush_key, {str(auth_request.id): flush_score})
+        pipe.execute()
+
+    def close(self, auth_request: AuthRequest) -> bool:
+        """Complete a pending request as verified, returns whether this call closed it."""
+        auth_request.request_status = AuthRequest.RequestStatuses.COMPLETED
+        auth_request.updated_at = timezone.now()
+        values = self.dump(auth_request, ["request_status", "updated_at"])
+        return bool(
+            self.redis.eval(
+                CLOSE_SCRIPT,
+                2,
+                self.request_key(auth_request.id),
+                self.flush_key,
+                str(auth_request.id),
+                json.dumps(AuthRequest.RequestStatuses.PENDING),
+                values["request_status"],
+                values["updated_at"],
+            )
+        )
+
+    def close_mobile(self, mobile: str) -> None:
+        """
+        Close every pending request of a mobile number without verifying it, so only one OTP code can ever log the
+        user in. The request that did is already completed and kept as it is.
+        """
+        auth_request_ids = [
+            auth_request_id.decode()
+            for auth_request_id in self.redis.smembers(self.mobile_key(mobile))
+        ]
+        pending = json.dumps(AuthRequest.RequestStatuses.PENDING)
+        closed = json.dumps(AuthRequest.RequestStatuses.CLOSED)
+        updated_at = json.dumps(timezone.now(), default=str)
+        pipe = self.redis.pipeline()
+        for auth_request_id in auth_request_ids:
+            pipe.eval(
+                CLOSE_SCRIPT,
+                2,
+                self.request_key(auth_request_id),
+                self.flush_key,
+                auth_request_id,
+                pending,
+                closed,
+                updated_at,
+            )
+        pipe.execute()
+
+    def flush(self, batch_size: int | None = None) -> int:
+        """
+        Write one batch of completed and expired requests to the database and drop them from redis. Requests that
+        were flushed before (a worker died between the insert and the cleanup) are skipped by their primary key.
+        Returns how many requests were taken from the queue.
+        """
+        batch_size = batch_size or settings.OTP_STATE_FLUSH_BATCH_SIZE
+        max_score = timezone.now().timestamp()
+        auth_request_ids = [
+            auth_request_id.decode()
+            for auth_request_id in self.redis.zrangebyscore(
+                self.flush_key, "-inf", max_score, start=0, num=batch_size
+            )
+        ]
+        if not auth_request_ids:
+            return 0
+
+        pipe = self.redis.pipeline()
+        for auth_request_id in auth_request_ids:
+            pipe.hgetall(self.request_key(auth_request_id))
+        auth_requests = [
+            auth_request
+            for auth_request_id, data in zip(auth_request_ids, pipe.execute())
+            if (auth_request := self.load(auth_request_id, data)) is not None
+        ]
+        # Still pending past their resend window, they expired without being verified.
+        for auth_request in auth_requests:
+            if not auth_request.is_closed():
+                auth_request.request_status = AuthRequest.RequestStatuses.CLOSED
+        if auth_requests:
+            self.write(auth_requests)
+
+        self.redis.eval(
+            REMOVE_SCRIPT,
+            len(auth_request_ids) + 1,
+            self.flush_key,
+            *[
+                self.request_key(auth_request_id)
+                for auth_request_id in auth_request_ids
+            ],
+            max_score,
+            *auth_request_ids,
+        )
+        return len(auth_request_ids)
+
+    @staticmethod
+    def write(auth_requests: list[AuthRequest]) -> None:
+        """
+        Insert the requests with a single ``INSERT ... ON CONFLICT DO NOTHING``. Unlike ``bulk_create`` it writes the
+        timestamps the requests were stored with rather than the ``auto_now`` ones.
+        """
+        fields = [field for field in AuthRequest._meta.fields if field.concrete]
+        quote_name = connection.ops.quote_name
+        row = f"({', '.join(['%s'] * len(fields))})"
+        sql = (
+            f"INSERT INTO {quote_name(AuthRequest._meta.db_table)} "
+            f"({', '.join(quote_name(field.column) for field in fields)}) "
+            f"VALUES {', '.join([row] * len(auth_requests))} "
+            f"ON CONFLICT ({quote_name(AuthRequest._meta.get_field('id').column)}) DO NOTHING"
+        )
+        params = [
+            field.get_db_prep_save(getattr(auth_request, field.attname), connection)
+            for auth_request in auth_requests
+            for field in fields
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def get_flush_timestamp(auth_request: AuthRequest) -> float:
+        flush_at = auth_request.expire_datetime + timedelta(
+            seconds=settings.OTP_RESEND_WINDOW
+        )
+        return flush_at.timestamp()
+
+    def get_expire_timestamp(self, auth_request: AuthRequest) -> int:
+        return int(
+            self.get_flush_timestamp(auth_request) + settings.OTP_STATE_FLUSH_GRACE
+        )
+
+    @staticmethod
+    def dump(
+        auth_request: AuthRequest, fields: Iterable[str]
+    ) -> dict[str | bytes, str]:
+        return {
+            field: json.dumps(getattr(auth_request, field, None), default=str)
+            for field in fields
+        }
+
+    def load(
+        self, auth_request_id: uuid.UUID | str, data: dict[bytes, bytes]
+    ) -> AuthRequest | None:
+        values = {key.decode(): json.loads(value) for key, value in data.items()}
+        # A hash without all of its fields is a leftover of a request that's already gone.
+        if not set(self.fields).difference(self.optional_fields).issubset(values):
+            return None
+        model_fields = {
+            field: cast(Field, AuthRequest._meta.get_field(field))
+            for field in self.fields
+        }
+        for field in self.optional_fields:
+            values.setdefault(field, model_fields[field].get_default())
+        auth_request = AuthRequest(
+            id=uuid.UUID(str(auth_request_id)),
+            **{
+                field: model_fields[field].to_python(values[field])
+                for field in self.fields
+            },
+        )
+        for field in self.extra_fields:
+            setattr(auth_request, field, values.get(field))
+        auth_request._state.adding = False
+        return auth_request
+
+
+otp_state_store = OTPStateStore()
@@ -0,0 +1,145 @@
+"""
+Revoked tokens. Every revoked ``jti`` is a redis key that expires with its token, so the store never holds more than
+the revoked tokens that would still be valid. Each process keeps a Bloom filter of the revoked jtis in front of it,
+synced from the revocation log at most every ``TOKEN_REVOCATION_SYNC_INTERVAL`` seconds: a token that isn't in the
+filter, which is nearly every token, is known not to be revoked without a round trip to redis.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from redis import RedisError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+
+from utils.bloom import BloomFilter
+from utils.redis import get_redis_connection, redis_key
+
+logger = logging.getLogger(__name__)
+
+# Entries up to this many seconds older than the last one seen are read again on every sync, so a revocation that got
+# an earlier timestamp than one already synced (redis clock adjustments) isn't missed. Adding a jti twice is harmless.
+SYNC_OVERLAP = 1.0
+
+# Entries of expired tokens pruned from the revocation log by each revocation at most.
+PRUNE_BATCH_SIZE = 1000
+
+# KEYS: jti key, revocation log, expiry index. ARGV: jti, ttl, prune batch size.
+# The log is scored by the time of revocation for the syncs, and the expiry index by when the revoked token expires.
+# Entries are dropped from both once their token expired, so the log only holds revocations that still matter.
+REVOKE_SCRIPT = """
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("set", KEYS[1], "1", "EX", ARGV[2])
+redis.call("zadd", KEYS[2], now, ARGV[1])
+redis.call("zadd", KEYS[3], now + tonumber(ARGV[2]), ARGV[1])
+local expired = redis.call("zrangebyscore", KEYS[3], "-inf", now, "LIMIT", 0, tonumber(ARGV[3]))
+if #expired > 0 then
+    redis.call("zrem", KEYS[2], unpack(expired))
+    redis.call("zrem", KEYS[3], unpack(expired))
+end
+return 1
+"""
+
+
+class TokenRevocationStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom: BloomFilter | None = None
+        # REDIS_KEY_PREFIX the filter was built for, tests give every case its own.
+        self.prefix: str | None = None
+        self.log_position = 0.0
+        self.synced_at = 0.0
+
+    @staticmethod
+    def jti_key(jti: str) -> str:
+        return redis_key("token", "revoked", jti)
+
+    @property
+    def log_key(self) -> str:
+        return redis_key("token", "revocations")
+
+    @property
+    def expiry_key(self) -> str:
+        return redis_key("token", "revocations", "expiry")
+
+    def revoke(self, token: Token) -> None:
+        ttl = int(token["exp"] - time.time()) + 1
+        if ttl <= 0:
+            return
+        jti = token[api_settings.JTI_CLAIM]
+        get_redis_connection().eval(
+            REVOKE_SCRIPT,
+            3,
+            self.jti_key(jti),
+            self.log_key,
+            self.expiry_key,
+            jti,
+            ttl,
+            PRUNE_BATCH_SIZE,
+        )
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        bloom = self.get_bloom()
+        if bloom is not None and jti not in bloom:
+            return False
+        try:
+            return bool(get_redis_connection().exists(self.jti_key(jti)))
+        except RedisError:
+            logger.exception("Token revocations can't be read from redis.")
+            # With redis down, tokens the filter has as revoked are rejected and all the others let through.
+            return bloom is not None
+
+    def get_bloom(self) -> BloomFilter | None:
+        if not self.is_stale():
+            return self.bloom
+        with self.lock:
+            if self.is_stale():
+                try:
+                    self.sync()
+                except RedisError:
+                    logger.exception("Token revocations can't be synced from redis.")
+                    self.synced_at = time.monotonic()
+        return self.bloom
+
+    def is_stale(self) -> bool:
+        return (
+            self.bloom is None
+            or self.prefix != settings.REDIS_KEY_PREFIX
+            or time.monotonic() - self.synced_at
+            >= settings.TOKEN_REVOCATION_SYNC_INTERVAL
+        )
+
+    def sync(self) -> None:
+        """Add the revocations made since the last sync to the filter, or build it anew from the whole log."""
+        redis = get_redis_connection()
+        bloom = self.bloom
+        if bloom is None or bloom.is_full or self.prefix != settings.REDIS_KEY_PREFIX:
+            entries = redis.zrange(self.log_key, 0, -1, withscores=True)
+            bloom = BloomFilter(
+                max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, len(entries) * 2),
+                settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+            )
+            log_position = 0.0
+        else:
+            entries = redis.zrangebyscore(
+                self.log_key,
+                self.log_position - SYNC_OVERLAP,
+                "+inf",
+                withscores=True,
+            )
+            log_position = self.log_position
+        for jti, score in entries:
+            bloom.add(jti.decode())
+            log_position = max(log_position, score)
+        self.bloom = bloom
+        self.prefix = settings.REDIS_KEY_PREFIX
+        self.log_position = log_position
+        self.synced_at = time.monotonic()
+
+
+token_revocation_store = TokenRevocationStore()
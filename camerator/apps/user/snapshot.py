@@ -0,0 +1,83 @@
+"""
+Snapshots of users cached in redis, so authenticated requests that need more than the id in the token don't have to
+select the user from the database on every call. ``User.save`` and ``User.delete`` drop the snapshot, updates that
+skip them (``QuerySet.update``) are picked up once it expires.
+"""
+import json
+import logging
+import uuid
+from typing import cast
+
+from django.conf import settings
+from django.db.models import Field
+from redis import RedisError
+
+from apps.user.models import User
+from utils.redis import get_redis_connection, redis_key
+
+logger = logging.getLogger(__name__)
+
+
+class UserSnapshotCache:
+    # Password hashes stay out of redis, a snapshot user loads its password from the database if it's ever needed.
+    exclude = ["password"]
+
+    @property
+    def fields(self) -> list[str]:
+        return [
+            field.attname
+            for field in User._meta.fields
+            if field.concrete and field.attname not in self.exclude
+        ]
+
+    @staticmethod
+    def key(user_id: uuid.UUID | str) -> str:
+        return redis_key("user", "snapshot", user_id)
+
+    def get(self, user_id: uuid.UUID | str) -> User | None:
+        """The cached snapshot of the user, it's selected and cached on a miss. ``None`` if there's no such user."""
+        try:
+            data = get_redis_connection().get(self.key(user_id))
+        except RedisError:
+            logger.exception("User snapshot of %s can't be read from redis.", user_id)
+            return User.objects.filter(id=user_id).first()
+        if data is not None:
+            return self.load(json.loads(data))
+
+        user = User.objects.filter(id=user_id).only(*self.fields).first()
+        if user is not None:
+            self.set(user)
+        return user
+
+    def set(self, user: User) -> None:
+        data = json.dumps(
+            {field: getattr(user, field) for field in self.fields}, default=str
+        )
+        try:
+            get_redis_connection().set(
+                self.key(user.id), data, ex=settings.USER_SNAPSHOT_TTL
+            )
+        except RedisError:
+            logger.exception("User snapshot of %s can't be written to redis.", user.id)
+
+    def delete(self, user_id: uuid.UUID | str) -> None:
+        try:
+            get_redis_connection().delete(self.key(user_id))
+        except RedisError:
+            logger.exception(
+                "User snapshot of %s can't be deleted from redis.", user_id
+            )
+
+    def load(self, data: dict) -> User:
+        # Built like a row of the database with the password deferred, so saving it never writes an empty password.
+        return User.from_db(
+            "default",
+            self.fields,
+            [
+                cast(Field, User._meta.get_field(field)).to_python(data[field])
+                for field in self.fields
+            ],
+        )
+
+
+user_snapshot_cache = UserSnapshotCache()
@@ -0,0 +1,142 @@
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.utils import timezone
+
+from apps.user.archive import archive_auth_requests
+from apps.user.deletion import run_deletion_job
+from apps.user.exports import build_user_data_export, delete_expired_user_data_exports
+from apps.user.models import AuthRequest, DeletionJob, UserDataExport
+from apps.user.otp_store import otp_state_store
+from apps.user.rollups import rollup_auth_funnel
+from services.sms_service import SMSServiceException
+from utils.redis import get_redis_connection, redis_key
+
+
+@shared_task(
+    bind=True, max_retries=settings.OTP_DELIVERY_MAX_RETRIES, ignore_result=True
+)
+def send_otp_code_task(self, auth_request_id: str) -> None:
+    """
+    Deliver the OTP code of an auth request through the SMS service. Provider failures are retried with an
+    exponential backoff until the request expires or the retries run out, after which the delivery is marked failed.
+    """
+    auth_request: AuthRequest | None = otp_state_store.get(auth_request_id)
+    if auth_request is None or auth_request.is_closed() or auth_request.is_expired():
+        return
+
+    try:
+        auth_request.send_otp_code()
+    except SMSServiceException as ex:
+        if self.request.retries >= self.max_retries:
+            auth_request.mark_delivery_failed()
+            return
+        countdown = get_exponential_backoff_interval(
+            factor=settings.OTP_DELIVERY_RETRY_BACKOFF,
+            retries=self.request.retries,
+            maximum=settings.OTP_DELIVERY_RETRY_BACKOFF_MAX,
+            full_jitter=True,
+        )
+        raise self.retry(exc=ex, countdown=countdown)
+
+
+@shared_task(ignore_result=True)
+def flush_otp_requests_task() -> int:
+    """
+    Write completed and expired auth requests from the OTP state store to the database, one batch per transaction
+    until the queue is drained. Runs every minute from celery beat.
+    """
+    flushed = 0
+    while count := otp_state_store.flush(settings.OTP_STATE_FLUSH_BATCH_SIZE):
+        flushed += count
+        if count < settings.OTP_STATE_FLUSH_BATCH_SIZE:
+            break
+    return flushed
+
+
+@shared_task(ignore_result=True)
+def archive_auth_requests_task() -> int:
+    """Move finished auth requests past their retention to archive files. Runs every hour from celery beat."""
+    lock = get_redis_connection().lock(
+        redis_key("lock", "archive-auth-requests"),
+        timeout=settings.CELERY_TASK_TIME_LIMIT,
+        blocking=False,
+    )
+    # A run that's still going on another worker covers this one.
+    if not lock.acquire():
+        return 0
+    try:
+        return archive_auth_requests()
+    finally:
+        lock.release()
+
+
+@shared_task(ignore_result=True)
+def rollup_auth_funnel_task() -> int:
+    """Count the auth funnel of the recent hours into ``AuthFunnelRollup``. Runs every few minutes from celery beat."""
+    return rollup_auth_funnel(timezone.now())
+
+
+@shared_task(
+    ignore_result=True,
+    soft_time_limit=settings.USER_DATA_EXPORT_TIME_LIMIT,
+    time_limit=settings.USER_DATA_EXPORT_TIME_LIMIT + 60,
+)
+def build_user_data_export_task(export_id: str) -> None:
+    """Build the archive of a pending data export, a failed build is marked so the user can ask for another one."""
+    export = (
+        UserDataExport.objects.select_related("user")
+        .filter(id=export_id, status=UserDataExport.Statuses.PENDING)
+        .first()
+    )
+    if export is None:
+        return
+    try:
+        build_user_data_export(export)
+    except Exception:
+        UserDataExport.objects.filter(id=export.id).update(
+            status=UserDataExport.Statuses.FAILED, updated_at=timezone.now()
+        )
+        raise
+
+
+@shared_task(ignore_result=True)
+def delete_expired_user_data_exports_task() -> int:
+    """Delete data exports past their TTL and their files. Runs every day from celery beat."""
+    return delete_expired_user_data_exports()
+
+
+@shared_task(ignore_result=True)
+def delete_in_batches_task(job_id: str) -> None:
+    """
+    Run a deletion job for up to ``DELETION_MAX_BATCHES`` batches and queue the rest of it as a new task, so no run
+    gets near the time limits however much there is to delete.
+    """
+    lock = get_redis_connection().lock(
+        redis_key("lock", "deletion-job", job_id),
+        timeout=settings.CELERY_TASK_TIME_LIMIT,
+        blocking=False,
+    )
+    if not lock.acquire():
+        return
+    try:
+        job = (
+            DeletionJob.objects.filter(id=job_id)
+            .exclude(status=DeletionJob.Statuses.COMPLETED)
+            .first()
+        )
+        if job is None:
+            return
+        job.status = DeletionJob.Statuses.RUNNING
+        job.save(update_fields=["status", "updated_at"])
+        try:
+            finished = run_deletion_job(job, settings.DELETION_MAX_BATCHES)
+        except Exception:
+            DeletionJob.objects.filter(id=job.id).update(
+                status=DeletionJob.Statuses.FAILED, updated_at=timezone.now()
+            )
+            raise
+    finally:
+        lock.release()
+    if not finished:
+        delete_in_batches_task.delay(job_id)
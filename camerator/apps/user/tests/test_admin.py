@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from apps.blog.models import Comment, Post
+from apps.user.models import AuthRequest, DeletionJob, User
+from apps.user.tests.factories import UserFactory
+from utils.testcases import RedisTestCaseMixin
+
+
+class BatchDeletionAdminTestCase(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = UserFactory(is_superuser=True, is_staff=True)
+        self.client.force_login(self.admin)
+        self.user = UserFactory()
+        post = Post.objects.create(title="Post", author=self.user, image="a.jpg")
+        Comment.objects.create(post=post, name="N", email="n@example.com", body="B")
+
+    def test_confirmation_counts_what_will_be_deleted(self):
+        response = self.client.get(f"/admin/user/user/{self.user.id}/delete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Posts: 1")
+        self.assertContains(response, "Comments: 1")
+
+    @patch("apps.user.tasks.delete_in_batches_task.delay")
+    def test_delete_is_queued(self, delay_mock: MagicMock):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/admin/user/user/{self.user.id}/delete/", {"post": "yes"}
+            )
+        self.assertEqual(response.status_code, 302)
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.get_object(), self.user)
+        self.assertEqual(job.requested_by, self.admin)
+        delay_mock.assert_called_once_with(str(job.id))
+        self.assertFalse(User.objects.get(id=self.user.id).is_active)
+
+    @patch("apps.user.tasks.delete_in_batches_task.delay")
+    def test_delete_selected_is_queued(self, delay_mock: MagicMock):
+        posts = [
+            Post.objects.create(title=f"Post {number}", author=self.user, image="a.jpg")
+            for number in range(2)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/admin/blog/post/",
+                {
+                    "action": "delete_selected",
+                    "_selected_action": [post.id for post in posts],
+                    "post": "yes",
+                },
+            )
+        self.assertEqual(DeletionJob.objects.count(), 2)
+        self.assertEqual(delay_mock.call_count, 2)
+        self.assertEqual(Post.objects.count(), 3)
+
+
+class PrefixSearchAdminTestCase(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Every name and number is fixed, generated ones would match the searches now and then.
+        self.client.force_login(
+            UserFactory(
+                username="09990000000",
+                first_name="Admin",
+                last_name="Admin",
+                is_superuser=True,
+                is_staff=True,
+            )
+        )
+        self.ali = UserFactory(
+            username="09121112233",
+            first_name="Ali",
+            last_name="Rezaei",
+            national_code="0013542419",
+        )
+        self.sara = UserFactory(
+            username="09351112233",
+            first_name="Sara",
+            last_name="Ahmadi",
+            national_code="0499370899",
+        )
+
+    def search(self, term: str) -> list[User]:
+        response = self.client.get("/admin/user/user/", {"q": term})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["cl"].result_list)
+
+    def test_digits_match_by_prefix(self):
+        self.assertEqual(self.search("0912"), [self.ali])
+        self.assertEqual(self.search("۰۴۹۹"), [self.sara])
+        # Digits in the middle of a mobile don't match.
+        self.assertEqual(self.search("1112233"), [])
+
+    def test_other_terms_match_anywhere(self):
+        self.assertEqual(self.search("li"), [self.ali])
+        self.assertEqual(self.search("ara 0935"), [self.sara])
+        self.assertEqual(self.search("ara 0912"), [])
+
+    def test_auth_request_search(self):
+        AuthRequest.objects.create(mobile="09121112233")
+        response = self.client.get("/admin/user/authrequest/", {"q": "0912"})
+        self.assertEqual(response.context["cl"].result_count, 1)
@@ -1,15 +1,34 @@
+import asyncio
+import tempfile
+import threading
 import uuid
-from datetime import timedelta
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 from unittest.mock import MagicMock, patch
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from rest_framework.test import APIClient, APITestCase
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from apps.user.models import AuthRequest, User
+from apps.user.authentication import StatelessJWTAuthentication, UserRefreshToken
+from apps.user.models import AuthFunnelRollup, AuthRequest, User, UserDataExport
+from apps.user.otp_store import otp_state_store
+from apps.user.revocation import TokenRevocationStore, token_revocation_store
+from apps.user.snapshot import user_snapshot_cache
 from apps.user.tests.factories import UserFactory
 from services.kavenegar import KavenegarResult
-from utils.testcases import AppAPITestCase
+from services.kavenegar.exceptions import KavenegarRequestException
+from services.sms_service import SMSService, SMSServiceException
+from utils.bloom import BloomFilter
+from utils.redis import get_redis_connection
+from utils.testcases import AppAPITestCase, DashboardAPITestCase, QueryCountTestCaseMixin, RedisTestCaseMixin
+from utils.tests import test_concurrently
+from utils.throttling import RedisSlidingWindowThrottle
 
 
 class TestUserViewSet(AppAPITestCase):
@@ -39,9 +58,112 @@ class TestUserViewSet(AppAPITestCase):
         self.assertEqual(self.customer.username, previous_user_username)
         self.assertEqual(self.customer.national_code, "123")
 
+        response = self.client.get(url)
+        self.assertEqual(response.json()["first_name"], "FN")
+
+    def test_me_is_served_from_the_user_snapshot(self):
+        url = "/api/v1/users/me/"
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [query for query in queries if "user_user" in query["sql"]], queries
+        )
+        self.assertEqual(response.json()["username"], self.customer.username)
+
+    def test_identity_only_needs_the_token(self):
+        token = UserRefreshToken.for_user(self.customer).access_token
+        user = StatelessJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(user.id, self.customer.id)
+            self.assertEqual(user.username, self.customer.username)
+            self.assertTrue(user.is_authenticated)
+
+    def test_user_save_invalidates_the_snapshot(self):
+        self.assertEqual(
+            user_snapshot_cache.get(self.customer.id).first_name,
+            self.customer.first_name,
+        )
+        self.customer.first_name = "Changed"
+        self.customer.save()
+        self.assertEqual(
+            user_snapshot_cache.get(self.customer.id).first_name, "Changed"
+        )
+
+    def test_inactive_user_is_rejected(self):
+        self.customer.is_active = False
+        self.customer.save()
+        response = self.client.get("/api/v1/users/me/")
+        self.assertEqual(response.status_code, 401)
+        # Views that only need the id don't read the snapshot themselves.
+        response = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual(response.status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.customer.delete()
+        response = self.client.post("/api/v1/users/me/export/")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(UserDataExport.objects.exists())
+
+    @patch("apps.user.v1.user.build_user_data_export_task.delay")
+    def test_data_export(self, delay_mock: MagicMock):
+        url = "/api/v1/users/me/export/"
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 202)
+        export_id = response.json()["id"]
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertIsNone(response.json()["download_url"])
+        delay_mock.assert_called_once_with(export_id)
+
+        # Asking again while it's being built returns the same export.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url).json()["id"], export_id)
+        delay_mock.assert_called_once()
+        self.assertEqual(
+            self.client.get("/api/v1/users/me/export/download/").status_code, 404
+        )
+
+        with tempfile.TemporaryDirectory() as export_root, self.settings(
+            USER_DATA_EXPORT_ROOT=export_root
+        ):
+            export = UserDataExport.objects.get(id=export_id)
+            export.file.save("export.zip", ContentFile(b"zip"), save=False)
+            export.status = UserDataExport.Statuses.READY
+            export.save()
+
+            response = self.client.get(url).json()
+            self.assertEqual(response["status"], "ready")
+            self.assertTrue(
+                response["download_url"].endswith("/api/v1/users/me/export/download/")
+            )
+            response = self.client.get(response["download_url"])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b"".join(response.streaming_content), b"zip")
+            self.assertIn("attachment", response["Content-Disposition"])
+
+        other = UserDataExport.objects.create(user=UserFactory())
+        self.assertEqual(self.client.get(url).json()["id"], export_id)
+        self.assertNotEqual(other.id, export_id)
+
+    def test_data_export_without_its_file(self):
+        UserDataExport.objects.create(
+            user=self.customer,
+            status=UserDataExport.Statuses.READY,
+            file="users/exports/missing.zip",
+        )
+        with tempfile.TemporaryDirectory() as export_root, self.settings(
+            USER_DATA_EXPORT_ROOT=export_root
+        ):
+            response = self.client.get("/api/v1/users/me/export/download/")
+        self.assertEqual(response.status_code, 404)
+
 
-class TestAuthViewSet(APITestCase):
+class TestAuthViewSet(RedisTestCaseMixin, QueryCountTestCaseMixin, APITestCase):
     def setUp(self):
+        super().setUp()
         self.customer: User = UserFactory()
         self.client = APIClient()
 
@@ -89,6 +211,64 @@ class TestAuthViewSet(APITestCase):
         self.assertIn("user_is_registered", response)
         self.assertEqual(response["user_is_registered"], True)
 
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_get_mobile_queues_otp_delivery_after_commit(self, task_mock: MagicMock):
+        url = "/api/v1/auth/mobile/"
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                url, data={"mobile": "09123456789"}, format="json"
+            )
+            task_mock.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        response = response.json()
+        self.assertEqual(
+            response["delivery_status"], AuthRequest.DeliveryStatuses.QUEUED
+        )
+        auth_request = otp_state_store.get(response["id"])
+        self.assertIsNotNone(auth_request.otp_code)
+        self.assertFalse(AuthRequest.objects.exists())
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        task_mock.assert_called_once_with(response["id"])
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_get_mobile_with_idempotency_key(self, task_mock: MagicMock):
+        url = "/api/v1/auth/mobile/"
+        data = {"mobile": "09123456789"}
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(
+                url, data=data, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            retry = self.client.post(
+                url, data=data, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+            )
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        task_mock.assert_called_once_with(first.json()["id"])
+        self.assertFalse(otp_state_store.get(first.json()["id"]).is_closed())
+
+        # Another key, or the same key for another mobile, is another request.
+        other_key = self.client.post(
+            url, data=data, format="json", HTTP_IDEMPOTENCY_KEY="key-2"
+        )
+        other_mobile = self.client.post(
+            url,
+            data={"mobile": "09123456780"},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY="key-1",
+        )
+        ids = {first.json()["id"], other_key.json()["id"], other_mobile.json()["id"]}
+        self.assertEqual(len(ids), 3)
+
+        # Invalid requests are not stored.
+        response = self.client.post(
+            url, data={"mobile": "091"}, format="json", HTTP_IDEMPOTENCY_KEY="key-3"
+        )
+        self.assertEqual(response.status_code, 400)
+
     @patch("services.kavenegar.Kavenegar.send_request")
     def test_complete_auth_for_already_registered_users(
         self, kavenegar_mock: MagicMock
@@ -102,7 +282,7 @@ class TestAuthViewSet(APITestCase):
             mobile_url, data={"mobile": registered_mobile}, format="json"
         )
         auth_id = response.json()["id"]
-        otp_code = AuthRequest.objects.get(id=auth_id).otp_code
+        otp_code = otp_state_store.get(auth_id).otp_code
 
         url = f"/api/v1/auth/{auth_id}/code/"
         response = self.client.post(url, data={"otp_code": otp_code}, format="json")
@@ -115,6 +295,123 @@ class TestAuthViewSet(APITestCase):
         self.assertIn("user_is_registered", response)
         self.assertEqual(response["user_is_registered"], True)
 
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_auth_flow_query_budget(self, task_mock: MagicMock):
+        def post(url: str, data: dict, num: int) -> dict:
+            with self.assertNumStatements(num):
+                response = self.client.post(url, data=data, format="json")
+            self.assertEqual(response.status_code, 200, response.content)
+            return response.json() if response.content else {}
+
+        registered = post("/api/v1/auth/mobile/", {"mobile": self.customer.username}, 1)
+        otp_code = otp_state_store.get(registered["id"]).otp_code
+        post(f"/api/v1/auth/{registered['id']}/code/", {"otp_code": otp_code}, 0)
+
+        unregistered = post("/api/v1/auth/mobile/", {"mobile": "09123456789"}, 1)
+        auth_request = otp_state_store.get(unregistered["id"])
+        auth_request.expire_datetime = timezone.now()
+        auth_request.persist("expire_datetime")
+        post(f"/api/v1/auth/{unregistered['id']}/resend-code/", {}, 0)
+        data = {
+            "otp_code": otp_state_store.get(unregistered["id"]).otp_code,
+            "first_name": "First",
+            "last_name": "Last",
+            "national_code": "1234567890",
+        }
+        post(f"/api/v1/auth/{unregistered['id']}/code/", data, 1)
+        self.assertTrue(
+            User.objects.filter(username="09123456789", first_name="First").exists()
+        )
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_inactive_users_cannot_log_in(self, task_mock: MagicMock):
+        response = self.client.post(
+            "/api/v1/auth/mobile/", data={"mobile": self.customer.username}
+        )
+        auth_id = response.json()["id"]
+        otp_code = otp_state_store.get(auth_id).otp_code
+        self.customer.mark_for_deletion()
+
+        response = self.client.post(
+            f"/api/v1/auth/{auth_id}/code/", data={"otp_code": otp_code}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("access_token", response.json())
+
+        response = self.client.post(
+            "/api/v1/auth/mobile/", data={"mobile": self.customer.username}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["code"], "user_inactive")
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_sign_up_of_a_mobile_that_was_deactivated_meanwhile(
+        self, task_mock: MagicMock
+    ):
+        response = self.client.post(
+            "/api/v1/auth/mobile/", data={"mobile": "09123456789"}, format="json"
+        )
+        auth_id = response.json()["id"]
+        # Imported without User.save(), which would have closed the request.
+        User.objects.bulk_create(
+            [UserFactory.build(username="09123456789", is_active=False)]
+        )
+
+        data = {
+            "otp_code": otp_state_store.get(auth_id).otp_code,
+            "first_name": "First",
+            "last_name": "Last",
+            "national_code": "1234567890",
+        }
+        response = self.client.post(
+            f"/api/v1/auth/{auth_id}/code/", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["code"], "user_inactive")
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_sign_up_of_a_mobile_that_registered_meanwhile(self, task_mock: MagicMock):
+        response = self.client.post(
+            "/api/v1/auth/mobile/", data={"mobile": "09123456789"}, format="json"
+        )
+        auth_id = response.json()["id"]
+        user = UserFactory(username="09123456789")
+
+        data = {
+            "otp_code": otp_state_store.get(auth_id).otp_code,
+            "first_name": "First",
+            "last_name": "Last",
+            "national_code": "1234567890",
+        }
+        response = self.client.post(
+            f"/api/v1/auth/{auth_id}/code/", data=data, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        token = UserRefreshToken(response.json()["refresh_token"])
+        self.assertEqual(token["user_id"], str(user.id))
+        user.refresh_from_db()
+        self.assertNotEqual(user.first_name, "First")
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_complete_auth_does_not_query_auth_requests(self, task_mock: MagicMock):
+        response = self.client.post(
+            "/api/v1/auth/mobile/",
+            data={"mobile": self.customer.username},
+            format="json",
+        )
+        auth_id = response.json()["id"]
+        otp_code = otp_state_store.get(auth_id).otp_code
+
+        url = f"/api/v1/auth/{auth_id}/code/"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data={"otp_code": otp_code}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [query for query in queries if "user_" in query["sql"]], queries
+        )
+        self.assertTrue(otp_state_store.get(auth_id).is_closed())
+        self.assertFalse(AuthRequest.objects.filter(id=auth_id).exists())
+
     @patch("services.kavenegar.Kavenegar.send_request")
     def test_complete_auth_for_already_registered_users_with_wrong_data(
         self, kavenegar_mock: MagicMock
@@ -128,7 +425,7 @@ class TestAuthViewSet(APITestCase):
             mobile_url, data={"mobile": registered_mobile}, format="json"
         )
         auth_id = response.json()["id"]
-        auth_request = AuthRequest.objects.get(id=auth_id)
+        auth_request = otp_state_store.get(auth_id)
         otp_code = auth_request.otp_code
 
         # wrong auth_id type
@@ -185,7 +482,7 @@ class TestAuthViewSet(APITestCase):
             mobile_url, data={"mobile": unregistered_mobile}, format="json"
         )
         auth_id = response.json()["id"]
-        otp_code = AuthRequest.objects.get(id=auth_id).otp_code
+        otp_code = otp_state_store.get(auth_id).otp_code
 
         # Send request without first_name, last_name and national_code
         data = {"otp_code": otp_code}
@@ -279,7 +576,7 @@ class TestAuthViewSet(APITestCase):
             mobile_url, data={"mobile": registered_mobile}, format="json"
         )
         auth_id = response.json()["id"]
-        auth_request: AuthRequest = AuthRequest.objects.get(id=auth_id)
+        auth_request: AuthRequest = otp_state_store.get(auth_id)
         old_otp_code = auth_request.otp_code
 
         url = f"/api/v1/auth/{auth_id}/resend-code/"
@@ -295,10 +592,83 @@ class TestAuthViewSet(APITestCase):
         with patch("django.utils.timezone.now", return_value=faked_now):
             response = self.client.post(url)
         self.assertEqual(response.status_code, 200)
-        auth_request.refresh_from_db()
+        auth_request = otp_state_store.get(auth_id)
         self.assertEqual(auth_request.expire_datetime, faked_now + timedelta(minutes=5))
         self.assertNotEqual(old_otp_code, auth_request.otp_code)
 
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_resend_code_after_flush(self, task_mock: MagicMock):
+        response = self.client.post(
+            "/api/v1/auth/mobile/",
+            data={"mobile": self.customer.username},
+            format="json",
+        )
+        url = f"/api/v1/auth/{response.json()['id']}/resend-code/"
+
+        # Expired requests are kept for their resend window.
+        faked_now = timezone.now() + timedelta(minutes=6)
+        with patch("django.utils.timezone.now", return_value=faked_now):
+            self.assertEqual(otp_state_store.flush(), 0)
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+
+        faked_now += timedelta(minutes=6, seconds=settings.OTP_RESEND_WINDOW)
+        with patch("django.utils.timezone.now", return_value=faked_now):
+            self.assertEqual(otp_state_store.flush(), 1)
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 404)
+
+    @patch.object(
+        RedisSlidingWindowThrottle,
+        "THROTTLE_RATES",
+        {
+            "phone_number_verify_code_hourly": "2/hour",
+            "phone_number_verify_code_daily": "100/day",
+        },
+    )
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_otp_actions_are_throttled(self, task_mock: MagicMock):
+        mobile_url = "/api/v1/auth/mobile/"
+        mobile = self.customer.username
+        for _ in range(2):
+            response = self.client.post(
+                mobile_url, data={"mobile": mobile}, format="json"
+            )
+            self.assertEqual(response.status_code, 200)
+        auth_id = response.json()["id"]
+
+        # Throttled by mobile number, even from another client.
+        response = self.client.post(
+            mobile_url, data={"mobile": mobile}, format="json", REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["type"], "throttled_error")
+        response = self.client.post(
+            f"/api/v1/auth/{auth_id}/code/",
+            data={"otp_code": "12345"},
+            format="json",
+            REMOTE_ADDR="10.0.0.3",
+        )
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(
+            f"/api/v1/auth/{auth_id}/resend-code/", REMOTE_ADDR="10.0.0.4"
+        )
+        self.assertEqual(response.status_code, 429)
+
+        # Throttled by IP, even for another mobile number.
+        response = self.client.post(
+            mobile_url, data={"mobile": "09123456789"}, format="json"
+        )
+        self.assertEqual(response.status_code, 429)
+
+        response = self.client.post(
+            mobile_url,
+            data={"mobile": "09123456789"},
+            format="json",
+            REMOTE_ADDR="10.0.0.5",
+        )
+        self.assertEqual(response.status_code, 200)
+
     def test_refresh_token(self):
         token = RefreshToken().for_user(self.customer)
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
@@ -311,3 +681,321 @@ class TestAuthViewSet(APITestCase):
         response = response.json()
         self.assertIn("access_token", response)
         self.assertIn("expires_at", response)
+
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        token = UserRefreshToken.for_user(self.customer)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        self.assertEqual(self.client.get("/api/v1/users/me/").status_code, 200)
+
+        response = self.client.post(
+            "/api/v1/auth/logout/", data={"refresh_token": str(token)}, format="json"
+        )
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self.client.get("/api/v1/users/me/").status_code, 401)
+        response = self.client.post(
+            "/api/v1/auth/refresh-token/",
+            data={"refresh_token": str(token)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class TestConcurrentCodeSubmissions(RedisTestCaseMixin, APITransactionTestCase):
+    @patch.object(
+        RedisSlidingWindowThrottle,
+        "THROTTLE_RATES",
+        {
+            "phone_number_verify_code_hourly": "1000/hour",
+            "phone_number_verify_code_daily": "1000/day",
+        },
+    )
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    def test_code_logs_in_exactly_once(self, task_mock: MagicMock):
+        mobile = "09123456789"
+        response = APIClient().post(
+            "/api/v1/auth/mobile/", data={"mobile": mobile}, format="json"
+        )
+        auth_id = response.json()["id"]
+        url = f"/api/v1/auth/{auth_id}/code/"
+        data = {
+            "otp_code": otp_state_store.get(auth_id).otp_code,
+            "first_name": "First",
+            "last_name": "Last",
+            "national_code": "1234567890",
+        }
+        statuses: list[int] = []
+        # Every request holds a database connection, keep them below postgres' max_connections.
+        connections = threading.BoundedSemaphore(50)
+
+        @test_concurrently(200)
+        def submit_code():
+            with connections:
+                try:
+                    response = APIClient().post(url, data=data, format="json")
+                finally:
+                    connection.close()
+            statuses.append(response.status_code)
+
+        submit_code()
+        self.assertEqual(len(statuses), 200)
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(400), 199)
+        self.assertEqual(User.objects.filter(username=mobile).count(), 1)
+
+
+class TokenRevocationStoreTestCase(RedisTestCaseMixin, APITestCase):
+    def test_bloom_filter(self):
+        bloom = BloomFilter(100, 0.01)
+        for i in range(100):
+            bloom.add(f"revoked-{i}")
+        self.assertTrue(all(f"revoked-{i}" in bloom for i in range(100)))
+        false_positives = sum(f"valid-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+        # Items that collide with earlier ones are not counted again.
+        self.assertGreater(len(bloom), 90)
+
+    def test_tokens_not_in_the_filter_skip_redis(self):
+        revoked = UserRefreshToken.for_user(UserFactory())
+        token_revocation_store.revoke(revoked)
+        self.assertTrue(token_revocation_store.is_revoked(revoked["jti"]))
+
+        with patch("apps.user.revocation.get_redis_connection") as redis_mock:
+            self.assertFalse(token_revocation_store.is_revoked(uuid.uuid4().hex))
+        redis_mock.assert_not_called()
+
+    def test_revocations_of_other_processes_are_synced(self):
+        token = UserRefreshToken.for_user(UserFactory())
+        other_process = TokenRevocationStore()
+        self.assertFalse(other_process.is_revoked(token["jti"]))
+
+        token_revocation_store.revoke(token)
+        self.assertFalse(token["jti"] in other_process.bloom)
+        with self.settings(TOKEN_REVOCATION_SYNC_INTERVAL=0):
+            self.assertTrue(other_process.is_revoked(token["jti"]))
+        self.assertLessEqual(
+            get_redis_connection().ttl(token_revocation_store.jti_key(token["jti"])),
+            token["exp"] - token["iat"] + 1,
+        )
+
+    def test_revocations_of_expired_tokens_are_pruned(self):
+        redis = get_redis_connection()
+        expired = UserRefreshToken.for_user(UserFactory())
+        token_revocation_store.revoke(expired)
+        # As if the token had expired since.
+        redis.zadd(token_revocation_store.expiry_key, {expired["jti"]: 0})
+
+        token = UserRefreshToken.for_user(UserFactory())
+        token_revocation_store.revoke(token)
+        self.assertEqual(
+            redis.zrange(token_revocation_store.log_key, 0, -1),
+            [token["jti"].encode()],
+        )
+        self.assertEqual(
+            redis.zrange(token_revocation_store.expiry_key, 0, -1),
+            [token["jti"].encode()],
+        )
+        self.assertAlmostEqual(
+            redis.zscore(token_revocation_store.expiry_key, token["jti"]),
+            token["exp"],
+            delta=2,
+        )
+
+
+class TestAsyncAuthViews(RedisTestCaseMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer: User = UserFactory()
+
+    @patch("services.sms_service.SMSService.async_send_otp_code")
+    async def test_mobile(self, sms_mock: MagicMock):
+        url = "/api/v1/async/auth/mobile/"
+        response = await self.async_client.post(
+            url, data={"mobile": "091"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = response.json()
+        self.assertEqual(response["type"], "validation_error")
+        self.assertEqual(response["attr"], "mobile")
+
+        response = await self.async_client.post(
+            url,
+            data={"mobile": self.customer.username},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = response.json()
+        self.assertEqual(response["user_is_registered"], True)
+        self.assertEqual(response["delivery_status"], AuthRequest.DeliveryStatuses.SENT)
+        auth_request = await sync_to_async(otp_state_store.get)(response["id"])
+        sms_mock.assert_awaited_once_with(auth_request.mobile, auth_request.otp_code)
+
+    @patch("apps.user.tasks.send_otp_code_task.delay")
+    @patch("services.sms_service.SMSService.async_send_otp_code")
+    async def test_mobile_falls_back_to_celery_on_sms_failure(
+        self, sms_mock: MagicMock, task_mock: MagicMock
+    ):
+        sms_mock.side_effect = SMSServiceException()
+        response = await self.async_client.post(
+            "/api/v1/async/auth/mobile/",
+            data={"mobile": "09123456789"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = response.json()
+        self.assertEqual(
+            response["delivery_status"], AuthRequest.DeliveryStatuses.QUEUED
+        )
+        task_mock.assert_called_once_with(response["id"])
+
+    @patch("services.sms_service.SMSService.async_send_otp_code")
+    async def test_resend_code(self, sms_mock: MagicMock):
+        auth_request = AuthRequest(mobile=self.customer.username, otp_code="12345")
+        await sync_to_async(auth_request.persist)()
+        url = f"/api/v1/async/auth/{auth_request.id}/resend-code/"
+        response = await self.async_client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["type"], "validation_error")
+
+        response = await self.async_client.post(
+            f"/api/v1/async/auth/{uuid.uuid4()}/resend-code/"
+        )
+        self.assertEqual(response.status_code, 404)
+
+        faked_now = timezone.now() + timedelta(minutes=6)
+        with patch("django.utils.timezone.now", return_value=faked_now):
+            response = await self.async_client.post(url)
+        self.assertEqual(response.status_code, 200)
+        auth_request = await sync_to_async(otp_state_store.get)(auth_request.id)
+        self.assertEqual(auth_request.expire_datetime, faked_now + timedelta(minutes=5))
+        self.assertEqual(
+            auth_request.delivery_status, AuthRequest.DeliveryStatuses.SENT
+        )
+        sms_mock.assert_awaited_once_with(auth_request.mobile, auth_request.otp_code)
+
+    @patch.object(
+        RedisSlidingWindowThrottle,
+        "THROTTLE_RATES",
+        {
+            "phone_number_verify_code_hourly": "1/hour",
+            "phone_number_verify_code_daily": "100/day",
+        },
+    )
+    @patch("services.sms_service.SMSService.async_send_otp_code")
+    async def test_mobile_is_throttled(self, sms_mock: MagicMock):
+        url = "/api/v1/async/auth/mobile/"
+        data = {"mobile": self.customer.username}
+        response = await self.async_client.post(
+            url, data=data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.post(
+            url, data=data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["type"], "throttled_error")
+
+    @patch("services.sms_service.SMSService.async_send_otp_code")
+    async def test_concurrent_mobile_requests_with_idempotency_key(
+        self, sms_mock: MagicMock
+    ):
+        async def send_otp_code(*args):
+            await asyncio.sleep(0.2)
+
+        sms_mock.side_effect = send_otp_code
+        responses = await asyncio.gather(
+            *[
+                self.async_client.post(
+                    "/api/v1/async/auth/mobile/",
+                    data={"mobile": self.customer.username},
+                    content_type="application/json",
+                    headers={"Idempotency-Key": "key-1"},
+                )
+                for _ in range(5)
+            ]
+        )
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(len({response.json()["id"] for response in responses}), 1)
+        sms_mock.assert_awaited_once()
+
+
+class TestSMSServiceViewSet(RedisTestCaseMixin, DashboardAPITestCase):
+    @patch("services.kavenegar.Kavenegar.send_request")
+    def test_breaker(self, kavenegar_mock: MagicMock):
+        kavenegar_mock.side_effect = KavenegarRequestException()
+        with self.assertRaises(SMSServiceException):
+            SMSService.send_otp_code(self.admin.username)
+
+        url = "/api/v1/dashboard/sms-service/breaker/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = response.json()
+        self.assertEqual(response["state"], "closed")
+        self.assertEqual(response["calls"], 1)
+        self.assertEqual(response["failures"], 1)
+        self.assertEqual(response["failure_rate"], 1)
+
+        self.client.credentials()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+
+class TestAuthFunnelViewSet(RedisTestCaseMixin, DashboardAPITestCase):
+    url = "/api/v1/dashboard/auth-funnel/"
+
+    def test_funnel(self):
+        hour = datetime(2024, 5, 1, 10, tzinfo=dt_timezone.utc)
+        AuthFunnelRollup.objects.bulk_create(
+            [
+                AuthFunnelRollup(
+                    hour=hour, requests=10, resends=3, completions=8, expirations=2
+                ),
+                AuthFunnelRollup(
+                    hour=hour + timedelta(hours=1),
+                    requests=10,
+                    completions=2,
+                    expirations=8,
+                    registrations=5,
+                ),
+                AuthFunnelRollup(hour=hour + timedelta(days=2), requests=100),
+            ]
+        )
+        params = {
+            "start": "2024-05-01T10:20:00+0000",
+            "end": "2024-05-02T00:00:00+0000",
+        }
+        self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        # The admin comes from the user snapshot, the funnel is a single read of the rollups.
+        selects = [query["sql"] for query in queries if "SELECT" in query["sql"]]
+        self.assertEqual(len(selects), 1, selects)
+        self.assertEqual(response.status_code, 200)
+        response = response.json()
+        self.assertEqual(len(response["hours"]), 2)
+        self.assertEqual(
+            response["totals"],
+            {
+                "requests": 20,
+                "resends": 3,
+                "completions": 10,
+                "expirations": 10,
+                "registrations": 5,
+                "completion_rate": 0.5,
+                "registration_rate": 0.5,
+            },
+        )
+
+    def test_invalid_period(self):
+        params = {
+            "start": "2024-05-02T00:00:00+0000",
+            "end": "2024-05-01T00:00:00+0000",
+        }
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_admins(self):
+        user = UserFactory()
+        token = UserRefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -0,0 +1,100 @@
+import csv
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from apps.user.models import User
+from apps.user.tests.factories import UserFactory
+from utils.validators import normalize_digits, validate_mobiles, validate_national_codes
+
+
+class ValidatorsTestCase(TestCase):
+    def test_validate_mobiles(self):
+        self.assertEqual(
+            validate_mobiles(
+                ["09123456789", "9123456789", "0912345678a", "091234567890"]
+            ),
+            [True, False, False, False],
+        )
+
+    def test_validate_national_codes(self):
+        self.assertEqual(
+            validate_national_codes(
+                ["0013542419", "0499370899", "1234567890", "1111111111", "12345", ""]
+            ),
+            [True, True, False, False, False, False],
+        )
+
+    def test_normalize_digits(self):
+        self.assertEqual(
+            normalize_digits([" ۰۹۱۲۳۴۵۶۷۸۹ ", "٠٠١٣٥٤٢٤١٩"]),
+            ["09123456789", "0013542419"],
+        )
+
+
+class ImportUsersCommandTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "users.csv"
+        self.rejects_path = Path(directory.name) / "users.rejects.csv"
+
+    def write_rows(self, rows: list[list[str]]) -> None:
+        with self.path.open("w", newline="") as file:
+            csv.writer(file).writerows(
+                [["mobile", "first_name", "last_name", "national_code"], *rows]
+            )
+
+    def read_rejects(self) -> list[dict]:
+        with self.rejects_path.open(newline="") as file:
+            return list(csv.DictReader(file))
+
+    def test_imports_valid_rows(self):
+        registered = UserFactory(username="09120000003")
+        self.write_rows(
+            [
+                ["09120000001", "Ali", "Rezaei", "0013542419"],
+                ["۰۹۱۲۰۰۰۰۰۰۲", "Sara", 'Ka"rimi', ""],
+                ["09120000003", "Already", "Registered", ""],
+                ["09120000001", "Ali", "Again", ""],
+                ["9120000004", "Bad", "Mobile", ""],
+                ["09120000005", "Bad", "Code", "1234567890"],
+                ["09120000006", "x" * 151, "Long", ""],
+            ]
+        )
+        out = StringIO()
+        call_command("import_users", self.path, "--batch-size", "3", stdout=out)
+
+        self.assertIn("Imported 2 users and rejected 5 rows", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        ali = User.objects.get(username="09120000001")
+        self.assertEqual(
+            (ali.first_name, ali.last_name, ali.national_code),
+            ("Ali", "Rezaei", "0013542419"),
+        )
+        self.assertFalse(ali.has_usable_password())
+        self.assertTrue(ali.is_active)
+        self.assertEqual(ali.id.version, 7)
+        sara = User.objects.get(username="09120000002")
+        self.assertEqual((sara.last_name, sara.national_code), ('Ka"rimi', None))
+        registered.refresh_from_db()
+        self.assertNotEqual(registered.first_name, "Already")
+
+        self.assertEqual(
+            [(row["mobile"], row["reason"]) for row in self.read_rejects()],
+            [
+                ("09120000003", "already registered"),
+                ("09120000001", "duplicate row"),
+                ("9120000004", "invalid mobile"),
+                ("09120000005", "invalid national code"),
+                ("09120000006", "name too long"),
+            ],
+        )
+
+    def test_requires_mobile_column(self):
+        self.path.write_text("phone\n09120000001\n")
+        with self.assertRaises(CommandError):
+            call_command("import_users", self.path, "--rejects", self.rejects_path)
@@ -1,3 +1,5 @@
+import time
+import uuid
 from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
@@ -5,8 +7,11 @@ from django.test import TestCase
 from django.utils import timezone
 
 from apps.user.models import AuthRequest, User
+from apps.user.otp_store import otp_state_store
 from apps.user.tests.factories import AuthRequestFactory, UserFactory
 from services.kavenegar import KavenegarTemplate
+from utils.testcases import RedisTestCaseMixin
+from utils.uuids import uuid7
 
 
 class UserModelTestCase(TestCase):
@@ -25,9 +30,18 @@ class UserModelTestCase(TestCase):
         User.objects.create(username=valid_mobile)
         self.assertEqual(User.objects.count(), 2)
 
+    def test_primary_keys_are_time_ordered(self):
+        ids = [UserFactory().id for _ in range(3)]
+        self.assertTrue(all(user_id.version == 7 for user_id in ids))
+        with patch("time.time_ns", return_value=time.time_ns() + 10**6):
+            later = uuid7()
+        self.assertGreater(later, max(ids))
+        self.assertEqual(later.variant, uuid.RFC_4122)
 
-class AuthRequestTestCase(TestCase):
+
+class AuthRequestTestCase(RedisTestCaseMixin, TestCase):
     def setUp(self):
+        super().setUp()
         self.user: User = UserFactory()
         self.auth: AuthRequest = AuthRequestFactory()
 
@@ -52,10 +66,32 @@ class AuthRequestTestCase(TestCase):
         self.assertTrue(auth.is_closed())
 
     def test_close_request(self):
-        auth: AuthRequest = AuthRequest.objects.create(mobile="09123456789")
+        auth: AuthRequest = AuthRequest(mobile="09123456789")
+        auth.persist()
         self.assertEqual(auth.request_status, AuthRequest.RequestStatuses.PENDING)
         auth.close_request()
-        self.assertEqual(auth.request_status, AuthRequest.RequestStatuses.COMPLETED)
+        self.assertEqual(auth.request_status, AuthRequest.RequestStatuses.CLOSED)
+        self.assertTrue(otp_state_store.get(auth.id).is_closed())
+        self.assertFalse(AuthRequest.objects.filter(id=auth.id).exists())
+
+    def test_disable_previous_codes(self):
+        previous: AuthRequest = AuthRequest(mobile="09123456789")
+        previous.persist()
+        other_mobile: AuthRequest = AuthRequest(mobile="09123456780")
+        other_mobile.persist()
+        auth: AuthRequest = AuthRequest(mobile="09123456789")
+        auth.persist()
+        self.assertTrue(auth.claim_request())
+        auth.disable_previous_codes()
+        self.assertEqual(
+            otp_state_store.get(previous.id).request_status,
+            AuthRequest.RequestStatuses.CLOSED,
+        )
+        self.assertEqual(
+            otp_state_store.get(auth.id).request_status,
+            AuthRequest.RequestStatuses.COMPLETED,
+        )
+        self.assertFalse(otp_state_store.get(other_mobile.id).is_closed())
 
     @patch("services.kavenegar.Kavenegar.send_request")
     def test_send_otp_code(self, mock_sms_service: MagicMock):
@@ -71,14 +107,15 @@ class AuthRequestTestCase(TestCase):
     def test_resend_otp_code(self, mock_sms_service: MagicMock):
         now = timezone.now()
         with patch("django.utils.timezone.now", return_value=now):
-            auth: AuthRequest = AuthRequest.objects.create(mobile="09123456789")
+            auth: AuthRequest = AuthRequest(mobile="09123456789")
+            auth.persist()
         self.assertEqual(auth.expire_datetime, now + timedelta(minutes=5))
         self.assertIsNone(auth.otp_code)
 
         now = timezone.now()
         with patch("django.utils.timezone.now", return_value=now):
             auth.resend_otp_code()
-        auth.refresh_from_db()
+        auth = otp_state_store.get(auth.id)
         self.assertEqual(auth.expire_datetime, now + timedelta(minutes=5))
         self.assertIsNotNone(auth.otp_code)
         mock_sms_service.assert_called_once_with(
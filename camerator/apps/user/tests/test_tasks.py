@@ -0,0 +1,414 @@
+import gzip
+import json
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.blog.models import Comment, CommentReply, Gallery, Post, PostCategory
+from apps.user.models import AuthFunnelRollup, AuthRequest, DeletionJob, User, UserDataExport
+from apps.user.otp_store import otp_state_store
+from apps.user.rollups import COUNTERS
+from apps.user.tasks import (
+    archive_auth_requests_task, build_user_data_export_task, delete_expired_user_data_exports_task,
+    delete_in_batches_task, flush_otp_requests_task, rollup_auth_funnel_task, send_otp_code_task
+)
+from apps.user.tests.factories import AuthRequestFactory, UserFactory
+from services.kavenegar import KavenegarResult, KavenegarTemplate
+from services.sms_service import SMSServiceException
+from utils.testcases import RedisTestCaseMixin
+
+
+class SendOTPCodeTaskTestCase(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.auth: AuthRequest = AuthRequest(mobile="09123456789", otp_code="12345")
+        self.auth.persist()
+
+    @patch("services.kavenegar.Kavenegar.send_request")
+    def test_sends_stored_otp_code(self, kavenegar_mock: MagicMock):
+        kavenegar_mock.return_value = KavenegarResult(
+            response_code=200, response_message=""
+        )
+        send_otp_code_task.apply(args=[str(self.auth.id)])
+        kavenegar_mock.assert_called_once_with(
+            self.auth.mobile, KavenegarTemplate.OTP_CODE, otp_code="12345"
+        )
+        self.auth = otp_state_store.get(self.auth.id)
+        self.assertEqual(self.auth.otp_code, "12345")
+        self.assertEqual(self.auth.delivery_status, AuthRequest.DeliveryStatuses.SENT)
+
+    @patch("services.sms_service.SMSService.send_otp_code")
+    def test_skips_closed_and_expired_requests(self, sms_mock: MagicMock):
+        self.auth.close_request()
+        send_otp_code_task.apply(args=[str(self.auth.id)])
+
+        expired = AuthRequest(
+            mobile="09123456789", expire_datetime=timezone.now() - timedelta(minutes=1)
+        )
+        expired.persist()
+        send_otp_code_task.apply(args=[str(expired.id)])
+        sms_mock.assert_not_called()
+
+    @patch("services.sms_service.SMSService.send_otp_code")
+    def test_retries_on_sms_service_failure(self, sms_mock: MagicMock):
+        sms_mock.side_effect = SMSServiceException()
+        with self.assertRaises(Retry):
+            send_otp_code_task.apply(args=[str(self.auth.id)])
+        self.auth = otp_state_store.get(self.auth.id)
+        self.assertEqual(self.auth.delivery_status, AuthRequest.DeliveryStatuses.QUEUED)
+
+    @patch("services.sms_service.SMSService.send_otp_code")
+    def test_marks_delivery_failed_when_retries_run_out(self, sms_mock: MagicMock):
+        sms_mock.side_effect = SMSServiceException()
+        result = send_otp_code_task.apply(
+            args=[str(self.auth.id)], retries=send_otp_code_task.max_retries
+        )
+        self.assertTrue(result.successful())
+        self.auth = otp_state_store.get(self.auth.id)
+        self.assertEqual(self.auth.delivery_status, AuthRequest.DeliveryStatuses.FAILED)
+
+
+class FlushOTPRequestsTaskTestCase(RedisTestCaseMixin, TestCase):
+    def test_flushes_completed_and_expired_requests(self):
+        now = timezone.now()
+        completed = AuthRequest(mobile="09123456789", otp_code="12345")
+        completed.persist()
+        completed.claim_request()
+        pending = AuthRequest(mobile="09123456780")
+        pending.persist()
+        # Past its resend window.
+        expired = AuthRequest(
+            mobile="09123456781",
+            expire_datetime=now - timedelta(seconds=settings.OTP_RESEND_WINDOW + 60),
+        )
+        expired.persist()
+
+        # One insert of the batch with the stored timestamps.
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_otp_requests_task.apply().get(), 2)
+        self.assertEqual(AuthRequest.objects.count(), 2)
+        row = AuthRequest.objects.get(id=completed.id)
+        self.assertEqual(row.request_status, AuthRequest.RequestStatuses.COMPLETED)
+        self.assertEqual(row.otp_code, "12345")
+        self.assertEqual(row.created_at, completed.created_at)
+        self.assertEqual(row.updated_at, completed.updated_at)
+        self.assertEqual(
+            AuthRequest.objects.get(id=expired.id).request_status,
+            AuthRequest.RequestStatuses.CLOSED,
+        )
+        self.assertIsNone(otp_state_store.get(completed.id))
+        self.assertIsNotNone(otp_state_store.get(pending.id))
+
+        # Nothing left to flush until the resend window of the pending request is over.
+        self.assertEqual(flush_otp_requests_task.apply().get(), 0)
+        with patch(
+            "django.utils.timezone.now",
+            return_value=now + timedelta(minutes=6, seconds=settings.OTP_RESEND_WINDOW),
+        ):
+            self.assertEqual(flush_otp_requests_task.apply().get(), 1)
+        self.assertEqual(AuthRequest.objects.count(), 3)
+
+    def test_flushes_in_batches(self):
+        for _ in range(5):
+            auth_request = AuthRequest(mobile="09123456789")
+            auth_request.persist()
+            auth_request.close_request()
+        with self.settings(OTP_STATE_FLUSH_BATCH_SIZE=2):
+            self.assertEqual(flush_otp_requests_task.apply().get(), 5)
+        self.assertEqual(AuthRequest.objects.count(), 5)
+
+    def test_late_updates_do_not_revive_flushed_requests(self):
+        auth_request = AuthRequest(mobile="09123456789")
+        auth_request.persist()
+        auth_request.close_request()
+        flush_otp_requests_task.apply()
+        auth_request.mark_delivery_failed()
+        self.assertIsNone(otp_state_store.get(auth_request.id))
+        self.assertEqual(otp_state_store.flush(), 0)
+
+
+class ArchiveAuthRequestsTaskTestCase(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        archive_root = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_root.cleanup)
+        self.archive_root = Path(archive_root.name)
+        override = self.settings(
+            AUTH_REQUEST_ARCHIVE_ROOT=archive_root.name,
+            AUTH_REQUEST_ARCHIVE_BATCH_SIZE=2,
+            AUTH_REQUEST_RETENTION_DAYS=30,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    @staticmethod
+    def make_auth_request(days_ago: int, **kwargs) -> AuthRequest:
+        auth_request: AuthRequest = AuthRequestFactory(**kwargs)
+        created_at = timezone.now() - timedelta(days=days_ago)
+        AuthRequest.objects.filter(id=auth_request.id).update(created_at=created_at)
+        return auth_request
+
+    def test_archives_and_deletes_old_finished_requests(self):
+        old = [
+            self.make_auth_request(
+                40, request_status=AuthRequest.RequestStatuses.COMPLETED
+            )
+            for _ in range(4)
+        ]
+        old.append(
+            self.make_auth_request(
+                31, expire_datetime=timezone.now() - timedelta(days=31)
+            )
+        )
+        recent = self.make_auth_request(
+            5, request_status=AuthRequest.RequestStatuses.COMPLETED
+        )
+        still_pending = self.make_auth_request(
+            40, expire_datetime=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(archive_auth_requests_task.apply().get(), 5)
+        self.assertQuerysetEqual(
+            AuthRequest.objects.order_by("created_at"),
+            [still_pending, recent],
+        )
+
+        archives = sorted(self.archive_root.rglob("*.jsonl.gz"))
+        self.assertEqual(len(archives), 3)
+        rows = []
+        for archive in archives:
+            with gzip.open(archive, "rt") as file:
+                rows += [json.loads(line) for line in file]
+        self.assertCountEqual(
+            [row["id"] for row in rows], [str(item.id) for item in old]
+        )
+        self.assertIn("created_at", rows[0])
+
+        self.assertEqual(archive_auth_requests_task.apply().get(), 0)
+
+    def test_stops_after_max_batches(self):
+        for _ in range(5):
+            self.make_auth_request(
+                40, request_status=AuthRequest.RequestStatuses.COMPLETED
+            )
+        with self.settings(AUTH_REQUEST_ARCHIVE_MAX_BATCHES=2):
+            self.assertEqual(archive_auth_requests_task.apply().get(), 4)
+        self.assertEqual(AuthRequest.objects.count(), 1)
+
+
+class RollupAuthFunnelTaskTestCase(TestCase):
+    def setUp(self):
+        self.now = datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc)
+
+    def make_auth_request(self, hours_ago: int, **kwargs) -> AuthRequest:
+        auth_request: AuthRequest = AuthRequestFactory(**kwargs)
+        created_at = self.now - timedelta(hours=hours_ago)
+        AuthRequest.objects.filter(id=auth_request.id).update(created_at=created_at)
+        return auth_request
+
+    def test_counts_the_funnel_by_hour(self):
+        completed = AuthRequest.RequestStatuses.COMPLETED
+        self.make_auth_request(5, request_status=completed, user_is_registered=True)
+        self.make_auth_request(5, request_status=completed, resend_count=2)
+        self.make_auth_request(5)
+        # Superseded by a later code or expired, neither verified nor signed up.
+        self.make_auth_request(5, request_status=AuthRequest.RequestStatuses.CLOSED)
+        self.make_auth_request(1, request_status=completed)
+
+        with patch("django.utils.timezone.now", return_value=self.now):
+            self.assertEqual(rollup_auth_funnel_task.apply().result, 6)
+        rollups = {rollup.hour: rollup for rollup in AuthFunnelRollup.objects.all()}
+        self.assertEqual(len(rollups), 6)
+        rollup = rollups[datetime(2024, 5, 1, 7, tzinfo=dt_timezone.utc)]
+        self.assertEqual(
+            [getattr(rollup, counter) for counter in COUNTERS], [4, 2, 2, 2, 1]
+        )
+        rollup = rollups[datetime(2024, 5, 1, 11, tzinfo=dt_timezone.utc)]
+        self.assertEqual(
+            [getattr(rollup, counter) for counter in COUNTERS], [1, 0, 1, 0, 1]
+        )
+        self.assertEqual(
+            rollups[datetime(2024, 5, 1, 9, tzinfo=dt_timezone.utc)].requests, 0
+        )
+
+    def test_recounts_the_lookback_hours_only(self):
+        self.make_auth_request(5)
+        with patch("django.utils.timezone.now", return_value=self.now):
+            rollup_auth_funnel_task.apply()
+
+        # Requests flushed late are counted while their hour is in the lookback, older hours are final.
+        self.make_auth_request(1)
+        self.make_auth_request(5)
+        with self.settings(AUTH_FUNNEL_ROLLUP_LOOKBACK_HOURS=3):
+            with patch("django.utils.timezone.now", return_value=self.now):
+                self.assertEqual(rollup_auth_funnel_task.apply().result, 4)
+        hours = dict(AuthFunnelRollup.objects.values_list("hour", "requests"))
+        self.assertEqual(hours[datetime(2024, 5, 1, 11, tzinfo=dt_timezone.utc)], 1)
+        self.assertEqual(hours[datetime(2024, 5, 1, 7, tzinfo=dt_timezone.utc)], 1)
+
+    def test_nothing_to_count(self):
+        self.assertEqual(rollup_auth_funnel_task.apply().result, 0)
+
+
+class UserDataExportTaskTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        self.export_root = Path(export_root.name)
+        override = self.settings(
+            MEDIA_ROOT=media_root.name,
+            USER_DATA_EXPORT_ROOT=export_root.name,
+            USER_DATA_EXPORT_CHUNK_SIZE=2,
+            USER_DATA_EXPORT_FILE_CHUNK_SIZE=1024,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = UserFactory()
+        self.user.image.save("avatar.png", ContentFile(b"avatar"))
+        gallery = Gallery.objects.create(title="Wedding")
+        category = PostCategory.objects.create(title="Portrait")
+        for number in range(3):
+            post = Post(title=f"Post {number}", author=self.user, gallery=gallery)
+            post.image.save(f"post-{number}.jpg", ContentFile(b"x" * 5000), save=False)
+            post.save()
+            post.category.add(category)
+        Post.objects.create(title="Someone else's", author=UserFactory(), image="a.jpg")
+        AuthRequestFactory(mobile=self.user.username, otp_code="12345")
+
+    def test_builds_the_archive(self):
+        export = UserDataExport.objects.create(user=self.user)
+        build_user_data_export_task.apply(args=[str(export.id)])
+
+        export.refresh_from_db()
+        self.assertEqual(export.status, UserDataExport.Statuses.READY)
+        self.assertTrue(export.is_ready())
+        self.assertTrue(Path(export.file.path).is_relative_to(self.export_root))
+        self.assertEqual(export.size, Path(export.file.path).stat().st_size)
+        with zipfile.ZipFile(export.file.path) as archive:
+            names = set(archive.namelist())
+            profile = json.loads(archive.read("profile.json"))
+            posts = archive.read("posts.jsonl").decode().splitlines()
+            galleries = archive.read("galleries.jsonl").decode().splitlines()
+            logins = archive.read("login_history.jsonl").decode().splitlines()
+            images = [name for name in names if name.startswith("posts/")]
+            self.assertEqual(archive.read(images[0]), b"x" * 5000)
+
+        self.assertEqual(profile["username"], self.user.username)
+        self.assertNotIn("password", profile)
+        self.assertIn(profile["image"], names)
+        self.assertEqual(len(posts), 3)
+        self.assertEqual(json.loads(posts[0])["categories"], ["Portrait"])
+        self.assertEqual(len(images), 3)
+        self.assertEqual([json.loads(line)["title"] for line in galleries], ["Wedding"])
+        self.assertEqual(len(logins), 1)
+        self.assertNotIn("otp_code", json.loads(logins[0]))
+
+    def test_failed_build_is_marked(self):
+        export = UserDataExport.objects.create(user=self.user)
+        with patch(
+            "apps.user.tasks.build_user_data_export", side_effect=OSError("disk full")
+        ), self.assertRaises(OSError):
+            build_user_data_export_task.apply(args=[str(export.id)])
+        export.refresh_from_db()
+        self.assertEqual(export.status, UserDataExport.Statuses.FAILED)
+
+    def test_deletes_expired_exports(self):
+        export = UserDataExport.objects.create(user=self.user)
+        build_user_data_export_task.apply(args=[str(export.id)])
+        export.refresh_from_db()
+        recent = UserDataExport.objects.create(user=self.user)
+        UserDataExport.objects.filter(id=export.id).update(
+            created_at=timezone.now() - timedelta(days=8)
+        )
+
+        with self.settings(USER_DATA_EXPORT_TTL_DAYS=7):
+            self.assertEqual(delete_expired_user_data_exports_task.apply().result, 1)
+        self.assertQuerysetEqual(UserDataExport.objects.all(), [recent])
+        self.assertFalse(Path(export.file.path).exists())
+
+
+class DeleteInBatchesTaskTestCase(RedisTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory()
+        self.other_post = Post.objects.create(
+            title="Someone else's", author=UserFactory(), image="a.jpg"
+        )
+        for number in range(3):
+            post = Post.objects.create(
+                title=f"Post {number}",
+                author=self.user,
+                image="a.jpg",
+                status=Post.PostChoices.PUBLISHED,
+            )
+            for _ in range(2):
+                comment = Comment.objects.create(
+                    post=post, name="N", email="n@example.com", body="B"
+                )
+                CommentReply.objects.create(comment=comment, body="R")
+
+    def test_deletes_dependants_in_batches(self):
+        with self.settings(DELETION_BATCH_SIZE=2, DELETION_MAX_BATCHES=3):
+            with patch("apps.user.tasks.delete_in_batches_task.delay") as delay_mock:
+                with self.captureOnCommitCallbacks(execute=True):
+                    job = DeletionJob.schedule(self.user)
+                delay_mock.assert_called_once_with(str(job.id))
+                self.user.refresh_from_db()
+                self.assertFalse(self.user.is_active)
+                self.assertEqual(job.total, 3 + 6 + 6 + 1)
+                # Scheduling it again returns the job in progress.
+                self.assertEqual(DeletionJob.schedule(self.user), job)
+
+                delete_in_batches_task.apply(args=[str(job.id)])
+                job.refresh_from_db()
+                self.assertEqual(job.status, DeletionJob.Statuses.RUNNING)
+                self.assertEqual(job.deleted, {"blog.CommentReply": 6})
+                self.assertEqual(delay_mock.call_count, 2)
+
+                while job.status != DeletionJob.Statuses.COMPLETED:
+                    delete_in_batches_task.apply(args=[str(job.id)])
+                    job.refresh_from_db()
+
+        self.assertFalse(User.objects.filter(id=self.user.id).exists())
+        self.assertQuerysetEqual(Post.objects.all(), [self.other_post])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(CommentReply.objects.exists())
+        self.assertEqual(job.deleted_count, job.total)
+        self.assertEqual(job.progress, 1.0)
+
+    def test_post_is_unpublished_until_deleted(self):
+        post = Post.objects.filter(author=self.user).first()
+        with patch("apps.user.tasks.delete_in_batches_task.delay"):
+            job = DeletionJob.schedule(post)
+        post.refresh_from_db()
+        self.assertEqual(post.status, Post.PostChoices.DRAFT)
+
+        delete_in_batches_task.apply(args=[str(job.id)])
+        job.refresh_from_db()
+        self.assertEqual(
+            job.deleted, {"blog.CommentReply": 2, "blog.Comment": 2, "blog.Post": 1}
+        )
+        self.assertFalse(Post.objects.filter(id=post.id).exists())
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
+
+    def test_failed_job_is_marked(self):
+        with patch("apps.user.tasks.delete_in_batches_task.delay"):
+            job = DeletionJob.schedule(self.user)
+        with patch(
+            "apps.user.tasks.run_deletion_job", side_effect=RuntimeError
+        ), self.assertRaises(RuntimeError):
+            delete_in_batches_task.apply(args=[str(job.id)])
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Statuses.FAILED)
@@ -0,0 +1,37 @@
+from utils.throttling import RedisSlidingWindowThrottle
+
+
+class MobileThrottle(RedisSlidingWindowThrottle):
+    """Throttles by the mobile number of the auth request, views provide it with ``get_throttle_mobile()``."""
+
+    def get_throttle_ident(self, request, view) -> str | None:
+        return view.get_throttle_mobile(request)
+
+
+class IPThrottle(RedisSlidingWindowThrottle):
+    def get_throttle_ident(self, request, view) -> str | None:
+        return self.get_ident(request)
+
+
+class MobileHourlyThrottle(MobileThrottle):
+    scope = "phone_number_verify_code_hourly"
+
+
+class MobileDailyThrottle(MobileThrottle):
+    scope = "phone_number_verify_code_daily"
+
+
+class IPHourlyThrottle(IPThrottle):
+    scope = "phone_number_verify_code_hourly"
+
+
+class IPDailyThrottle(IPThrottle):
+    scope = "phone_number_verify_code_daily"
+
+
+OTP_THROTTLE_CLASSES = [
+    MobileHourlyThrottle,
+    MobileDailyThrottle,
+    IPHourlyThrottle,
+    IPDailyThrottle,
+]
@@ -0,0 +1,126 @@
+"""
+Async versions of the ``mobile`` and ``resend-code`` actions of ``AuthRequestViewSet``. They deliver the OTP code
+themselves with the async SMS client, so under ASGI (``config.asgi``) one process keeps serving requests while
+hundreds of them wait on the provider. DRF views can't be async, so these are plain django views that reuse the
+serializers and the error format of the sync API.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotFound, ParseError, Throttled
+
+from apps.user.models import AuthRequest
+from apps.user.otp_store import otp_state_store
+from apps.user.throttles import OTP_THROTTLE_CLASSES
+from apps.user.v1.auth_request import (
+    AuthRequestViewSet, GetMobileSerializer, get_mobile_from_data, otp_idempotency_store
+)
+from utils.exceptions import exception_handler
+from utils.idempotency import IDEMPOTENCY_HEADER
+
+
+class AsyncGetMobileSerializer(GetMobileSerializer):
+    @staticmethod
+    def dispatch_otp_code(auth_request: AuthRequest) -> None:
+        # The async view delivers the code itself once the request is stored.
+        auth_request.prepare_otp_code()
+
+
+def parse_json_body(request: HttpRequest) -> dict:
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError as ex:
+        raise ParseError() from ex
+    if not isinstance(data, dict):
+        raise ParseError()
+    return data
+
+
+@method_decorator([csrf_exempt, transaction.non_atomic_requests], name="dispatch")
+class AsyncAuthRequestView(View):
+    """
+    Base view of the async auth actions. ATOMIC_REQUESTS can't wrap async views, so every write runs in its own
+    short transaction and the request holds no database transaction while it waits on the SMS provider.
+    """
+
+    http_method_names = ["post"]
+    throttle_classes = OTP_THROTTLE_CLASSES
+
+    async def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            self.data = self.get_data(request)
+            await sync_to_async(self.check_throttles)(request)
+            return await self.handle(request, *args, **kwargs)
+        except APIException as exc:
+            response = exception_handler(exc)
+            assert response is not None
+            return JsonResponse(response.data, status=response.status_code)
+
+    async def handle(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        raise NotImplementedError
+
+    def get_data(self, request: HttpRequest) -> dict:
+        return {}
+
+    def check_throttles(self, request: HttpRequest) -> None:
+        for throttle in [throttle_class() for throttle_class in self.throttle_classes]:
+            if not throttle.allow_request(request, self):
+                raise Throttled(throttle.wait())
+
+    def get_throttle_mobile(self, request: HttpRequest) -> str | None:
+        return get_mobile_from_data(self.data)
+
+
+class AsyncMobileView(AsyncAuthRequestView):
+    def get_data(self, request: HttpRequest) -> dict:
+        return parse_json_body(request)
+
+    async def handle(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        serializer = AsyncGetMobileSerializer(data=self.data)
+        serializer.is_valid(raise_exception=True)
+
+        async def save() -> dict:
+            auth_request: AuthRequest = await sync_to_async(
+                transaction.atomic(serializer.save)
+            )()
+            await auth_request.adeliver_otp_code()
+            return AsyncGetMobileSerializer(auth_request).data
+
+        idempotency_key: str | None = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return JsonResponse(await save())
+        key = otp_idempotency_store.get_key(
+            serializer.validated_data["mobile"], idempotency_key
+        )
+        return JsonResponse(
+            await otp_idempotency_store.arun(key, save, settings.OTP_IDEMPOTENCY_TTL)
+        )
+
+
+class AsyncResendCodeView(AsyncAuthRequestView):
+    def get_auth_request(self) -> AuthRequest | None:
+        # Looked up once for both the throttles and the action.
+        if not hasattr(self, "_auth_request"):
+            self._auth_request = otp_state_store.get(self.kwargs["pk"])
+        return self._auth_request
+
+    def get_throttle_mobile(self, request: HttpRequest) -> str | None:
+        auth_request: AuthRequest | None = self.get_auth_request()
+        return auth_request.mobile if auth_request else None
+
+    async def handle(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        auth_request: AuthRequest | None = await sync_to_async(self.get_auth_request)()
+        if auth_request is None:
+            raise NotFound()
+        AuthRequestViewSet.check_resend_allowed(auth_request)
+        await sync_to_async(auth_request.prepare_otp_code)(reset_expiry=True)
+        await auth_request.adeliver_otp_code()
+        return HttpResponse()
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from apps.user.models import AuthFunnelRollup
+from apps.user.rollups import COUNTERS, floor_hour
+
+
+class AuthFunnelQuerySerializer(serializers.Serializer):
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs: dict) -> dict:
+        end = attrs.get("end") or timezone.now()
+        start = attrs.get("start") or end - timedelta(days=1)
+        if start >= end:
+            raise ValidationError({"start": _("Start should be before end.")})
+        if end - start > timedelta(days=settings.AUTH_FUNNEL_MAX_DAYS):
+            raise ValidationError(
+                {
+                    "start": _(
+                        f"The period can't be longer than {settings.AUTH_FUNNEL_MAX_DAYS} days."
+                    )
+                }
+            )
+        return {"start": floor_hour(start), "end": end}
+
+
+class AuthFunnelRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuthFunnelRollup
+        fields = ["hour", *COUNTERS]
+
+
+class AuthFunnelTotalsSerializer(serializers.Serializer):
+    requests = serializers.IntegerField()
+    resends = serializers.IntegerField()
+    completions = serializers.IntegerField()
+    expirations = serializers.IntegerField()
+    registrations = serializers.IntegerField()
+    completion_rate = serializers.FloatField()
+    registration_rate = serializers.FloatField()
+
+
+class AuthFunnelSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    totals = AuthFunnelTotalsSerializer()
+    hours = AuthFunnelRollupSerializer(many=True)
+
+
+class AuthFunnelViewSet(GenericViewSet):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        query_serializer=AuthFunnelQuerySerializer(),
+        responses={200: AuthFunnelSerializer()},
+    )
+    def list(self, request: Request) -> Response:
+        """
+        Auth funnel of a period (the last day by default), hour by hour and in total. It's read from the hourly
+        rollups, so it costs the same however many auth requests were made.
+        """
+        query = AuthFunnelQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end = query.validated_data["start"], query.validated_data["end"]
+        hours = list(
+            AuthFunnelRollup.objects.filter(hour__gte=start, hour__lt=end).order_by(
+                "hour"
+            )
+        )
+        totals = {
+            counter: sum(getattr(hour, counter) for hour in hours)
+            for counter in COUNTERS
+        }
+        requests, completions = totals["requests"], totals["completions"]
+        totals["completion_rate"] = completions / requests if requests else 0.0
+        totals["registration_rate"] = (
+            totals["registrations"] / completions if completions else 0.0
+        )
+        serializer = AuthFunnelSerializer(
+            {"start": start, "end": end, "totals": totals, "hours": hours}
+        )
+        return Response(status=status.HTTP_200_OK, data=serializer.data)
@@ -1,44 +1,59 @@
 import uuid
 
 from django.conf import settings
-from django.core.exceptions import ValidationError as DjangoValidationError
-from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as _
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import serializers, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import APIException, ErrorDetail, ValidationError
+from rest_framework.exceptions import ErrorDetail, NotFound, ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.user.authentication import UserRefreshToken
 from apps.user.models import AuthRequest, User
-from services.sms_service import SMSServiceException
+from apps.user.otp_store import otp_state_store
+from apps.user.revocation import token_revocation_store
+from apps.user.throttles import OTP_THROTTLE_CLASSES
+from utils.idempotency import IDEMPOTENCY_HEADER, IdempotencyStore
+
+otp_idempotency_store = IdempotencyStore("auth-mobile")
+IDEMPOTENCY_KEY_PARAMETER = openapi.Parameter(
+    IDEMPOTENCY_HEADER, openapi.IN_HEADER, type=openapi.TYPE_STRING, required=False
+)
+
+
+def get_mobile_from_data(data) -> str | None:
+    mobile = data.get("mobile") if isinstance(data, dict) else None
+    return str(mobile) if mobile else None
 
 
 class GetMobileSerializer(serializers.ModelSerializer):
     class Meta:
         model = AuthRequest
-        fields = ["id", "mobile", "user_is_registered"]
-        read_only_fields = ["id", "user_is_registered"]
+        fields = ["id", "mobile", "user_is_registered", "delivery_status"]
+        read_only_fields = ["id", "user_is_registered", "delivery_status"]
         extra_kwargs = {"mobile": {"write_only": True}}
 
-    @staticmethod
-    def create(validated_data: dict[str, str]) -> AuthRequest:
+    def create(self, validated_data: dict[str, str]) -> AuthRequest:
         auth_request: AuthRequest = AuthRequest(mobile=validated_data["mobile"])
-        user: User | None = auth_request.get_user_or_none()
-        if user:
+        user = auth_request.get_user()
+        if user is not None:
+            check_user_is_active(user)
             auth_request.user_is_registered = True
-        auth_request.save()
-        try:
-            auth_request.send_otp_code()
-        except SMSServiceException as ex:
-            raise APIException from ex
+            auth_request.user_id = user.id
+        self.dispatch_otp_code(auth_request)
         return auth_request
 
+    @staticmethod
+    def dispatch_otp_code(auth_request: AuthRequest) -> None:
+        auth_request.queue_otp_code()
+
 
 class LoginSignupSerializer(serializers.ModelSerializer):
     access_token = serializers.SerializerMethodField()
@@ -111,17 +126,26 @@ class LoginSignupSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data) -> AuthRequest:
         auth_request = self.context["auth_request"]
+        # validate() passes for every concurrent submission of the code, only the one that closes the request goes on.
+        if not auth_request.claim_request():
+            raise ValidationError(
+                ErrorDetail(_("The refresh token is closed."), code="closed")
+            )
 
         if not auth_request.user_is_registered:
             auth_request.first_name = validated_data["first_name"]
             auth_request.last_name = validated_data["last_name"]
             auth_request.national_code = validated_data["national_code"]
-            auth_request.create_new_user()
-        auth_request.close_request()
-
-        _user: User = get_object_or_404(User, username=auth_request.mobile)
+            _user: User = auth_request.upsert_user()
+            check_user_is_active(_user)
+            auth_request.persist("first_name", "last_name", "national_code")
+        else:
+            # The user was looked up when the code was requested, the token only needs its id. Deactivating or
+            # deleting the user since then closed the request, so claim_request() already failed.
+            _user = User(id=auth_request.user_id, username=auth_request.mobile)
+        auth_request.disable_previous_codes()
 
-        token: RefreshToken = RefreshToken.for_user(_user)
+        token: RefreshToken = UserRefreshToken.for_user(_user)
         auth_request.access_token = str(token.access_token)
         auth_request.refresh_token = str(token)
         auth_request.expires_at = token.access_token["exp"]
@@ -147,14 +171,11 @@ class TokenRefreshSerializer(serializers.Serializer):
 
     @staticmethod
     def validate(attrs: dict) -> dict:
-        refresh = RefreshToken(attrs["refresh_token"])
+        refresh = get_refresh_token(attrs["refresh_token"])
         data = {"access_token": str(refresh.access_token)}
         if settings.SIMPLE_JWT["ROTATE_REFRESH_TOKENS"]:
             if settings.SIMPLE_JWT["BLACKLIST_AFTER_ROTATION"]:
-                try:
-                    refresh.blacklist()
-                except AttributeError:
-                    pass
+                token_revocation_store.revoke(refresh)
             refresh.set_jti()
             refresh.set_exp()
             refresh.set_iat()
@@ -163,6 +184,32 @@ class TokenRefreshSerializer(serializers.Serializer):
         return data
 
 
+class LogoutSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField(write_only=True)
+
+    @staticmethod
+    def validate(attrs: dict) -> dict:
+        return {"refresh_token": get_refresh_token(attrs["refresh_token"])}
+
+    def create(self, validated_data: dict) -> dict:
+        token_revocation_store.revoke(validated_data["refresh_token"])
+        return validated_data
+
+
+def check_user_is_active(user: User) -> None:
+    if not user.is_active:
+        raise ValidationError(
+            ErrorDetail(_("The user is inactive."), code="user_inactive")
+        )
+
+
+def get_refresh_token(raw_token: str) -> UserRefreshToken:
+    refresh = UserRefreshToken(raw_token)
+    if token_revocation_store.is_revoked(refresh[api_settings.JTI_CLAIM]):
+        raise TokenError(_("Token is revoked"))
+    return refresh
+
+
 class AuthRequestViewSet(GenericViewSet):
     permission_classes = [AllowAny]
 
@@ -170,26 +217,38 @@ class AuthRequestViewSet(GenericViewSet):
         method="POST",
         request_body=GetMobileSerializer(),
         responses={200: GetMobileSerializer()},
+        manual_parameters=[IDEMPOTENCY_KEY_PARAMETER],
     )
-    @action(detail=False, methods=["POST"])
+    @action(detail=False, methods=["POST"], throttle_classes=OTP_THROTTLE_CLASSES)
     def mobile(self, request: Request) -> Response:
         serializer = GetMobileSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data)
+
+        def save() -> dict:
+            serializer.save()
+            return serializer.data
+
+        idempotency_key: str | None = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key:
+            return Response(save())
+        # Retries of the same mobile and key share one auth request and one SMS.
+        key = otp_idempotency_store.get_key(
+            serializer.validated_data["mobile"], idempotency_key
+        )
+        return Response(
+            otp_idempotency_store.run(key, save, settings.OTP_IDEMPOTENCY_TTL)
+        )
 
     @swagger_auto_schema(
         method="POST",
         request_body=LoginSignupSerializer(),
         responses={200: LoginSignupSerializer()},
     )
-    @action(detail=True, methods=["POST"])
+    @action(detail=True, methods=["POST"], throttle_classes=OTP_THROTTLE_CLASSES)
     def code(self, request: Request, pk: uuid.UUID) -> Response:
-        try:
-            auth_request: AuthRequest = AuthRequest.objects.get(id=pk)
-        except (DjangoValidationError, AuthRequest.DoesNotExist):
+        auth_request: AuthRequest | None = self.get_auth_request()
+        if auth_request is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        auth_request.disable_previous_codes()
         serializer = LoginSignupSerializer(
             data=request.data, context={"auth_request": auth_request}
         )
@@ -198,18 +257,38 @@ class AuthRequestViewSet(GenericViewSet):
         return Response(serializer.data)
 
     @swagger_auto_schema(method="POST", responses={200: ""})
-    @action(detail=True, methods=["POST"], url_path="resend-code")
+    @action(
+        detail=True,
+        methods=["POST"],
+        url_path="resend-code",
+        throttle_classes=OTP_THROTTLE_CLASSES,
+    )
     def resend_code(self, request: Request, pk: uuid.UUID) -> Response:
-        auth_request: AuthRequest = get_object_or_404(AuthRequest, id=pk)
+        auth_request: AuthRequest | None = self.get_auth_request()
+        if auth_request is None:
+            raise NotFound()
+        self.check_resend_allowed(auth_request)
+        auth_request.queue_otp_code(reset_expiry=True)
+        return Response()
+
+    def get_auth_request(self) -> AuthRequest | None:
+        # Looked up once for both the throttles and the action.
+        if not hasattr(self, "_auth_request"):
+            self._auth_request = otp_state_store.get(self.kwargs["pk"])
+        return self._auth_request
+
+    def get_throttle_mobile(self, request: Request) -> str | None:
+        if "pk" in self.kwargs:
+            auth_request: AuthRequest | None = self.get_auth_request()
+            return auth_request.mobile if auth_request else None
+        return get_mobile_from_data(request.data)
+
+    @staticmethod
+    def check_resend_allowed(auth_request: AuthRequest) -> None:
         if auth_request.is_closed():
             raise ValidationError(_("The request is closed. Try again."))
         if not auth_request.is_expired():
             raise ValidationError(_("The previous OTP code has not expired yet."))
-        try:
-            auth_request.resend_otp_code()
-        except SMSServiceException as ex:
-            raise APIException from ex
-        return Response()
 
     @swagger_auto_schema(
         method="POST",
@@ -226,3 +305,19 @@ class AuthRequestViewSet(GenericViewSet):
             raise InvalidToken(e.args[0])
 
         return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        method="POST", request_body=LogoutSerializer(), responses={204: ""}
+    )
+    @action(detail=False, methods=["POST"])
+    def logout(self, request: Request) -> Response:
+        """Revoke the refresh token and every access token made from it."""
+        serializer = LogoutSerializer(data=request.data)
+
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,35 @@
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from services.sms_service import SMSService
+
+
+class CircuitBreakerMetricsSerializer(serializers.Serializer):
+    state = serializers.CharField()
+    calls = serializers.IntegerField()
+    failures = serializers.IntegerField()
+    slow_calls = serializers.IntegerField()
+    failure_rate = serializers.FloatField()
+    slow_call_rate = serializers.FloatField()
+    rejected_calls = serializers.IntegerField()
+    opened_count = serializers.IntegerField()
+    opened_at = serializers.FloatField(allow_null=True)
+
+
+class SMSServiceViewSet(GenericViewSet):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        method="GET", responses={200: CircuitBreakerMetricsSerializer()}
+    )
+    @action(detail=False, methods=["GET"])
+    def breaker(self, request: Request) -> Response:
+        """State of the circuit breaker around the SMS provider, calls are counted over the breaker window."""
+        metrics = SMSService.get_breaker().get_metrics()
+        serializer = CircuitBreakerMetricsSerializer(metrics)
+        return Response(status=status.HTTP_200_OK, data=serializer.data)
@@ -1,13 +1,22 @@
+import uuid
+from datetime import timedelta
 from typing import cast
 
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from apps.user.models import User
+from apps.user.models import User, UserDataExport
+from apps.user.tasks import build_user_data_export_task
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,6 +31,29 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
 
+class UserDataExportSerializer(serializers.ModelSerializer):
+    expire_datetime = serializers.DateTimeField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserDataExport
+        fields = [
+            "id",
+            "status",
+            "size",
+            "created_at",
+            "expire_datetime",
+            "download_url",
+        ]
+
+    def get_download_url(self, export: UserDataExport) -> str | None:
+        if not export.is_ready():
+            return None
+        return self.context["request"].build_absolute_uri(
+            reverse("api:user-me-export-download")
+        )
+
+
 class UserViewSet(GenericViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
@@ -29,9 +61,7 @@ class UserViewSet(GenericViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self, *args, **kwargs):
-        user = cast(User, self.request.user)
-        assert isinstance(user.id, int)
-        return self.queryset.filter(id=user.id)
+        return self.queryset.filter(id=self.request.user.id)
 
     @action(detail=False, methods=["GET", "PATCH"])
     def me(self, request: Request):
@@ -44,11 +74,88 @@ class UserViewSet(GenericViewSet):
         serializer = UserSerializer(request.user, context={"request": request})
         return Response(status=status.HTTP_200_OK, data=serializer.data)
 
-    @staticmethod
-    def me_update(request: Request) -> Response:
+    def me_update(self, request: Request) -> Response:
+        # Reads are served from the user snapshot, updates start from the row itself.
+        user = cast(User, self.get_queryset().get())
         serializer = UserSerializer(
-            request.user, context={"request": request}, data=request.data, partial=True
+            user, context={"request": request}, data=request.data, partial=True
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(status=status.HTTP_200_OK, data=serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET", "POST"],
+        url_path="me/export",
+        url_name="me-export",
+    )
+    def me_export(self, request: Request) -> Response:
+        """
+        POST starts building a ZIP of the user's data in the background, GET polls the latest one. Once it's ready
+        the export has a ``download_url``.
+        """
+        if request.method and request.method.lower() == "post":
+            return self.me_export_create(request)
+        export = self.get_exports().first()
+        if export is None:
+            raise NotFound()
+        serializer = UserDataExportSerializer(export, context={"request": request})
+        return Response(status=status.HTTP_200_OK, data=serializer.data)
+
+    def me_export_create(self, request: Request) -> Response:
+        # An export that's still being built is returned instead of starting another, unless its build was lost.
+        export = (
+            self.get_exports()
+            .filter(
+                status=UserDataExport.Statuses.PENDING,
+                created_at__gt=timezone.now()
+                - timedelta(seconds=settings.USER_DATA_EXPORT_TIME_LIMIT),
+            )
+            .first()
+        )
+        if export is None:
+            export = UserDataExport.objects.create(user_id=self.get_user_id())
+            transaction.on_commit(
+                lambda: build_user_data_export_task.delay(str(export.id))
+            )
+        serializer = UserDataExportSerializer(export, context={"request": request})
+        return Response(status=status.HTTP_202_ACCEPTED, data=serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="me/export/download",
+        url_name="me-export-download",
+    )
+    def me_export_download(self, request: Request) -> FileResponse:
+        export = (
+            self.get_exports()
+            .filter(
+                status=UserDataExport.Statuses.READY,
+                created_at__gt=timezone.now()
+                - timedelta(days=settings.USER_DATA_EXPORT_TTL_DAYS),
+            )
+            .first()
+        )
+        if export is None:
+            raise NotFound()
+        try:
+            file = export.file.open("rb")
+        except FileNotFoundError:
+            # The archive was deleted or written where this process can't read it, a new export can be requested.
+            raise NotFound()
+        return FileResponse(
+            file,
+            as_attachment=True,
+            filename=f"camerator-{export.created_at:%Y%m%d}.zip",
+        )
+
+    def get_user_id(self) -> uuid.UUID:
+        # The TokenUser of StatelessJWTAuthentication, its id comes from the token.
+        return cast(uuid.UUID, self.request.user.id)
+
+    def get_exports(self):
+        return UserDataExport.objects.filter(user_id=self.get_user_id()).order_by(
+            "-created_at"
+        )
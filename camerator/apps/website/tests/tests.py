@@ -1,5 +1,12 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.blog.models import Post, PostCategory
 from apps.website.models import Contact, Newsletter
+from utils.testcases import QueryCountTestCaseMixin, RedisTestCaseMixin
+
+User = get_user_model()
 
 
 class TestContactModel(TestCase):
@@ -26,3 +33,29 @@ class TestNewsletterModel(TestCase):
     def test_newsletter_model(self):
         self.newsletter = Newsletter.objects.create(email="test@example.com")
         self.assertEqual(self.newsletter.email, "test@example.com")
+
+
+class TestIndexView(RedisTestCaseMixin, QueryCountTestCaseMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        category = PostCategory.objects.create(title="Portrait")
+        for number in range(12):
+            post = Post.objects.create(
+                title=f"Post {number}",
+                author=user,
+                slug=f"post-{number}",
+                image="test_image.jpg",
+                status=Post.PostChoices.PUBLISHED,
+                caption=f"Caption {number}",
+            )
+            post.category.add(category)
+
+    def test_query_count(self):
+        # The posts and their categories.
+        with self.assertNumStatements(2):
+            response = self.client.get(reverse("website:index-view"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["posts"]), 9)
+        self.assertContains(response, "Caption 11")
+        self.assertContains(response, "Portrait")
@@ -3,20 +3,22 @@ from django.urls import reverse_lazy
 from django.views.generic import CreateView, TemplateView
 from django.views.generic.edit import FormView
 
-from apps.blog.models import Post
+from apps.blog.models import Post, PostCategory
 from apps.website.models import Newsletter
+from utils.mixins.views import CachedPageMixin
 
 from .forms import ContactForm, NewsletterForm
 
 
-class IndexView(TemplateView):
+class IndexView(CachedPageMixin, TemplateView):
     template_name = "website/index.html"
+    page_cache_dependencies = (Post, PostCategory)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["posts"] = Post.objects.filter(
-            status=Post.PostChoices.PUBLISHED
-        ).order_by("-id")[0:9]
+        context["posts"] = (
+            Post.objects.published().for_cards("caption").order_by("-id")[0:9]
+        )
         return context
 
 
@@ -0,0 +1,159 @@
+"""
+Compare the admin user search before and after the trigram and prefix indexes.
+
+A copy of the user table is filled with generated users, then every search term is run the way the changelist runs
+it (a count and the first page) with Django's default search on the table as it was, and with
+``PrefixSearchAdminMixin`` once the indexes of ``User.Meta.indexes`` are built on the copy. Run it against a database
+with ``pg_trgm`` available with:
+
+    $ cd camerator && python -m benchmarks.admin_search --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+
+TABLE = "benchmark_user_search"
+TERMS = ["ali", "rezaei", "mohammad hosseini", "0912345", "0012", "ali 0935"]
+FIRST_NAMES = [
+    "Ali",
+    "Mohammad",
+    "Reza",
+    "Hossein",
+    "Zahra",
+    "Fatemeh",
+    "Maryam",
+    "Sara",
+    "Amir",
+    "Narges",
+]
+LAST_NAMES = [
+    "Rezaei",
+    "Mohammadi",
+    "Hosseini",
+    "Ahmadi",
+    "Karimi",
+    "Moradi",
+    "Jafari",
+    "Sadeghi",
+    "Rahimi",
+    "Abbasi",
+]
+
+
+def fill(cursor, rows: int) -> None:
+    from apps.user.models import User
+
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {User._meta.db_table} INCLUDING DEFAULTS)"
+    )
+    # Names get a numeric suffix so they're not all alike, mobiles and national codes are spread over their range.
+    cursor.execute(
+        f"""
+        INSERT INTO {TABLE} (
+            id, password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined,
+            national_code, image
+        )
+        SELECT
+            md5(i::text)::uuid, '', false,
+            '09' || lpad(((i::bigint * 7919) %% 1000000000)::text, 9, '0'),
+            (%(first_names)s)[1 + i %% 10] || (i %% 997),
+            (%(last_names)s)[1 + (i / 10) %% 10] || (i %% 991),
+            '', false, true, now(),
+            lpad(((i::bigint * 104729) %% 10000000000)::text, 10, '0'),
+            'users/images/default.png'
+        FROM generate_series(1, %(rows)s) AS i
+        """,
+        {"first_names": FIRST_NAMES, "last_names": LAST_NAMES, "rows": rows},
+    )
+    cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+    # The unique constraint of the username and its _like index were there before.
+    cursor.execute(f"CREATE UNIQUE INDEX ON {TABLE} (username)")
+    cursor.execute(f"CREATE INDEX ON {TABLE} (username varchar_pattern_ops)")
+    cursor.execute(f"ANALYZE {TABLE}")
+
+
+def add_indexes(cursor) -> None:
+    from django.db import connection
+
+    from apps.user.models import User
+
+    with connection.schema_editor(atomic=False) as editor:
+        for index in User._meta.indexes:
+            sql = str(index.create_sql(User, editor))
+            cursor.execute(
+                sql.replace(f'"{User._meta.db_table}"', TABLE).replace(
+                    f'"{index.name}"', f'"{index.name}_benchmark"'
+                )
+            )
+    cursor.execute(f"ANALYZE {TABLE}")
+
+
+def time_search(cursor, model_admin, term: str, repeat: int) -> float:
+    """Median milliseconds of the count and the first page of a search."""
+    from apps.user.models import User
+
+    queryset, _ = model_admin.get_search_results(None, User.objects.all(), term)
+    count_sql, count_params = queryset.order_by().values("pk").query.sql_with_params()
+    page_sql, page_params = queryset.order_by(*model_admin.ordering)[
+        :100
+    ].query.sql_with_params()
+    queries = [
+        (f"SELECT count(*) FROM ({count_sql}) AS search", count_params),
+        (page_sql, page_params),
+    ]
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for sql, params in queries:
+            cursor.execute(sql.replace(f'"{User._meta.db_table}"', TABLE), params)
+            cursor.fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    import django
+
+    django.setup()
+    from django.contrib import admin
+    from django.db import connection
+
+    from apps.user.models import User
+
+    user_admin = admin.site._registry[User]
+    default_admin = admin.ModelAdmin(User, admin.site)
+    default_admin.search_fields = user_admin.search_fields
+    default_admin.ordering = user_admin.ordering
+
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        fill(cursor, args.rows)
+        print(f"generated {args.rows:,} users in {time.perf_counter() - started:.0f}s")
+        before = {
+            term: time_search(cursor, default_admin, term, args.repeat)
+            for term in TERMS
+        }
+        started = time.perf_counter()
+        add_indexes(cursor)
+        print(f"built the indexes in {time.perf_counter() - started:.0f}s")
+        after = {
+            term: time_search(cursor, user_admin, term, args.repeat) for term in TERMS
+        }
+        cursor.execute(f"DROP TABLE {TABLE}")
+
+    for term in TERMS:
+        print(
+            f"{term!r:<22} before={before[term]:>9,.1f}ms after={after[term]:>9,.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
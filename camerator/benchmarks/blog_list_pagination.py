@@ -0,0 +1,90 @@
+"""
+Compare the pages of the blog list with page numbers and with cursors.
+
+The posts of ``benchmarks.blog_search`` are generated in a copy of the post table, then pages at increasing depths
+are read the way the list view read them, with ``Paginator`` (a count and an offset), and the way it reads them now,
+with ``KeysetPaginator`` from the cursor of the previous page once the indexes of ``Post.Meta.indexes`` are built on
+the copy. Run it with:
+
+    $ cd camerator && python -m benchmarks.blog_list_pagination --rows 100000
+"""
+import argparse
+import os
+import statistics
+import time
+
+PER_PAGE = 9
+DEPTHS = [0.0, 0.1, 0.5, 0.99]
+
+
+def time_page(read_page, repeat: int) -> float:
+    """Median milliseconds of reading a page."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        read_page()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    import django
+
+    django.setup()
+    from django.core.paginator import Paginator
+    from django.db import connection
+
+    from apps.blog.models import Post
+    from benchmarks.blog_search import SCHEMA, add_indexes, fill
+    from utils.pagination import KeysetPaginator
+
+    queryset = Post.objects.published().for_cards("created_date")
+    pages = args.rows // PER_PAGE
+    results = []
+    with connection.cursor() as cursor:
+        fill(cursor, args.rows)
+        # Posts are generated in the same instant, they're spread over a year so that pages aren't decided by ids.
+        cursor.execute(
+            f"UPDATE {Post._meta.db_table} "
+            "SET created_date = now() - (id * 314159 % 525600) * interval '1 minute'"
+        )
+        add_indexes(cursor)
+        for depth in DEPTHS:
+            number = 1 + int(depth * (pages - 1))
+            # A paginator per request, it counts the posts for every page as the view did.
+            offset_ms = time_page(
+                lambda: list(
+                    Paginator(queryset.order_by("-created_date", "id"), PER_PAGE)
+                    .page(number)
+                    .object_list
+                ),
+                args.repeat,
+            )
+            # The cursor of the previous page, as the "Next page" button of that page holds it.
+            keyset = KeysetPaginator(queryset, ("-created_date", "id"), PER_PAGE)
+            cursor_value = None
+            if number > 1:
+                last = queryset.order_by("-created_date", "id")[
+                    (number - 1) * PER_PAGE - 1
+                ]
+                cursor_value = keyset.encode_cursor(last, True)
+            keyset_ms = time_page(lambda: list(keyset.page(cursor_value)), args.repeat)
+            results.append((number, offset_ms, keyset_ms))
+        cursor.execute("RESET search_path")
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+
+    for number, offset_ms, keyset_ms in results:
+        print(
+            f"page {number:>6,} of {pages:,}  "
+            f"page numbers={offset_ms:>8,.1f}ms cursors={keyset_ms:>6,.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
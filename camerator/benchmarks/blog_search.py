@@ -0,0 +1,191 @@
+"""
+Compare the blog search before and after full-text search.
+
+A copy of the post table is made in its own schema and filled with generated posts, titled and captioned with a city
+and common words, half of them written with the Arabic yeh and kaf. The connection's ``search_path`` puts the copy
+first, so the list view's queries (a count and the first page) run on it unchanged: with ``title__icontains`` as it
+was, then with ``PostQuerySet.search()`` once the indexes of ``Post.Meta.indexes`` are built on the copy. Run it against
+a database with ``pg_trgm`` available and a UTF-8 ``LC_CTYPE``, pg_trgm takes no trigrams from Persian words in the C
+locale:
+
+    $ cd camerator && python -m benchmarks.blog_search --rows 100000
+"""
+import argparse
+import os
+import statistics
+import time
+
+SCHEMA = "benchmark_blog_search"
+TERMS = ["عکاسی", "عكاسي", "اصفهان", "اصفهان شب", "تبریز -پرتره", "landscpe", "کوهستن"]
+WORDS = [
+    "عکاسی",
+    "پرتره",
+    "طبیعت",
+    "شب",
+    "کوهستان",
+    "نور",
+    "سیاه",
+    "سفید",
+    "خیابان",
+    "دریا",
+    "آسمان",
+    "photography",
+    "landscape",
+    "camera",
+    "lens",
+]
+CITIES = [
+    "تهران",
+    "اصفهان",
+    "شیراز",
+    "تبریز",
+    "مشهد",
+    "یزد",
+    "کاشان",
+    "رشت",
+    "کرمان",
+    "همدان",
+    "قزوین",
+    "اردبیل",
+    "زنجان",
+    "ساری",
+    "گرگان",
+    "بوشهر",
+    "اهواز",
+    "کرمانشاه",
+    "سنندج",
+    "ارومیه",
+    "بندرعباس",
+    "قشم",
+    "کیش",
+    "بم",
+    "نائین",
+    "ماسوله",
+    "سمنان",
+    "بیرجند",
+    "زاهدان",
+    "خرم\u200cآباد",
+]
+
+
+def fill(cursor, rows: int) -> None:
+    from apps.blog.models import Post
+
+    table = Post._meta.db_table
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(
+        f"CREATE TABLE {SCHEMA}.{table} (LIKE public.{table} INCLUDING DEFAULTS)"
+    )
+    cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    # A city and two words in the title, a city and seven words in the caption, every other post in Arabic letters.
+    cursor.execute(
+        f"""
+        INSERT INTO {table} (
+            id, title, author_id, slug, image, created_date, updated_date, publish_date, status, caption
+        )
+        SELECT
+            i,
+            translate(
+                c[1 + (i::bigint * 31) %% m] || ' ' || w[1 + i %% n] || ' ' || w[1 + (i / n) %% n] || ' ' || i,
+                CASE WHEN i %% 2 = 0 THEN 'یک' ELSE '' END,
+                CASE WHEN i %% 2 = 0 THEN 'يك' ELSE '' END
+            ),
+            md5('author')::uuid, 'post-' || i, 'posts/images/post.jpg', now(), now(), now(), 'published',
+            c[1 + (i::bigint * 7) %% m] || ' ' || (
+                SELECT string_agg(w[1 + ((i::bigint * p) %% 7919) %% n], ' ')
+                FROM unnest(ARRAY[2, 3, 5, 7, 11, 13, 17]) AS p
+            )
+        FROM generate_series(1, %(rows)s) AS i,
+            LATERAL (
+                SELECT %(words)s::text[] AS w, cardinality(%(words)s::text[]) AS n,
+                    %(cities)s::text[] AS c, cardinality(%(cities)s::text[]) AS m
+            ) AS words
+        """,
+        {"words": WORDS, "cities": CITIES, "rows": rows},
+    )
+    cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+    cursor.execute(f"ANALYZE {table}")
+
+
+def fill_search_vectors() -> None:
+    from django.db.models import F
+
+    from apps.blog.models import Post
+    from apps.blog.search import post_search_vector
+
+    Post.objects.update(search_vector=post_search_vector(F("title"), F("caption")))
+
+
+def add_indexes(cursor) -> None:
+    from django.db import connection
+
+    from apps.blog.models import Post
+
+    with connection.schema_editor(atomic=False) as editor:
+        for index in Post._meta.indexes:
+            editor.add_index(Post, index)
+    cursor.execute(f"ANALYZE {Post._meta.db_table}")
+
+
+def time_search(search, term: str, repeat: int) -> tuple[float, int]:
+    """Median milliseconds of the count and the first page of a search, and the number of posts found."""
+    from apps.blog.models import Post
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        queryset = search(Post.objects.published().for_cards(), term)
+        count = queryset.count()
+        list(queryset[:9])
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        fill(cursor, args.rows)
+        print(f"generated {args.rows:,} posts in {time.perf_counter() - started:.0f}s")
+        before = {
+            term: time_search(
+                lambda queryset, term: queryset.filter(title__icontains=term),
+                term,
+                args.repeat,
+            )
+            for term in TERMS
+        }
+        started = time.perf_counter()
+        fill_search_vectors()
+        add_indexes(cursor)
+        print(f"built the vectors and indexes in {time.perf_counter() - started:.0f}s")
+        after = {
+            term: time_search(
+                lambda queryset, term: queryset.search(term), term, args.repeat
+            )
+            for term in TERMS
+        }
+        cursor.execute("RESET search_path")
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+
+    for term in TERMS:
+        (before_ms, before_count), (after_ms, after_count) = before[term], after[term]
+        print(
+            f"{term!r:<16} before={before_ms:>8,.1f}ms ({before_count:>6,} posts) "
+            f"after={after_ms:>8,.1f}ms ({after_count:>6,} posts)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare the per-send latency of the pooled Kavenegar session with the old ``requests.post`` per send.
+
+The provider is replaced by a local keep-alive HTTP server, so the numbers show the connection overhead only (plain
+HTTP, so no TLS handshake is counted and the real saving against api.kavenegar.com is larger). Run it with:
+
+    $ cd camerator && python -m benchmarks.kavenegar_session --sends 500
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from services.kavenegar import Kavenegar, KavenegarTemplate, get_session
+
+API_KEY = "BENCHMARK"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = json.dumps({"return": {"status": 200, "message": "OK"}}).encode()
+
+    def do_POST(self):  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_send(base_url: str) -> Callable[[], object]:
+    url = f"{base_url}/{API_KEY}/verify/lookup.json"
+    params = {
+        "receptor": "09123456789",
+        "template": KavenegarTemplate.OTP_CODE.value,
+        "token": "12345",
+    }
+    return lambda: requests.post(url, params=params)
+
+
+def pooled_send(base_url: str) -> Callable[[], object]:
+    kavenegar = Kavenegar(API_KEY, session=get_session(), base_url=base_url)
+    return lambda: kavenegar._raw_send(
+        KavenegarTemplate.OTP_CODE.value, "09123456789", tokens={"token": "12345"}
+    )
+
+
+def measure(send: Callable[[], object], sends: int) -> list[float]:
+    timings = []
+    for _ in range(sends):
+        start = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{name:<8} mean={statistics.mean(timings):.3f}ms "
+        f"median={statistics.median(timings):.3f}ms p95={p95:.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sends", type=int, default=500)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    try:
+        report("legacy", measure(legacy_send(base_url), args.sends))
+        report("pooled", measure(pooled_send(base_url), args.sends))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
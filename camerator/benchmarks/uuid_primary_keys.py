@@ -0,0 +1,107 @@
+"""
+Compare random UUIDv4 with time-ordered UUIDv7 primary keys on inserts into the ``AuthRequest`` table.
+
+Each generator fills its own copy of the table (same columns and indexes) in batches, like the OTP flush task does,
+and reports the insert throughput and the size of the primary key and of all indexes. Past a few million rows the
+random keys no longer fit in shared_buffers and their throughput drops, while the ordered keys keep appending to the
+last page. Run it against a database you can write to with:
+
+    $ cd camerator && python -m benchmarks.uuid_primary_keys --rows 2000000
+"""
+import argparse
+import os
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Field
+
+from utils.uuids import uuid7
+
+GENERATORS: dict[str, Callable[[], uuid.UUID]] = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def make_rows(
+    fields: list[Field], generate: Callable[[], uuid.UUID], start: int, count: int
+) -> list[tuple]:
+    """Values of ``fields`` for completed requests, the columns the benchmark doesn't set get their defaults."""
+    from apps.user.models import AuthRequest
+
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows: list[tuple] = []
+    for number in range(start, start + count):
+        created_at = epoch + timedelta(milliseconds=number)
+        auth_request = AuthRequest(
+            id=generate(),
+            mobile=f"0912{number % 10_000_000:07d}",
+            otp_code="12345",
+            expire_datetime=created_at + timedelta(minutes=5),
+            request_status=AuthRequest.RequestStatuses.COMPLETED,
+            delivery_status=AuthRequest.DeliveryStatuses.SENT,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        rows.append(tuple(getattr(auth_request, field.attname) for field in fields))
+    return rows
+
+
+def run(
+    name: str, generate: Callable[[], uuid.UUID], rows: int, batch_size: int
+) -> None:
+    from django.db import connection
+    from psycopg2.extras import execute_values
+
+    from apps.user.models import AuthRequest
+
+    table = f"benchmark_authrequest_{name}"
+    # Every column of the table, so that columns added later don't break the inserts.
+    fields = [field for field in AuthRequest._meta.fields if field.concrete]
+    columns = [field.column for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {AuthRequest._meta.db_table} INCLUDING ALL)"
+        )
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+        elapsed = 0.0
+        for start in range(0, rows, batch_size):
+            batch = make_rows(fields, generate, start, min(batch_size, rows - start))
+            started = time.perf_counter()
+            execute_values(cursor.cursor, sql, batch, page_size=batch_size)
+            connection.commit()
+            elapsed += time.perf_counter() - started
+
+        cursor.execute(
+            "SELECT pg_relation_size(%s), pg_indexes_size(%s)",
+            [f"{table}_pkey", table],
+        )
+        primary_key_size, indexes_size = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {table}")
+        connection.commit()
+
+    print(
+        f"{name:<6} {rows / elapsed:>10,.0f} rows/s "
+        f"pkey={primary_key_size / 2**20:,.1f}MiB indexes={indexes_size / 2**20:,.1f}MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    connection.set_autocommit(False)
+    for name, generate in GENERATORS.items():
+        run(name, generate, args.rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter, SimpleRouter
 
+from apps.user.v1.async_auth_request import AsyncMobileView, AsyncResendCodeView
+from apps.user.v1.auth_funnel import AuthFunnelViewSet
 from apps.user.v1.auth_request import AuthRequestViewSet
+from apps.user.v1.sms_service import SMSServiceViewSet
 from apps.user.v1.user import UserViewSet
 
 router = DefaultRouter() if settings.DEBUG else SimpleRouter()
 router.register("v1/users", UserViewSet)
 router.register("v1/auth", AuthRequestViewSet, basename="auth")
+router.register("v1/dashboard/sms-service", SMSServiceViewSet, basename="sms-service")
+router.register("v1/dashboard/auth-funnel", AuthFunnelViewSet, basename="auth-funnel")
 
 app_name = "api"
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("v1/async/auth/mobile/", AsyncMobileView.as_view(), name="async-auth-mobile"),
+    path(
+        "v1/async/auth/<uuid:pk>/resend-code/",
+        AsyncResendCodeView.as_view(),
+        name="async-auth-resend-code",
+    ),
+    *router.urls,
+]
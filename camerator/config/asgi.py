@@ -1,3 +1,14 @@
+"""
+ASGI config for camerator project.
+
+It exposes the ASGI callable as a module-level variable named ``application``. Serve it with an ASGI server, e.g.
+``gunicorn config.asgi -k uvicorn.workers.UvicornWorker``, to let the async views (the ``/api/v1/async/auth/``
+endpoints) wait on external services concurrently inside a single worker.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
 import os
 
 from django.core.asgi import get_asgi_application
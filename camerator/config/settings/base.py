@@ -75,6 +75,7 @@ DJANGO_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -293,6 +294,27 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-schedule
+CELERY_BEAT_SCHEDULE = {
+    "flush-otp-requests": {
+        "task": "apps.user.tasks.flush_otp_requests_task",
+        "schedule": env.int("OTP_STATE_FLUSH_INTERVAL", 60),  # seconds
+    },
+    "archive-auth-requests": {
+        "task": "apps.user.tasks.archive_auth_requests_task",
+        "schedule": env.int("AUTH_REQUEST_ARCHIVE_INTERVAL", 60 * 60),  # seconds
+    },
+    "rollup-auth-funnel": {
+        "task": "apps.user.tasks.rollup_auth_funnel_task",
+        "schedule": env.int("AUTH_FUNNEL_ROLLUP_INTERVAL", 10 * 60),  # seconds
+    },
+    "delete-expired-user-data-exports": {
+        "task": "apps.user.tasks.delete_expired_user_data_exports_task",
+        "schedule": env.int(
+            "USER_DATA_EXPORT_CLEANUP_INTERVAL", 24 * 60 * 60
+        ),  # seconds
+    },
+}
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#worker-send-task-events
 CELERY_WORKER_SEND_TASK_EVENTS = True
 # https://docs.celeryq.dev/en/stable/userguide/configuration.html#std-setting-task_send_sent_event
@@ -306,7 +328,7 @@ ACCOUNT_ALLOW_REGISTRATION = env.bool("DJANGO_ACCOUNT_ALLOW_REGISTRATION", True)
 # django-rest-framework - https://www.django-rest-framework.org/api-guide/settings/
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.user.authentication.StatelessJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DATE_INPUT_FORMATS": ["%Y-%m-%d"],
@@ -343,6 +365,17 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
 }
+# Requests are authenticated from the token claims, views that need the whole user read this snapshot of it.
+USER_SNAPSHOT_TTL = env.int("USER_SNAPSHOT_TTL", 300)  # seconds
+# Revoked tokens are kept in redis until they expire. Every process checks tokens against a Bloom filter of them first,
+# synced at this interval, so a revocation reaches the other processes within it.
+TOKEN_REVOCATION_SYNC_INTERVAL = env.float(
+    "TOKEN_REVOCATION_SYNC_INTERVAL", 1
+)  # seconds
+TOKEN_REVOCATION_BLOOM_CAPACITY = env.int("TOKEN_REVOCATION_BLOOM_CAPACITY", 100000)
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = env.float(
+    "TOKEN_REVOCATION_BLOOM_ERROR_RATE", 0.001
+)
 
 
 # django-cors-headers - https://github.com/adamchainz/django-cors-headers#setup
@@ -368,10 +401,113 @@ REDOC_SETTINGS = {
     "LAZY_RENDERING": False,
 }
 
+# SMS
+# ----------------------------------------------------------------------------
+# Backend of the SMS service, one of "kavenegar", "locmem" and "file" or the dotted path to a
+# services.sms_backends.BaseSMSBackend subclass. The fake ones never reach a provider, use them for load tests.
+SMS_BACKEND = env.str("SMS_BACKEND", "kavenegar")
+# The file backend appends messages here, waiting the latency and failing that share of the sends.
+SMS_FILE_PATH = env.str("SMS_FILE_PATH", str(BASE_DIR / "logs" / "sms_outbox.jsonl"))
+SMS_FAKE_LATENCY = env.float("SMS_FAKE_LATENCY", 0)  # seconds
+SMS_FAKE_FAILURE_RATE = env.float("SMS_FAKE_FAILURE_RATE", 0)
+# Circuit breaker around the provider, shared by all workers through redis. It opens when either rate is crossed
+# over the window (once enough calls were made) and lets a single probe through after the open timeout.
+SMS_BREAKER_FAILURE_RATE = env.float("SMS_BREAKER_FAILURE_RATE", 0.5)
+SMS_BREAKER_SLOW_CALL_DURATION = env.float(
+    "SMS_BREAKER_SLOW_CALL_DURATION", 2
+)  # seconds
+SMS_BREAKER_SLOW_CALL_RATE = env.float("SMS_BREAKER_SLOW_CALL_RATE", 0.5)
+SMS_BREAKER_MINIMUM_CALLS = env.int("SMS_BREAKER_MINIMUM_CALLS", 10)
+SMS_BREAKER_WINDOW = env.int("SMS_BREAKER_WINDOW", 60)  # seconds
+SMS_BREAKER_OPEN_TIMEOUT = env.int("SMS_BREAKER_OPEN_TIMEOUT", 30)  # seconds
+
 # KAVENEGAR
 # ----------------------------------------------------------------------------
 KAVENEGAR_API_KEY = env.str("KAVENEGAR_API_KEY", "")
+# Every process keeps one keep-alive session to the provider, sized by these pool settings.
+KAVENEGAR_CONNECT_TIMEOUT = env.float("KAVENEGAR_CONNECT_TIMEOUT", 3.05)  # seconds
+KAVENEGAR_READ_TIMEOUT = env.float("KAVENEGAR_READ_TIMEOUT", 10)  # seconds
+KAVENEGAR_POOL_CONNECTIONS = env.int("KAVENEGAR_POOL_CONNECTIONS", 1)
+KAVENEGAR_POOL_MAXSIZE = env.int("KAVENEGAR_POOL_MAXSIZE", 10)
+# Bulk sends split receptors into chunks and send them concurrently, keep the workers below the pool size.
+KAVENEGAR_BULK_CHUNK_SIZE = env.int("KAVENEGAR_BULK_CHUNK_SIZE", 200)
+KAVENEGAR_BULK_MAX_WORKERS = env.int("KAVENEGAR_BULK_MAX_WORKERS", 4)
+
+# OTP
+# ----------------------------------------------------------------------------
+# OTP codes are delivered by celery, these control how provider failures are retried.
+OTP_DELIVERY_MAX_RETRIES = env.int("OTP_DELIVERY_MAX_RETRIES", 5)
+OTP_DELIVERY_RETRY_BACKOFF = env.int("OTP_DELIVERY_RETRY_BACKOFF", 2)  # seconds
+OTP_DELIVERY_RETRY_BACKOFF_MAX = env.int("OTP_DELIVERY_RETRY_BACKOFF_MAX", 60)
+# Pending auth requests live in redis and are written to postgres in batches once they're completed or expired.
+# An expired request can still be resent for the resend window, it's only flushed after it. Keys outlive the window by
+# the grace period so the flush task can still read them.
+OTP_RESEND_WINDOW = env.int("OTP_RESEND_WINDOW", 10 * 60)  # seconds
+OTP_STATE_FLUSH_GRACE = env.int("OTP_STATE_FLUSH_GRACE", 10 * 60)  # seconds
+OTP_STATE_FLUSH_BATCH_SIZE = env.int("OTP_STATE_FLUSH_BATCH_SIZE", 500)
+# Retries of /auth/mobile/ with the same Idempotency-Key get the first response while its code is valid.
+OTP_IDEMPOTENCY_TTL = env.int("OTP_IDEMPOTENCY_TTL", 5 * 60)  # seconds
+# Finished auth requests older than the retention are moved from the table to gzipped JSON lines files.
+AUTH_REQUEST_RETENTION_DAYS = env.int("AUTH_REQUEST_RETENTION_DAYS", 30)
+AUTH_REQUEST_ARCHIVE_ROOT = env.str(
+    "AUTH_REQUEST_ARCHIVE_ROOT", str(BASE_DIR / "archives" / "auth_requests")
+)
+AUTH_REQUEST_ARCHIVE_BATCH_SIZE = env.int("AUTH_REQUEST_ARCHIVE_BATCH_SIZE", 5000)
+# Caps the work of a single run, a backlog is cleared over the next runs.
+AUTH_REQUEST_ARCHIVE_MAX_BATCHES = env.int("AUTH_REQUEST_ARCHIVE_MAX_BATCHES", 20)
+# Requests are flushed to the table once completed or expired, hours are recounted until all of theirs have arrived.
+AUTH_FUNNEL_ROLLUP_LOOKBACK_HOURS = env.int("AUTH_FUNNEL_ROLLUP_LOOKBACK_HOURS", 3)
+AUTH_FUNNEL_ROLLUP_MAX_HOURS = env.int("AUTH_FUNNEL_ROLLUP_MAX_HOURS", 7 * 24)
+# Longest period the dashboard reads at once.
+AUTH_FUNNEL_MAX_DAYS = env.int("AUTH_FUNNEL_MAX_DAYS", 366)
+
+# USER DATA EXPORTS
+# ------------------------------------------------------------------------------
+USER_DATA_EXPORT_ROOT = env.str(
+    "USER_DATA_EXPORT_ROOT", str(BASE_DIR / "archives" / "user_exports")
+)
+# Exports are downloadable for this long and deleted afterwards.
+USER_DATA_EXPORT_TTL_DAYS = env.int("USER_DATA_EXPORT_TTL_DAYS", 7)
+# Rows fetched per round trip of the server-side cursors and bytes per read of the copied files.
+USER_DATA_EXPORT_CHUNK_SIZE = env.int("USER_DATA_EXPORT_CHUNK_SIZE", 2000)
+USER_DATA_EXPORT_FILE_CHUNK_SIZE = env.int("USER_DATA_EXPORT_FILE_CHUNK_SIZE", 2**20)
+# Exports of users with many posts take longer than the default celery time limits.
+USER_DATA_EXPORT_TIME_LIMIT = env.int("USER_DATA_EXPORT_TIME_LIMIT", 30 * 60)  # seconds
+
+# BLOG
+# ------------------------------------------------------------------------------
+# The blog list pages through posts from cursors, the total it shows is counted this often.
+POST_LIST_COUNT_CACHE_TTL = env.int("POST_LIST_COUNT_CACHE_TTL", 5 * 60)  # seconds, 0 leaves it out
+# Comments of a post shown at once, the rest are loaded a page at a time by the "load more" button.
+COMMENT_THREAD_PAGE_SIZE = env.int("COMMENT_THREAD_PAGE_SIZE", 20)
+# Searches that match no post show this many posts with similar titles, in case the term has a typo.
+POST_SEARCH_FALLBACK_LIMIT = env.int("POST_SEARCH_FALLBACK_LIMIT", 45)
+
+# PAGE CACHE
+# ------------------------------------------------------------------------------
+# Rendered blog and website pages are cached in redis until the models they're rendered from change, or this long.
+PAGE_CACHE_TIMEOUT = env.int("PAGE_CACHE_TIMEOUT", 60 * 60)  # seconds, 0 turns the cache off
+# An outdated page is rendered by one request, the lock is released after the render or after this long.
+PAGE_CACHE_LOCK_TIMEOUT = env.int("PAGE_CACHE_LOCK_TIMEOUT", 30)  # seconds
+# Requests for a page that's being rendered for the first time wait this long for it before rendering it themselves.
+PAGE_CACHE_WAIT_TIMEOUT = env.float("PAGE_CACHE_WAIT_TIMEOUT", 5)  # seconds
+PAGE_CACHE_POLL_INTERVAL = env.float("PAGE_CACHE_POLL_INTERVAL", 0.05)  # seconds
+
+# DELETION
+# ------------------------------------------------------------------------------
+# Objects deleted from the admin are deleted in the background, this many rows per transaction.
+DELETION_BATCH_SIZE = env.int("DELETION_BATCH_SIZE", 1000)
+# Batches of a single task run, the rest of a job is queued as a new task.
+DELETION_MAX_BATCHES = env.int("DELETION_MAX_BATCHES", 50)
 
 # Redis
 # ------------------------------------------------------------------------------
 REDIS_HOST = env.str("REDIS_HOST", "redis")
+REDIS_URL = env.str("REDIS_URL", f"redis://{REDIS_HOST}:6379/0")
+# Every key written through utils.redis is namespaced, tests give each case its own prefix.
+REDIS_KEY_PREFIX = env.str("REDIS_KEY_PREFIX", "camerator:")
+# Requests repeating an Idempotency-Key wait this long for the first one before they get a 409.
+IDEMPOTENCY_WAIT_TIMEOUT = env.float("IDEMPOTENCY_WAIT_TIMEOUT", 10)  # seconds
+IDEMPOTENCY_POLL_INTERVAL = env.float("IDEMPOTENCY_POLL_INTERVAL", 0.05)  # seconds
+# Frees the key of a request that died while it ran.
+IDEMPOTENCY_LOCK_TIMEOUT = env.int("IDEMPOTENCY_LOCK_TIMEOUT", 30)  # seconds
@@ -0,0 +1,264 @@
+"""
+Circuit breaker with its state in redis, so every worker of every node stops calling a failing dependency at once.
+
+The breaker counts calls, failures and slow calls in time buckets over a rolling window. Once enough calls were
+made and the failure or slow call rate crosses its threshold the breaker opens, and calls fail fast without
+reaching the dependency. After ``open_timeout`` it's half-open: a single probe call goes through, its success
+closes the breaker and its failure opens it again.
+"""
+import logging
+import math
+import time
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from redis import RedisError
+
+from utils.redis import get_redis_connection, redis_key
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# KEYS: state hash, probe key. ARGV: open timeout, probe timeout.
+# Returns the state the call is made in, or "" when it's rejected.
+ALLOW_SCRIPT = """
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call("hget", KEYS[1], "state") or "closed"
+if state == "closed" then
+    return state
+end
+if state == "open" then
+    local opened_at = tonumber(redis.call("hget", KEYS[1], "opened_at") or "0")
+    if now - opened_at < tonumber(ARGV[1]) then
+        redis.call("hincrby", KEYS[1], "rejected", 1)
+        return ""
+    end
+    redis.call("hset", KEYS[1], "state", "half_open")
+end
+if redis.call("set", KEYS[2], "1", "NX", "EX", ARGV[2]) then
+    return "half_open"
+end
+redis.call("hincrby", KEYS[1], "rejected", 1)
+return ""
+"""
+
+# KEYS: state hash, probe key, prefix of the bucket hashes.
+# ARGV: failed (0/1), slow (0/1), window, bucket size, minimum calls, failure rate, slow call rate.
+# Returns the state after the call, "opened" when this call opened the breaker.
+RECORD_SCRIPT = """
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket_size = tonumber(ARGV[4])
+local index = math.floor(now / bucket_size)
+local first = index - math.ceil(tonumber(ARGV[3]) / bucket_size) + 1
+local healthy = ARGV[1] == "0" and ARGV[2] == "0"
+
+local function reset()
+    for i = first, index do
+        redis.call("del", KEYS[3] .. ":" .. i)
+    end
+end
+
+local function open()
+    redis.call("hset", KEYS[1], "state", "open", "opened_at", tostring(now))
+    redis.call("hincrby", KEYS[1], "opened", 1)
+    reset()
+    return "opened"
+end
+
+local state = redis.call("hget", KEYS[1], "state") or "closed"
+if state == "half_open" then
+    redis.call("del", KEYS[2])
+    if not healthy then
+        return open()
+    end
+    redis.call("hset", KEYS[1], "state", "closed")
+    reset()
+    return "closed"
+end
+if state == "open" then
+    return state
+end
+
+local key = KEYS[3] .. ":" .. index
+redis.call("hincrby", key, "calls", 1)
+redis.call("hincrby", key, "failures", tonumber(ARGV[1]))
+redis.call("hincrby", key, "slow", tonumber(ARGV[2]))
+redis.call("expire", key, tonumber(ARGV[3]) + bucket_size)
+
+local calls, failures, slow = 0, 0, 0
+for i = first, index do
+    local values = redis.call("hmget", KEYS[3] .. ":" .. i, "calls", "failures", "slow")
+    calls = calls + tonumber(values[1] or "0")
+    failures = failures + tonumber(values[2] or "0")
+    slow = slow + tonumber(values[3] or "0")
+end
+if calls >= tonumber(ARGV[5]) and
+        (failures / calls >= tonumber(ARGV[6]) or slow / calls >= tonumber(ARGV[7])) then
+    return open()
+end
+return "closed"
+"""
+
+
+class CircuitBreakerOpen(Exception):
+    def __init__(self, message: str = "Circuit breaker is open"):
+        super().__init__(message)
+
+
+@dataclass
+class CircuitBreakerMetrics:
+    state: str
+    calls: int
+    failures: int
+    slow_calls: int
+    rejected_calls: int
+    opened_count: int
+    opened_at: float | None
+
+    @property
+    def failure_rate(self) -> float:
+        return self.failures / self.calls if self.calls else 0.0
+
+    @property
+    def slow_call_rate(self) -> float:
+        return self.slow_calls / self.calls if self.calls else 0.0
+
+
+class CircuitBreaker:
+    """
+    Wrap calls to the dependency in ``call()`` (or ``acall()`` in async code), which raises ``CircuitBreakerOpen``
+    instead of making the call while the breaker is open. Any exception of ``failure_exceptions`` is a failure and
+    calls slower than ``slow_call_duration`` seconds count against the slow call rate. If redis itself is down the
+    breaker stays out of the way and lets every call through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_exceptions: tuple[type[BaseException], ...],
+        failure_rate_threshold: float = 0.5,
+        slow_call_duration: float = 2,
+        slow_call_rate_threshold: float = 0.5,
+        minimum_calls: int = 10,
+        window: int = 60,
+        bucket_size: int = 10,
+        open_timeout: int = 30,
+    ):
+        self.name = name
+        self.failure_exceptions = failure_exceptions
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window = window
+        self.bucket_size = bucket_size
+        self.open_timeout = open_timeout
+
+    @property
+    def state_key(self) -> str:
+        return redis_key("breaker", self.name, "state")
+
+    @property
+    def probe_key(self) -> str:
+        return redis_key("breaker", self.name, "probe")
+
+    @property
+    def bucket_key(self) -> str:
+        return redis_key("breaker", self.name, "bucket")
+
+    def before_call(self) -> None:
+        try:
+            state = get_redis_connection().eval(
+                ALLOW_SCRIPT,
+                2,
+                self.state_key,
+                self.probe_key,
+                self.open_timeout,
+                # A probe that never reports back (its worker died) frees the slot after another open_timeout.
+                max(self.open_timeout, 1),
+            )
+        except RedisError:
+            logger.exception("Circuit breaker %s can't reach redis.", self.name)
+            return
+        if not state:
+            raise CircuitBreakerOpen(f"Circuit breaker {self.name} is open")
+
+    def record(self, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_duration
+        try:
+            state = get_redis_connection().eval(
+                RECORD_SCRIPT,
+                3,
+                self.state_key,
+                self.probe_key,
+                self.bucket_key,
+                int(failed),
+                int(slow),
+                self.window,
+                self.bucket_size,
+                self.minimum_calls,
+                self.failure_rate_threshold,
+                self.slow_call_rate_threshold,
+            )
+        except RedisError:
+            logger.exception("Circuit breaker %s can't reach redis.", self.name)
+            return
+        if state == b"opened":
+            logger.warning("Circuit breaker %s is open.", self.name)
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        self.before_call()
+        start = time.perf_counter()
+        try:
+            yield
+        except self.failure_exceptions:
+            self.record(True, time.perf_counter() - start)
+            raise
+        self.record(False, time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def acall(self) -> AsyncIterator[None]:
+        await sync_to_async(self.before_call)()
+        start = time.perf_counter()
+        try:
+            yield
+        except self.failure_exceptions:
+            await sync_to_async(self.record)(True, time.perf_counter() - start)
+            raise
+        await sync_to_async(self.record)(False, time.perf_counter() - start)
+
+    def get_metrics(self) -> CircuitBreakerMetrics:
+        redis = get_redis_connection()
+        state = {
+            key.decode(): value.decode()
+            for key, value in redis.hgetall(self.state_key).items()
+        }
+        index = int(time.time() // self.bucket_size)
+        buckets = math.ceil(self.window / self.bucket_size)
+        pipe = redis.pipeline()
+        for i in range(index - buckets + 1, index + 1):
+            pipe.hmget(f"{self.bucket_key}:{i}", "calls", "failures", "slow")
+        totals = [0, 0, 0]
+        for values in pipe.execute():
+            for position, value in enumerate(values):
+                totals[position] += int(value or 0)
+        return CircuitBreakerMetrics(
+            state=state.get("state", CLOSED),
+            calls=totals[0],
+            failures=totals[1],
+            slow_calls=totals[2],
+            rejected_calls=int(state.get("rejected", 0)),
+            opened_count=int(state.get("opened", 0)),
+            opened_at=float(state["opened_at"]) if "opened_at" in state else None,
+        )
+
+    def reset(self) -> None:
+        get_redis_connection().delete(self.state_key, self.probe_key)
@@ -1,7 +1,14 @@
+import asyncio
+import os
+import weakref
+from collections.abc import AsyncGenerator, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
 from .exceptions import KavenegarRequestException, MobileNumberException
 from .validators import validate_phone_number
@@ -18,6 +25,20 @@ class MobileNumber(str):
         if not validate_phone_number(value):
             raise MobileNumberException()
 
+    @classmethod
+    def validate_many(
+        cls, values: Iterable[str]
+    ) -> tuple[list["MobileNumber"], list[str]]:
+        """Split values into unique valid mobile numbers and invalid values, keeping their original order."""
+        valid: list[MobileNumber] = []
+        invalid: list[str] = []
+        for value in dict.fromkeys(values):
+            if validate_phone_number(value):
+                valid.append(value if isinstance(value, cls) else cls(value))
+            else:
+                invalid.append(value)
+        return valid, invalid
+
 
 @dataclass
 class KavenegarResult:
@@ -25,15 +46,126 @@ class KavenegarResult:
     response_message: str
 
 
+@dataclass
+class KavenegarMessageResult:
+    receptor: str
+    message_id: int | None
+    status: int | None
+    status_text: str
+
+    @property
+    def is_accepted(self) -> bool:
+        return self.status in ACCEPTED_MESSAGE_STATUSES
+
+
+DEFAULT_BASE_URL = "https://api.kavenegar.com/v1"
+DEFAULT_TIMEOUT = (3.05, 10)
+# sms/send.json accepts at most 200 comma separated receptors per request.
+MAX_RECEPTORS_PER_REQUEST = 200
+# Queued, scheduled, sent to telecom and delivered message statuses.
+ACCEPTED_MESSAGE_STATUSES = {1, 2, 4, 5, 10}
+
+_sessions: dict[tuple[int, int], requests.Session] = {}
+
+
+def get_session(pool_connections: int = 1, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Return the keep-alive session of the current process for the given pool size. Reusing it saves a DNS lookup and
+    a TCP/TLS handshake on every send. Sessions are dropped in forked children, so workers never share sockets.
+    """
+    key = (pool_connections, pool_maxsize)
+    if key not in _sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _sessions[key] = session
+    return _sessions[key]
+
+
+os.register_at_fork(after_in_child=_sessions.clear)
+
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, tuple[httpx.AsyncClient, AsyncGenerator]
+] = weakref.WeakKeyDictionary()
+
+
+async def _close_with_loop(
+    loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient
+) -> AsyncGenerator[httpx.AsyncClient, None]:
+    """
+    Keeps ``client`` open until the loop shuts its async generators down, which ``asyncio.run()`` and asgiref do
+    before closing the loop, and closes its connections then.
+    """
+    try:
+        yield client
+    finally:
+        _async_clients.pop(loop, None)
+        await client.aclose()
+
+
+async def get_async_client(
+    pool_maxsize: int = 10, timeout: tuple[float, float] = DEFAULT_TIMEOUT
+) -> httpx.AsyncClient:
+    """
+    Return the keep-alive async client of the running event loop. Clients can't be shared between loops, so an ASGI
+    worker keeps a single client while async views served under WSGI get one per request loop, closed with it.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        connect_timeout, read_timeout = timeout
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize
+            ),
+        )
+        # The loop only holds its async generators weakly, the generator is kept along with the client.
+        lifetime = _close_with_loop(loop, client)
+        _async_clients[loop] = (await anext(lifetime), lifetime)
+    return _async_clients[loop][0]
+
+
+def build_tokens(kwargs: dict[str, str]) -> dict[str, str]:
+    """Map template arguments to the token, token2, token3, ... parameters of verify/lookup.json in order."""
+    tokens = {}
+    for index, value in enumerate(kwargs.values()):
+        prefix = "" if index == 0 else index + 1
+        tokens[f"token{prefix}"] = value
+    return tokens
+
+
+def parse_lookup_response(
+    response: requests.Response | httpx.Response,
+) -> KavenegarResult:
+    if response.status_code != 200:
+        raise KavenegarRequestException()
+    ret = response.json()["return"]
+    return KavenegarResult(response_code=ret["status"], response_message=ret["message"])
+
+
 class Kavenegar:
-    def __init__(self, api_key: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+        session: requests.Session | None = None,
+        base_url: str = DEFAULT_BASE_URL,
+    ) -> None:
         self.api_key = api_key
+        self.timeout = timeout
+        self.session = session or get_session()
+        self.base_url = base_url
 
-    @staticmethod
-    def _raw_send(template, receptor, tokens, api_key):
-        url = f"https://api.kavenegar.com/v1/{api_key}/verify/lookup.json"
+    def _raw_send(self, template, receptor, tokens):
+        url = f"{self.base_url}/{self.api_key}/verify/lookup.json"
         params = {"receptor": receptor, "template": template, **tokens}
-        return requests.post(url, params=params)
+        try:
+            return self.session.post(url, params=params, timeout=self.timeout)
+        except requests.RequestException as ex:
+            raise KavenegarRequestException() from ex
 
     def send_request(
         self, mobile_number: MobileNumber, template: KavenegarTemplate, **kwargs: str
@@ -45,17 +177,115 @@ class Kavenegar:
         print(f"\t{args = }")
         print("--------------------------END KAVENEGAR SMS--------------------------")
 
-        tokens = {}
-        for index, value in enumerate(kwargs.values()):
-            prefix = "" if index == 0 else index + 1
-            tokens[f"token{prefix}"] = value
         response = self._raw_send(
-            template.value, mobile_number, api_key=self.api_key, tokens=tokens
+            template.value, mobile_number, tokens=build_tokens(kwargs)
         )
+        return parse_lookup_response(response)
+
+    def _send_chunk(
+        self, receptors: Sequence[str], message: str, sender: str | None
+    ) -> list[KavenegarMessageResult]:
+        url = f"{self.base_url}/{self.api_key}/sms/send.json"
+        data = {"receptor": ",".join(receptors), "message": message}
+        if sender:
+            data["sender"] = sender
+        try:
+            response = self.session.post(url, data=data, timeout=self.timeout)
+        except requests.RequestException as ex:
+            raise KavenegarRequestException() from ex
         if response.status_code != 200:
             raise KavenegarRequestException()
-        response = response.json()
-        ret = response["return"]
-        return KavenegarResult(
-            response_code=ret["status"], response_message=ret["message"]
+        # A reply that isn't a list of entries fails the chunk like a transport error instead of the whole send.
+        try:
+            return [
+                KavenegarMessageResult(
+                    receptor=entry["receptor"],
+                    message_id=entry["messageid"],
+                    status=entry["status"],
+                    status_text=entry["statustext"],
+                )
+                for entry in response.json()["entries"]
+            ]
+        except (ValueError, KeyError, TypeError) as ex:
+            raise KavenegarRequestException() from ex
+
+    def send_many(
+        self,
+        receptors: Sequence[MobileNumber],
+        message: str,
+        sender: str | None = None,
+        chunk_size: int = MAX_RECEPTORS_PER_REQUEST,
+        max_workers: int = 4,
+    ) -> list[KavenegarMessageResult]:
+        """
+        Send one message to many receptors. Receptors are grouped into provider sized chunks which are sent
+        concurrently by at most ``max_workers`` threads sharing the pooled session. A failed chunk doesn't stop the
+        others, its receptors get a result without a status instead. Results keep the order of ``receptors``.
+        """
+        chunk_size = min(chunk_size, MAX_RECEPTORS_PER_REQUEST)
+        starts = range(0, len(receptors), chunk_size)
+        chunks = [receptors[start:start + chunk_size] for start in starts]
+        results: list[KavenegarMessageResult] = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self._send_chunk, chunk, message, sender)
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(future.result())
+                except KavenegarRequestException as ex:
+                    results.extend(
+                        KavenegarMessageResult(
+                            receptor=receptor,
+                            message_id=None,
+                            status=None,
+                            status_text=str(ex),
+                        )
+                        for receptor in chunk
+                    )
+        return results
+
+
+class AsyncKavenegar:
+    """asyncio counterpart of ``Kavenegar.send_request``, waiting on the provider doesn't block the event loop."""
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: tuple[float, float] = DEFAULT_TIMEOUT,
+        client: httpx.AsyncClient | None = None,
+        base_url: str = DEFAULT_BASE_URL,
+        pool_maxsize: int = 10,
+    ) -> None:
+        self.api_key = api_key
+        self.timeout = timeout
+        self.client = client
+        self.base_url = base_url
+        self.pool_maxsize = pool_maxsize
+
+    async def get_client(self) -> httpx.AsyncClient:
+        """The given client, or the pooled client of the running loop."""
+        return self.client or await get_async_client(self.pool_maxsize, self.timeout)
+
+    async def _raw_send(self, template, receptor, tokens) -> httpx.Response:
+        url = f"{self.base_url}/{self.api_key}/verify/lookup.json"
+        params = {"receptor": receptor, "template": template, **tokens}
+        connect_timeout, read_timeout = self.timeout
+        client = await self.get_client()
+        try:
+            return await client.post(
+                url,
+                params=params,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+        except httpx.HTTPError as ex:
+            raise KavenegarRequestException() from ex
+
+    async def send_request(
+        self, mobile_number: MobileNumber, template: KavenegarTemplate, **kwargs: str
+    ) -> KavenegarResult:
+        response = await self._raw_send(
+            template.value, mobile_number, tokens=build_tokens(kwargs)
         )
+        return parse_lookup_response(response)
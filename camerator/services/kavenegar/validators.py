@@ -1,6 +1,7 @@
 import re
 
+PHONE_NUMBER_PATTERN = re.compile(r"^09\d{9}$")
+
 
 def validate_phone_number(number: str) -> bool:
-    pattern = r"^09\d{9}$"
-    return bool(re.match(pattern, number))
+    return bool(PHONE_NUMBER_PATTERN.match(number))
@@ -0,0 +1,257 @@
+"""
+Backends ``SMSService`` sends messages through, picked by the ``SMS_BACKEND`` setting: one of the aliases in
+``BACKENDS`` or the dotted path to a ``BaseSMSBackend`` subclass. Besides kavenegar there are two fakes that never
+reach a provider, so the whole auth flow can be load tested: ``locmem`` keeps messages in memory without any delay
+and ``file`` appends them to ``SMS_FILE_PATH`` with an injected latency and failure rate.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from services.kavenegar import (
+    AsyncKavenegar, Kavenegar, KavenegarMessageResult, KavenegarRequestException, KavenegarResult, KavenegarTemplate,
+    MobileNumber, get_session
+)
+
+BACKENDS = {
+    "kavenegar": "services.sms_backends.KavenegarBackend",
+    "locmem": "services.sms_backends.LocMemSMSBackend",
+    "file": "services.sms_backends.FileSMSBackend",
+}
+
+
+class SMSBackendException(Exception):
+    def __init__(self, message: str = "SMS backend couldn't send the message"):
+        super().__init__(message)
+
+
+class BaseSMSBackend(ABC):
+    @abstractmethod
+    def send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        """Send the OTP code to the mobile number, raises ``SMSBackendException`` if it can't."""
+
+    async def async_send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        # Backends without an async client send from a thread, so the event loop isn't blocked.
+        return await sync_to_async(self.send_otp_code, thread_sensitive=False)(
+            mobile_number, otp_code
+        )
+
+    @abstractmethod
+    def send_many(
+        self, mobile_numbers: Sequence[MobileNumber], message: str
+    ) -> list[KavenegarMessageResult]:
+        """Send the message to every mobile number and return one result per mobile number."""
+
+
+class KavenegarBackend(BaseSMSBackend):
+    @staticmethod
+    def get_kavenegar() -> Kavenegar:
+        session = get_session(
+            pool_connections=settings.KAVENEGAR_POOL_CONNECTIONS,
+            pool_maxsize=settings.KAVENEGAR_POOL_MAXSIZE,
+        )
+        return Kavenegar(
+            settings.KAVENEGAR_API_KEY,
+            timeout=(
+                settings.KAVENEGAR_CONNECT_TIMEOUT,
+                settings.KAVENEGAR_READ_TIMEOUT,
+            ),
+            session=session,
+        )
+
+    @staticmethod
+    def get_async_kavenegar() -> AsyncKavenegar:
+        return AsyncKavenegar(
+            settings.KAVENEGAR_API_KEY,
+            timeout=(
+                settings.KAVENEGAR_CONNECT_TIMEOUT,
+                settings.KAVENEGAR_READ_TIMEOUT,
+            ),
+            pool_maxsize=settings.KAVENEGAR_POOL_MAXSIZE,
+        )
+
+    def send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        try:
+            return self.get_kavenegar().send_request(
+                mobile_number, KavenegarTemplate.OTP_CODE, otp_code=otp_code
+            )
+        except KavenegarRequestException as ex:
+            raise SMSBackendException(str(ex)) from ex
+
+    async def async_send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        try:
+            return await self.get_async_kavenegar().send_request(
+                mobile_number, KavenegarTemplate.OTP_CODE, otp_code=otp_code
+            )
+        except KavenegarRequestException as ex:
+            raise SMSBackendException(str(ex)) from ex
+
+    def send_many(
+        self, mobile_numbers: Sequence[MobileNumber], message: str
+    ) -> list[KavenegarMessageResult]:
+        return self.get_kavenegar().send_many(
+            mobile_numbers,
+            message,
+            chunk_size=settings.KAVENEGAR_BULK_CHUNK_SIZE,
+            max_workers=settings.KAVENEGAR_BULK_MAX_WORKERS,
+        )
+
+
+@dataclass
+class SMSMessage:
+    message_id: int
+    mobile_number: str
+    message: str
+    template: str | None
+    sent_at: datetime
+
+
+# Queued, the first of kavenegar's accepted message statuses.
+QUEUED_STATUS = 1
+_message_ids = count(1)
+
+
+class FakeSMSBackend(BaseSMSBackend):
+    """Accepts every message without a provider, subclasses decide where the messages go."""
+
+    latency: float = 0
+    failure_rate: float = 0
+
+    @abstractmethod
+    def deliver(self, messages: list[SMSMessage]) -> None:
+        ...
+
+    def is_failed(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+    @staticmethod
+    def build_message(
+        mobile_number: str, message: str, template: KavenegarTemplate | None = None
+    ) -> SMSMessage:
+        return SMSMessage(
+            message_id=next(_message_ids),
+            mobile_number=mobile_number,
+            message=message,
+            template=template.value if template else None,
+            sent_at=timezone.now(),
+        )
+
+    def _send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        if self.is_failed():
+            raise SMSBackendException()
+        self.deliver(
+            [self.build_message(mobile_number, otp_code, KavenegarTemplate.OTP_CODE)]
+        )
+        return KavenegarResult(response_code=200, response_message="")
+
+    def send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._send_otp_code(mobile_number, otp_code)
+
+    async def async_send_otp_code(
+        self, mobile_number: MobileNumber, otp_code: str
+    ) -> KavenegarResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._send_otp_code(mobile_number, otp_code)
+
+    def send_many(
+        self, mobile_numbers: Sequence[MobileNumber], message: str
+    ) -> list[KavenegarMessageResult]:
+        if self.latency:
+            time.sleep(self.latency)
+        results: list[KavenegarMessageResult] = []
+        messages: list[SMSMessage] = []
+        for mobile_number in mobile_numbers:
+            if self.is_failed():
+                results.append(
+                    KavenegarMessageResult(
+                        receptor=mobile_number,
+                        message_id=None,
+                        status=None,
+                        status_text=str(SMSBackendException()),
+                    )
+                )
+                continue
+            sms_message = self.build_message(mobile_number, message)
+            messages.append(sms_message)
+            results.append(
+                KavenegarMessageResult(
+                    receptor=mobile_number,
+                    message_id=sms_message.message_id,
+                    status=QUEUED_STATUS,
+                    status_text="queued",
+                )
+            )
+        self.deliver(messages)
+        return results
+
+
+# Latest messages sent through the locmem backend of this process, tests and load test scripts read them from here.
+outbox: deque[SMSMessage] = deque(maxlen=10000)
+
+
+class LocMemSMSBackend(FakeSMSBackend):
+    """Keeps messages in ``outbox`` and returns right away, for tests and load tests of our own code."""
+
+    def deliver(self, messages: list[SMSMessage]) -> None:
+        outbox.extend(messages)
+
+
+class FileSMSBackend(FakeSMSBackend):
+    """
+    Appends messages as JSON lines to ``SMS_FILE_PATH``. Every send waits ``SMS_FAKE_LATENCY`` seconds and fails
+    with ``SMS_FAKE_FAILURE_RATE`` probability, to see how the auth flow (and the breaker) holds up under a slow or
+    failing provider.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.path = Path(settings.SMS_FILE_PATH)
+        self.latency = settings.SMS_FAKE_LATENCY
+        self.failure_rate = settings.SMS_FAKE_FAILURE_RATE
+
+    def deliver(self, messages: list[SMSMessage]) -> None:
+        if not messages:
+            return
+        lines = "".join(
+            json.dumps(asdict(message), cls=DjangoJSONEncoder) + "\n"
+            for message in messages
+        )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+
+def get_backend(backend: str | None = None) -> BaseSMSBackend:
+    backend = backend or settings.SMS_BACKEND
+    return import_string(BACKENDS.get(backend, backend))()
@@ -1,10 +1,17 @@
 import random
+import time
+from collections.abc import Iterable
 from dataclasses import dataclass
 from typing import Optional
 
 from django.conf import settings
 
-from services.kavenegar import Kavenegar, KavenegarRequestException, KavenegarResult, KavenegarTemplate, MobileNumber
+from services import sms_backends
+from services.circuit_breaker import CircuitBreaker, CircuitBreakerOpen
+from services.kavenegar import (
+    KavenegarMessageResult, KavenegarResult, KavenegarTemplate, MobileNumber, MobileNumberException
+)
+from services.sms_backends import BaseSMSBackend, SMSBackendException
 
 
 class OTPCodeException(Exception):
@@ -38,18 +45,39 @@ class SMSServiceResult:
     kwargs: dict[str, str]
 
 
+@dataclass
+class SMSServiceMessageResult:
+    mobile_number: str
+    is_sent: bool
+    message_id: int | None
+    status_text: str
+
+
 TOTPCode = Optional[OTPCode | str]
 
 
 class SMSService:
-    @classmethod
-    def send_otp_code(
-        cls, mobile_number: MobileNumber | str, otp_code: TOTPCode = None
-    ) -> SMSServiceResult:
-        """
-        Send the OTP Code to the mobile number using kavenegar API and return the result along with mobile_number itself
-        and the otp_code. If no otp_code is provided, we generate a random otp_code.
-        """
+    @staticmethod
+    def get_backend() -> BaseSMSBackend:
+        return sms_backends.get_backend()
+
+    @staticmethod
+    def get_breaker() -> CircuitBreaker:
+        return CircuitBreaker(
+            "sms",
+            failure_exceptions=(SMSBackendException,),
+            failure_rate_threshold=settings.SMS_BREAKER_FAILURE_RATE,
+            slow_call_duration=settings.SMS_BREAKER_SLOW_CALL_DURATION,
+            slow_call_rate_threshold=settings.SMS_BREAKER_SLOW_CALL_RATE,
+            minimum_calls=settings.SMS_BREAKER_MINIMUM_CALLS,
+            window=settings.SMS_BREAKER_WINDOW,
+            open_timeout=settings.SMS_BREAKER_OPEN_TIMEOUT,
+        )
+
+    @staticmethod
+    def _clean_otp_arguments(
+        mobile_number: MobileNumber | str, otp_code: TOTPCode
+    ) -> tuple[MobileNumber, OTPCode]:
         _mobile_number: MobileNumber
         _mobile_number = (
             MobileNumber(mobile_number)
@@ -63,30 +91,123 @@ class SMSService:
             if not isinstance(otp_code, OTPCode)
             else otp_code
         )
-
-        kavenegar_api = settings.KAVENEGAR_API_KEY
-        debug_setting = settings.DEBUG
-
-        kavenegar = Kavenegar(kavenegar_api)
+        return _mobile_number, _otp_code
+
+    @staticmethod
+    def _otp_code_result(
+        mobile_number: MobileNumber,
+        otp_code: OTPCode,
+        result: KavenegarResult | None,
+        exception: SMSBackendException | CircuitBreakerOpen | None,
+    ) -> SMSServiceResult:
         template = KavenegarTemplate.OTP_CODE
-        try:
-            result: KavenegarResult = kavenegar.send_request(
-                _mobile_number, template, otp_code=_otp_code
-            )
-        except KavenegarRequestException as ex:
-            if debug_setting:
-                return SMSServiceResult(
-                    mobile_number=_mobile_number,
-                    template=template,
-                    response_code=200,
-                    response_message="",
-                    kwargs={"otp_code": _otp_code},
-                )
-            raise SMSServiceException from ex
+        if exception is not None:
+            if not settings.DEBUG:
+                raise SMSServiceException from exception
+            result = KavenegarResult(response_code=200, response_message="")
+        assert result is not None
         return SMSServiceResult(
-            mobile_number=_mobile_number,
+            mobile_number=mobile_number,
             template=template,
             response_code=result.response_code,
             response_message=result.response_message,
-            kwargs={"otp_code": _otp_code},
+            kwargs={"otp_code": otp_code},
+        )
+
+    @classmethod
+    def send_otp_code(
+        cls, mobile_number: MobileNumber | str, otp_code: TOTPCode = None
+    ) -> SMSServiceResult:
+        """
+        Send the OTP Code to the mobile number through the SMS_BACKEND and return the result along with mobile_number
+        itself and the otp_code. If no otp_code is provided, we generate a random otp_code. While the provider is
+        failing the circuit breaker is open and we raise SMSServiceException without calling it.
+        """
+        _mobile_number, _otp_code = cls._clean_otp_arguments(mobile_number, otp_code)
+        backend = cls.get_backend()
+        try:
+            with cls.get_breaker().call():
+                result = backend.send_otp_code(_mobile_number, _otp_code)
+        except (SMSBackendException, CircuitBreakerOpen) as ex:
+            return cls._otp_code_result(_mobile_number, _otp_code, None, ex)
+        return cls._otp_code_result(_mobile_number, _otp_code, result, None)
+
+    @classmethod
+    async def async_send_otp_code(
+        cls, mobile_number: MobileNumber | str, otp_code: TOTPCode = None
+    ) -> SMSServiceResult:
+        """Same as ``send_otp_code``, but waits on the provider without blocking the event loop."""
+        _mobile_number, _otp_code = cls._clean_otp_arguments(mobile_number, otp_code)
+        backend = cls.get_backend()
+        try:
+            async with cls.get_breaker().acall():
+                result = await backend.async_send_otp_code(_mobile_number, _otp_code)
+        except (SMSBackendException, CircuitBreakerOpen) as ex:
+            return cls._otp_code_result(_mobile_number, _otp_code, None, ex)
+        return cls._otp_code_result(_mobile_number, _otp_code, result, None)
+
+    @classmethod
+    def send_many(
+        cls, mobile_numbers: Iterable[MobileNumber | str], message: str
+    ) -> list[SMSServiceMessageResult]:
+        """
+        Send the message to every mobile number and return one result per unique mobile number. Invalid numbers are
+        reported as not sent without reaching the provider, valid ones are sent in concurrent provider sized chunks.
+        While the circuit breaker is open the valid numbers are reported as not sent with the SMSServiceException
+        message, so they can be told apart from invalid ones and retried.
+        """
+        valid, invalid = MobileNumber.validate_many(mobile_numbers)
+        kavenegar_results: list[KavenegarMessageResult] = []
+        unsent: list[MobileNumber] = []
+        unsent_status_text = ""
+        if valid:
+            breaker = cls.get_breaker()
+            start = time.perf_counter()
+            try:
+                breaker.before_call()
+            except CircuitBreakerOpen:
+                unsent, unsent_status_text = valid, str(SMSServiceException())
+            else:
+                try:
+                    kavenegar_results = cls.get_backend().send_many(valid, message)
+                except SMSBackendException as ex:
+                    breaker.record(True, time.perf_counter() - start)
+                    unsent, unsent_status_text = valid, str(ex)
+                else:
+                    # Failed chunks are reported per recipient instead of raised, the bulk is a failure of the
+                    # provider when as many recipients got no reply as the failure rate the breaker opens at.
+                    unanswered = sum(
+                        result.status is None for result in kavenegar_results
+                    )
+                    breaker.record(
+                        unanswered >= len(valid) * breaker.failure_rate_threshold,
+                        time.perf_counter() - start,
+                    )
+        results = [
+            SMSServiceMessageResult(
+                mobile_number=result.receptor,
+                is_sent=result.is_accepted,
+                message_id=result.message_id,
+                status_text=result.status_text,
+            )
+            for result in kavenegar_results
+        ]
+        results.extend(
+            SMSServiceMessageResult(
+                mobile_number=mobile_number,
+                is_sent=False,
+                message_id=None,
+                status_text=unsent_status_text,
+            )
+            for mobile_number in unsent
+        )
+        results.extend(
+            SMSServiceMessageResult(
+                mobile_number=mobile_number,
+                is_sent=False,
+                message_id=None,
+                status_text=str(MobileNumberException()),
+            )
+            for mobile_number in invalid
         )
+        return results
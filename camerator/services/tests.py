@@ -1,12 +1,30 @@
+import asyncio
+import json
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from services.kavenegar import KavenegarResult, KavenegarTemplate
-from services.kavenegar.exceptions import MobileNumberException
-from services.sms_service import OTPCodeException, SMSService, SMSServiceResult
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import override_settings
 
+from services.circuit_breaker import CircuitBreaker, CircuitBreakerOpen
+from services.kavenegar import (
+    AsyncKavenegar, Kavenegar, KavenegarMessageResult, KavenegarResult, KavenegarTemplate, MobileNumber,
+    get_async_client, get_session
+)
+from services.kavenegar.exceptions import KavenegarRequestException, MobileNumberException
+from services.sms_backends import (
+    FileSMSBackend, KavenegarBackend, LocMemSMSBackend, SMSBackendException, get_backend, outbox
+)
+from services.sms_service import OTPCodeException, SMSService, SMSServiceException, SMSServiceResult
+from utils.testcases import RedisTestCaseMixin
 
-class SMSServiceTestCase(unittest.TestCase):
+
+class SMSServiceTestCase(RedisTestCaseMixin, unittest.TestCase):
     @patch("services.kavenegar.Kavenegar.send_request")
     def test_send_sms_valid_mobile_number(self, kavenegar_mock: MagicMock):
         kavenegar_mock.return_value = KavenegarResult(
@@ -42,5 +60,358 @@ class SMSServiceTestCase(unittest.TestCase):
             SMSService.send_otp_code(mobile, otp_code)
 
 
+class KavenegarSessionTestCase(unittest.TestCase):
+    def test_session_is_reused_per_pool_size(self):
+        self.assertIs(get_session(), get_session())
+        self.assertIs(get_session(2, 20), get_session(2, 20))
+        self.assertIsNot(get_session(), get_session(2, 20))
+
+    def test_sms_service_uses_configured_session_and_timeouts(self):
+        kavenegar = KavenegarBackend.get_kavenegar()
+        self.assertIs(
+            kavenegar.session,
+            get_session(
+                settings.KAVENEGAR_POOL_CONNECTIONS, settings.KAVENEGAR_POOL_MAXSIZE
+            ),
+        )
+        self.assertEqual(
+            kavenegar.timeout,
+            (settings.KAVENEGAR_CONNECT_TIMEOUT, settings.KAVENEGAR_READ_TIMEOUT),
+        )
+
+    def test_transport_errors_raise_kavenegar_exception(self):
+        session = MagicMock(spec=requests.Session)
+        session.post.side_effect = requests.Timeout()
+        kavenegar = Kavenegar("API_KEY", timeout=(1, 2), session=session)
+        with self.assertRaises(KavenegarRequestException):
+            kavenegar.send_request(
+                "09123456789", KavenegarTemplate.OTP_CODE, otp_code="12345"
+            )
+        self.assertEqual(session.post.call_args.kwargs["timeout"], (1, 2))
+
+
+class BulkSMSTestCase(RedisTestCaseMixin, unittest.TestCase):
+    @staticmethod
+    def _provider_response(data: dict) -> MagicMock:
+        receptors = data["receptor"].split(",")
+        response = MagicMock(status_code=200)
+        response.json.return_value = {
+            "return": {"status": 200, "message": "OK"},
+            "entries": [
+                {"messageid": index, "receptor": r, "status": 1, "statustext": "OK"}
+                for index, r in enumerate(receptors)
+            ],
+        }
+        return response
+
+    def test_validate_many(self):
+        valid, invalid = MobileNumber.validate_many(
+            ["09123456789", "0912", "09123456789", "09350000000"]
+        )
+        self.assertEqual(valid, ["09123456789", "09350000000"])
+        self.assertTrue(all(isinstance(number, MobileNumber) for number in valid))
+        self.assertEqual(invalid, ["0912"])
+
+    def test_send_many_sends_chunks_and_keeps_order(self):
+        session = MagicMock(spec=requests.Session)
+        session.post.side_effect = lambda url, data, timeout: self._provider_response(
+            data
+        )
+        kavenegar = Kavenegar("API_KEY", session=session)
+        receptors = [MobileNumber(f"0912{index:07}") for index in range(450)]
+        results = kavenegar.send_many(receptors, "Hello", chunk_size=200)
+        self.assertEqual(session.post.call_count, 3)
+        self.assertEqual([result.receptor for result in results], receptors)
+        self.assertTrue(all(result.is_accepted for result in results))
+
+    def test_send_many_reports_failed_chunks_per_recipient(self):
+        session = MagicMock(spec=requests.Session)
+
+        def post(url, data, timeout):
+            if data["receptor"].startswith("09120000000"):
+                raise requests.ConnectionError()
+            return self._provider_response(data)
+
+        session.post.side_effect = post
+        kavenegar = Kavenegar("API_KEY", session=session)
+        receptors = [MobileNumber(f"0912{index:07}") for index in range(4)]
+        results = kavenegar.send_many(receptors, "Hello", chunk_size=2)
+        self.assertEqual(
+            [result.is_accepted for result in results], [False, False, True, True]
+        )
+        self.assertIsNone(results[0].status)
+
+    def test_send_many_reports_malformed_replies_per_recipient(self):
+        session = MagicMock(spec=requests.Session)
+
+        def post(url, data, timeout):
+            if data["receptor"].startswith("09120000000"):
+                response = MagicMock(status_code=200)
+                response.json.side_effect = ValueError("Expecting value")
+                return response
+            if data["receptor"].startswith("09120000002"):
+                response = MagicMock(status_code=200)
+                response.json.return_value = {"return": {"status": 418}}
+                return response
+            return self._provider_response(data)
+
+        session.post.side_effect = post
+        kavenegar = Kavenegar("API_KEY", session=session)
+        receptors = [MobileNumber(f"0912{index:07}") for index in range(6)]
+        results = kavenegar.send_many(receptors, "Hello", chunk_size=2)
+        self.assertEqual([result.receptor for result in results], receptors)
+        self.assertEqual(
+            [result.is_accepted for result in results],
+            [False, False, False, False, True, True],
+        )
+
+    @patch("services.kavenegar.Kavenegar.send_many")
+    def test_sms_service_send_many(self, send_many_mock: MagicMock):
+        send_many_mock.return_value = [
+            KavenegarMessageResult(
+                receptor="09123456789", message_id=1, status=1, status_text="OK"
+            )
+        ]
+        results = SMSService.send_many(["09123456789", "WRONG"], "Hello")
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results[0].is_sent)
+        self.assertEqual(results[1].mobile_number, "WRONG")
+        self.assertFalse(results[1].is_sent)
+        send_many_mock.assert_called_once_with(
+            ["09123456789"],
+            "Hello",
+            chunk_size=settings.KAVENEGAR_BULK_CHUNK_SIZE,
+            max_workers=settings.KAVENEGAR_BULK_MAX_WORKERS,
+        )
+
+
+class AsyncKavenegarTestCase(RedisTestCaseMixin, unittest.IsolatedAsyncioTestCase):
+    async def test_send_request(self):
+        requests_params = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests_params.append(dict(request.url.params))
+            return httpx.Response(
+                200, json={"return": {"status": 200, "message": "OK"}}
+            )
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        kavenegar = AsyncKavenegar("API_KEY", client=client)
+        result = await kavenegar.send_request(
+            "09123456789", KavenegarTemplate.OTP_CODE, otp_code="12345"
+        )
+        self.assertEqual(
+            result, KavenegarResult(response_code=200, response_message="OK")
+        )
+        self.assertEqual(
+            requests_params,
+            [{"receptor": "09123456789", "template": "otp_code", "token": "12345"}],
+        )
+
+    async def test_transport_errors_raise_kavenegar_exception(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectTimeout("timeout")
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        kavenegar = AsyncKavenegar("API_KEY", client=client)
+        with self.assertRaises(KavenegarRequestException):
+            await kavenegar.send_request(
+                "09123456789", KavenegarTemplate.OTP_CODE, otp_code="12345"
+            )
+
+    async def test_async_client_is_reused_per_loop(self):
+        self.assertIs(await get_async_client(), await get_async_client())
+
+    def test_async_client_is_closed_with_its_loop(self):
+        client = asyncio.run(get_async_client())
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(asyncio.run(get_async_client()), client)
+
+    @patch("services.kavenegar.AsyncKavenegar.send_request")
+    async def test_async_send_otp_code(self, kavenegar_mock: MagicMock):
+        kavenegar_mock.return_value = KavenegarResult(
+            response_code=200, response_message=""
+        )
+        result = await SMSService.async_send_otp_code("09123456789", "23054")
+        self.assertEqual(result.kwargs, {"otp_code": "23054"})
+        kavenegar_mock.assert_awaited_once_with(
+            "09123456789", KavenegarTemplate.OTP_CODE, otp_code="23054"
+        )
+
+
+class CircuitBreakerTestCase(RedisTestCaseMixin, unittest.TestCase):
+    def make_breaker(self, **kwargs) -> CircuitBreaker:
+        options = {
+            "failure_exceptions": (KavenegarRequestException,),
+            "minimum_calls": 4,
+            "failure_rate_threshold": 0.5,
+            "open_timeout": 30,
+        }
+        options.update(kwargs)
+        return CircuitBreaker("test", **options)
+
+    def fail(self, breaker: CircuitBreaker) -> None:
+        with self.assertRaises(KavenegarRequestException):
+            with breaker.call():
+                raise KavenegarRequestException()
+
+    def succeed(self, breaker: CircuitBreaker) -> None:
+        with breaker.call():
+            pass
+
+    def test_opens_on_failure_rate(self):
+        breaker = self.make_breaker()
+        self.succeed(breaker)
+        self.fail(breaker)
+        self.succeed(breaker)
+        self.assertEqual(breaker.get_metrics().state, "closed")
+        self.fail(breaker)
+
+        metrics = breaker.get_metrics()
+        self.assertEqual(metrics.state, "open")
+        self.assertEqual(metrics.opened_count, 1)
+        called = MagicMock()
+        with self.assertRaises(CircuitBreakerOpen):
+            with breaker.call():
+                called()
+        called.assert_not_called()
+        self.assertEqual(breaker.get_metrics().rejected_calls, 1)
+
+    def test_opens_on_slow_call_rate(self):
+        breaker = self.make_breaker(slow_call_duration=0)
+        for _ in range(4):
+            self.succeed(breaker)
+        self.assertEqual(breaker.get_metrics().state, "open")
+
+    def test_stays_closed_below_minimum_calls(self):
+        breaker = self.make_breaker()
+        for _ in range(3):
+            self.fail(breaker)
+        metrics = breaker.get_metrics()
+        self.assertEqual(metrics.state, "closed")
+        self.assertEqual(metrics.calls, 3)
+        self.assertEqual(metrics.failures, 3)
+        self.assertEqual(metrics.failure_rate, 1)
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = self.make_breaker(open_timeout=0)
+        for _ in range(4):
+            self.fail(breaker)
+        self.assertEqual(breaker.get_metrics().state, "open")
+
+        # A failed probe opens the breaker again.
+        self.fail(breaker)
+        self.assertEqual(breaker.get_metrics().state, "open")
+
+        with breaker.call():
+            self.assertEqual(breaker.get_metrics().state, "half_open")
+            with self.assertRaises(CircuitBreakerOpen):
+                breaker.before_call()
+        self.assertEqual(breaker.get_metrics().state, "closed")
+        self.assertEqual(breaker.get_metrics().calls, 0)
+
+    @patch("services.kavenegar.Kavenegar.send_request")
+    def test_sms_service_fails_fast_while_open(self, kavenegar_mock: MagicMock):
+        kavenegar_mock.side_effect = KavenegarRequestException()
+        for _ in range(settings.SMS_BREAKER_MINIMUM_CALLS):
+            with self.assertRaises(SMSServiceException):
+                SMSService.send_otp_code("09123456789")
+        self.assertEqual(kavenegar_mock.call_count, settings.SMS_BREAKER_MINIMUM_CALLS)
+
+        with self.assertRaises(SMSServiceException):
+            SMSService.send_otp_code("09123456789")
+        self.assertEqual(kavenegar_mock.call_count, settings.SMS_BREAKER_MINIMUM_CALLS)
+        results = SMSService.send_many(["09123456789", "WRONG"], "message")
+        self.assertEqual(
+            [(result.is_sent, result.status_text) for result in results],
+            [
+                (False, str(SMSServiceException())),
+                (False, str(MobileNumberException())),
+            ],
+        )
+
+    @patch("services.kavenegar.Kavenegar.send_many")
+    def test_sms_service_send_many_records_outcome(self, send_many_mock: MagicMock):
+        send_many_mock.side_effect = lambda receptors, message, **kwargs: [
+            KavenegarMessageResult(
+                receptor=receptor,
+                message_id=None,
+                status=None,
+                status_text=str(KavenegarRequestException()),
+            )
+            for receptor in receptors
+        ]
+        for _ in range(settings.SMS_BREAKER_MINIMUM_CALLS):
+            SMSService.send_many(["09123456789"], "message")
+        metrics = SMSService.get_breaker().get_metrics()
+        self.assertEqual(metrics.state, "open")
+        self.assertEqual(metrics.opened_count, 1)
+
+        SMSService.send_many(["09123456789"], "message")
+        self.assertEqual(send_many_mock.call_count, settings.SMS_BREAKER_MINIMUM_CALLS)
+
+
+class SMSBackendTestCase(RedisTestCaseMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        outbox.clear()
+
+    def test_get_backend_by_alias_or_path(self):
+        self.assertIsInstance(get_backend(), KavenegarBackend)
+        self.assertIsInstance(get_backend("locmem"), LocMemSMSBackend)
+        self.assertIsInstance(
+            get_backend("services.sms_backends.FileSMSBackend"), FileSMSBackend
+        )
+
+    @patch("services.kavenegar.Kavenegar.send_request")
+    def test_kavenegar_backend_raises_backend_exception(
+        self, kavenegar_mock: MagicMock
+    ):
+        kavenegar_mock.side_effect = KavenegarRequestException()
+        with self.assertRaises(SMSBackendException):
+            KavenegarBackend().send_otp_code(MobileNumber("09123456789"), "12345")
+
+    @override_settings(SMS_BACKEND="locmem")
+    def test_locmem_backend(self):
+        result = SMSService.send_otp_code("09123456789", "23054")
+        self.assertEqual(result.response_code, 200)
+        results = SMSService.send_many(["09123456789", "09123456788"], "Hello")
+        self.assertTrue(all(result.is_sent for result in results))
+
+        self.assertEqual(
+            [(message.mobile_number, message.message) for message in outbox],
+            [
+                ("09123456789", "23054"),
+                ("09123456789", "Hello"),
+                ("09123456788", "Hello"),
+            ],
+        )
+        self.assertEqual(outbox[0].template, KavenegarTemplate.OTP_CODE.value)
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "outbox.jsonl"
+            with override_settings(SMS_BACKEND="file", SMS_FILE_PATH=str(path)):
+                SMSService.send_otp_code("09123456789", "23054")
+                async_to_sync(SMSService.async_send_otp_code)("09123456788", "23055")
+            messages = [json.loads(line) for line in path.read_text().splitlines()]
+        self.assertEqual(
+            [(message["mobile_number"], message["message"]) for message in messages],
+            [("09123456789", "23054"), ("09123456788", "23055")],
+        )
+
+    @override_settings(
+        SMS_BACKEND="file", SMS_FAKE_FAILURE_RATE=1, SMS_BREAKER_MINIMUM_CALLS=100
+    )
+    def test_file_backend_injected_failures(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(SMS_FILE_PATH=str(Path(directory) / "outbox.jsonl")):
+                with self.assertRaises(SMSServiceException):
+                    SMSService.send_otp_code("09123456789")
+                results = SMSService.send_many(["09123456789"], "Hello")
+        self.assertFalse(results[0].is_sent)
+        self.assertEqual(SMSService.get_breaker().get_metrics().failures, 2)
+
+
 if __name__ == "__main__":
     unittest.main()
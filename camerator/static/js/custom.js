@@ -1,6 +1,15 @@
 function changePage(page_number) {
     let current_url_params = new URLSearchParams(window.location.search);
     current_url_params.set("page", page_number);
+    current_url_params.delete("cursor");
     let new_url = window.location.pathname + "?" + current_url_params.toString();
     window.location.href = new_url;
-}
\ No newline at end of file
+}
+
+function changeCursor(cursor) {
+    let current_url_params = new URLSearchParams(window.location.search);
+    current_url_params.set("cursor", cursor);
+    current_url_params.delete("page");
+    let new_url = window.location.pathname + "?" + current_url_params.toString();
+    window.location.href = new_url;
+}
@@ -0,0 +1,99 @@
+"""
+Idempotency keys backed by redis. The first request of a key claims it and runs, requests with the same key that
+arrive while it runs wait for its response, and later ones get the stored response until the key expires.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from utils.redis import get_redis_connection, redis_key
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+PENDING = "pending"
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("A request with the same idempotency key is still in progress.")
+    default_code = "idempotency_conflict"
+
+
+class IdempotencyStore:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def get_key(self, scope: str, idempotency_key: str) -> str:
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return redis_key("idempotency", self.namespace, scope, digest)
+
+    def claim(self, key: str) -> bool:
+        return bool(
+            get_redis_connection().set(
+                key, PENDING, nx=True, ex=settings.IDEMPOTENCY_LOCK_TIMEOUT
+            )
+        )
+
+    def get(self, key: str) -> dict | str | None:
+        """The stored response, ``PENDING`` while the first request runs, or ``None`` if the key is free."""
+        value = get_redis_connection().get(key)
+        if value is None:
+            return None
+        if value.decode() == PENDING:
+            return PENDING
+        return json.loads(value)
+
+    def complete(self, key: str, response: dict, ttl: int) -> None:
+        get_redis_connection().set(key, json.dumps(response), ex=ttl)
+
+    def release(self, key: str) -> None:
+        get_redis_connection().delete(key)
+
+    def run(self, key: str, func: Callable[[], dict], ttl: int) -> dict:
+        """Return the response stored for the key, or run ``func`` once for everyone waiting on it."""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            if self.claim(key):
+                try:
+                    response = func()
+                except BaseException:
+                    # Failures aren't stored, the next request with the key tries again.
+                    self.release(key)
+                    raise
+                self.complete(key, response, ttl)
+                return response
+            stored = self.get(key)
+            if isinstance(stored, dict):
+                return stored
+            if time.monotonic() > deadline:
+                raise IdempotencyConflict()
+            if stored == PENDING:
+                time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+    async def arun(
+        self, key: str, func: Callable[[], Awaitable[dict]], ttl: int
+    ) -> dict:
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            if await sync_to_async(self.claim)(key):
+                try:
+                    response = await func()
+                except BaseException:
+                    await sync_to_async(self.release)(key)
+                    raise
+                await sync_to_async(self.complete)(key, response, ttl)
+                return response
+            stored = await sync_to_async(self.get)(key)
+            if isinstance(stored, dict):
+                return stored
+            if time.monotonic() > deadline:
+                raise IdempotencyConflict()
+            if stored == PENDING:
+                await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
@@ -1,7 +1,20 @@
+from functools import reduce
+from operator import or_
+from typing import TYPE_CHECKING
+
 from django.contrib import admin
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
 from django.utils.translation import gettext_lazy as _
 from jalali_date import datetime2jalali
 
+from utils.validators import normalize_digits
+
+if TYPE_CHECKING:
+    ModelAdminMixinBase = admin.ModelAdmin
+else:
+    ModelAdminMixinBase = object
+
 
 class AuthorableModelAdminMixin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
@@ -17,3 +30,85 @@ class TimestampableAdminMixin:
     @admin.display(description=_("Updated at"))
     def formatted_updated_at(self, obj):
         return datetime2jalali(obj.updated_at).strftime("%H:%M:%S _ %Y/%m/%d")
+
+
+class BatchDeletionAdminMixin(ModelAdminMixinBase):
+    """
+    Deletes objects through a ``DeletionJob``: they're marked for deletion right away and everything that cascades
+    from them is deleted in batches in the background, instead of in one transaction within the request.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        # The confirmation page shows counts by model rather than collecting every object that would be deleted.
+        from apps.user.deletion import count_cascade, get_cascade_plan
+
+        objs = list(objs)
+        model = self.model
+        counts = {
+            model._meta.label: len(objs),
+            **count_cascade(model, [obj.pk for obj in objs]),
+        }
+        models = {
+            model._meta.label: model,
+            **{related._meta.label: related for related, _ in get_cascade_plan(model)},
+        }
+        model_count = {
+            models[label]._meta.verbose_name_plural: count
+            for label, count in counts.items()
+            if count
+        }
+        perms_needed = {
+            related._meta.verbose_name
+            for related in models.values()
+            if not request.user.has_perm(
+                f"{related._meta.app_label}.delete_{related._meta.model_name}"
+            )
+        }
+        to_delete = [str(obj) for obj in objs]
+        return to_delete, model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        from apps.user.models import DeletionJob
+
+        DeletionJob.schedule(obj, requested_by=request.user)
+        self.message_user(
+            request,
+            _("%(object)s is being deleted in the background.") % {"object": obj},
+        )
+
+    def delete_queryset(self, request, queryset):
+        from apps.user.models import DeletionJob
+
+        for obj in queryset:
+            DeletionJob.schedule(obj, requested_by=request.user)
+        self.message_user(
+            request, _("The selected objects are being deleted in the background.")
+        )
+
+
+class PrefixSearchAdminMixin(ModelAdminMixinBase):
+    """
+    Digit-only search terms (mobiles, national codes) match ``prefix_search_fields`` by prefix, which the btree
+    ``varchar_pattern_ops`` indexes serve, and the other terms match ``search_fields`` with ``icontains``, which the
+    trigram indexes serve. Django's search would run every term through ``icontains`` on every field.
+    """
+
+    prefix_search_fields: tuple[str, ...] = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = []
+        for term in smart_split(search_term):
+            if term.startswith(('"', "'")) and term[0] == term[-1]:
+                term = unescape_string_literal(term)
+            terms.append(term)
+        for term in normalize_digits(terms):
+            if term.isdigit():
+                lookups = [
+                    f"{field}__startswith" for field in self.prefix_search_fields
+                ]
+            else:
+                lookups = [f"{field}__icontains" for field in self.search_fields]
+            queryset = queryset.filter(
+                reduce(or_, (Q(**{lookup: term}) for lookup in lookups))
+            )
+        return queryset, False
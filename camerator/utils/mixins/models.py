@@ -6,6 +6,8 @@ from django.db import models
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
+from utils.uuids import uuid7
+
 
 class SingletonMixin(models.Model):
     """An abstract base class that provides a Singleton pattern for models."""
@@ -41,6 +43,18 @@ class UUIDPrimaryKeyMixin(models.Model):
         abstract = True
 
 
+class TimeOrderedUUIDPrimaryKeyMixin(UUIDPrimaryKeyMixin):
+    """
+    Same uuid primary key, filled with time-ordered UUIDv7 values. New rows land on the last page of the primary key
+    index instead of a random one, which keeps the index compact and its hot pages in memory on insert heavy tables.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+
+    class Meta:
+        abstract = True
+
+
 class Timestampable(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("تاریخ"))
     updated_at = models.DateTimeField(
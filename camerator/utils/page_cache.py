@@ -0,0 +1,148 @@
+"""
+Rendered pages cached in redis. A page is cached per view, path, query parameters, language and whether the visitor
+is logged in, along with the generations of the models it's rendered from. Saving or deleting one of those models
+bumps its generation, which outdates every page rendered from it without looking them up.
+
+An outdated or missing page is rendered by one request at a time: the others serve the outdated page meanwhile, or
+wait for the render if there's none. CSRF tokens are per visitor, pages are cached with a placeholder in their place.
+"""
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Callable, Sequence
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import models, transaction
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.translation import get_language
+from redis import RedisError
+
+from utils.redis import get_redis_connection, redis_key
+
+logger = logging.getLogger(__name__)
+
+CSRF_TOKEN_PLACEHOLDER = "__page_cache_csrf_token__"
+# Value of the X-Page-Cache header, for debugging.
+HIT, STALE, MISS = "hit", "stale", "miss"
+
+
+class PageCache:
+    @staticmethod
+    def generation_key(model: type[models.Model]) -> str:
+        return redis_key("page", "generation", model._meta.label_lower)
+
+    @staticmethod
+    def get_key(request: HttpRequest) -> str:
+        data = [
+            request.path,
+            sorted(request.GET.lists()),
+            get_language(),
+            request.user.is_authenticated,
+        ]
+        digest = hashlib.sha256(json.dumps(data).encode()).hexdigest()
+        # Outside of the URL resolver, e.g. from a middleware or a RequestFactory request, there's no view name.
+        match = request.resolver_match
+        return redis_key("page", match.view_name if match else request.path, digest)
+
+    @staticmethod
+    def is_cacheable(request: HttpRequest) -> bool:
+        # Pages that show flash messages are rendered for the visitor who has them.
+        return (
+            settings.PAGE_CACHE_TIMEOUT > 0
+            and request.method in ("GET", "HEAD")
+            and not len(messages.get_messages(request))
+        )
+
+    def invalidate(self, model: type[models.Model]) -> None:
+        """Outdate the pages rendered from ``model`` once the current transaction commits."""
+        key = self.generation_key(model)
+
+        def bump():
+            try:
+                get_redis_connection().incr(key)
+            except RedisError:
+                logger.exception("Page cache generation %s can't be bumped.", key)
+
+        transaction.on_commit(bump)
+
+    def invalidate_sender(self, sender: type[models.Model], **kwargs) -> None:
+        """Receiver of ``post_save`` and ``post_delete``."""
+        self.invalidate(sender)
+
+    def invalidate_relation(
+        self, sender, instance, action: str, model: type[models.Model], **kwargs
+    ) -> None:
+        """Receiver of ``m2m_changed``, both sides of the relation are outdated."""
+        if action.startswith("post_"):
+            self.invalidate(type(instance))
+            self.invalidate(model)
+
+    def fetch(
+        self,
+        request: HttpRequest,
+        dependencies: Sequence[type[models.Model]],
+        render: Callable[[], HttpResponse],
+    ) -> HttpResponse:
+        """The cached page of the request if it's up to date, otherwise ``render`` is called once for everyone."""
+        try:
+            return self._fetch(request, dependencies, render)
+        except RedisError:
+            logger.exception("Page cache of %s can't be read from redis.", request.path)
+            return self.to_response(request, render())
+
+    def _fetch(self, request, dependencies, render) -> HttpResponse:
+        redis = get_redis_connection()
+        key = self.get_key(request)
+        lock_key = f"{key}:lock"
+        generation_keys = [self.generation_key(model) for model in dependencies]
+        deadline = time.monotonic() + settings.PAGE_CACHE_WAIT_TIMEOUT
+        while True:
+            *generations, entry = redis.mget(*generation_keys, key)
+            # Read before the render, a page is outdated if its models change while it's rendered.
+            generations = [int(generation or 0) for generation in generations]
+            entry = json.loads(entry) if entry is not None else None
+            if entry is not None and entry["generations"] == generations:
+                return self.to_response(request, entry, HIT)
+            if redis.set(lock_key, 1, nx=True, ex=settings.PAGE_CACHE_LOCK_TIMEOUT):
+                try:
+                    response = render()
+                    if response.status_code != 200:
+                        return self.to_response(request, response)
+                    entry = {
+                        "generations": generations,
+                        "status": response.status_code,
+                        "content_type": response["Content-Type"],
+                        "content": response.content.decode(response.charset),
+                    }
+                    redis.set(key, json.dumps(entry), ex=settings.PAGE_CACHE_TIMEOUT)
+                finally:
+                    redis.delete(lock_key)
+                return self.to_response(request, entry, MISS)
+            if entry is not None:
+                return self.to_response(request, entry, STALE)
+            if time.monotonic() > deadline:
+                return self.to_response(request, render())
+            time.sleep(settings.PAGE_CACHE_POLL_INTERVAL)
+
+    @staticmethod
+    def to_response(
+        request: HttpRequest, entry: dict | HttpResponse, status: str = MISS
+    ) -> HttpResponse:
+        if isinstance(entry, HttpResponse):
+            response, content = entry, entry.content.decode(entry.charset)
+        else:
+            response = HttpResponse(
+                status=entry["status"], content_type=entry["content_type"]
+            )
+            content = entry["content"]
+        if CSRF_TOKEN_PLACEHOLDER in content:
+            content = content.replace(CSRF_TOKEN_PLACEHOLDER, get_token(request))
+        response.content = content
+        response["X-Page-Cache"] = status
+        return response
+
+
+page_cache = PageCache()
@@ -0,0 +1,123 @@
+"""
+Keyset pagination. A page is read from a cursor holding the ordering values of the row it starts after instead of an
+offset, so it's found through the index of the ordering however deep it is, and pages don't count the rows. Cursors
+are opaque to clients, they're the ordering values and the direction encoded as URL-safe base64.
+"""
+import base64
+import binascii
+import json
+import operator
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import reduce
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage(Sequence):
+    """A page with the interface of Django's ``Page`` that templates use, with cursors instead of page numbers."""
+
+    object_list: list
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pages of ``queryset`` in ``ordering``, whose last field has to be unique, e.g. ``("-created_date", "id")``. The
+    first field should lead an index in the same directions for deep pages to cost as much as the first one. The
+    cursors are read from the rows, so the ordering fields shouldn't be deferred.
+    """
+
+    def __init__(
+        self, queryset: models.QuerySet, ordering: Sequence[str], per_page: int
+    ):
+        self.queryset = queryset
+        self.ordering = [
+            (name.removeprefix("-"), name.startswith("-")) for name in ordering
+        ]
+        self.per_page = per_page
+
+    def page(self, cursor: str | None = None) -> KeysetPage:
+        forward, values = True, None
+        if cursor:
+            forward, values = self.decode_cursor(cursor)
+        queryset = self.queryset.order_by(
+            *(
+                f"-{name}" if descending == forward else name
+                for name, descending in self.ordering
+            )
+        )
+        if values is not None:
+            queryset = queryset.filter(self.after(values, forward))
+        # One more row than the page tells whether there's another page in this direction, without counting.
+        rows = list(queryset[: self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows)
+        # A cursor's row is on the page it came from, so there's always a page back the way it came.
+        has_next = more if forward else True
+        has_previous = values is not None if forward else more
+        return KeysetPage(
+            rows,
+            self.encode_cursor(rows[-1], True) if has_next else None,
+            self.encode_cursor(rows[0], False) if has_previous else None,
+        )
+
+    def after(self, values: list, forward: bool) -> Q:
+        """Rows past ``values`` in the direction of the page."""
+        conditions: list[Q] = []
+        equal: dict[str, Any] = {}
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = "lt" if descending == forward else "gt"
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": value}))
+            equal[name] = value
+        # Redundant, but Postgres only starts an index scan at the cursor from a bound on the leading column.
+        name, descending = self.ordering[0]
+        lookup = "lte" if descending == forward else "gte"
+        return Q(**{f"{name}__{lookup}": values[0]}) & reduce(operator.or_, conditions)
+
+    def encode_cursor(self, obj: models.Model, forward: bool) -> str:
+        values = [getattr(obj, name) for name, _ in self.ordering]
+        data = json.dumps({"v": values, "f": forward}, default=str)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> tuple[bool, list]:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            forward, values = bool(data["f"]), data["v"]
+            # A null would match no row through the lookups, ordering fields aren't nullable.
+            if len(values) != len(self.ordering) or None in values:
+                raise ValueError
+            return forward, [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError) as e:
+            raise InvalidCursor(f"{cursor!r} is not a valid cursor.") from e
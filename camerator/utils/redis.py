@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from django.conf import settings
+from redis import Redis
+
+
+def get_redis_connection() -> Redis:
+    """Shared client of ``REDIS_URL``. redis-py resets its connection pool after a fork, so it's safe in workers."""
+    return _connect(settings.REDIS_URL)
+
+
+def redis_key(*parts: object) -> str:
+    return settings.REDIS_KEY_PREFIX + ":".join(str(part) for part in parts)
+
+
+@lru_cache(maxsize=None)
+def _connect(url: str) -> Redis:
+    return Redis.from_url(url)
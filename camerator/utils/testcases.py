@@ -1,13 +1,59 @@
+import unittest
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
 from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from apps.user.models import User
 from apps.user.tests.factories import UserFactory
+from utils.redis import get_redis_connection
+
+if TYPE_CHECKING:
+    TestCaseMixinBase = unittest.TestCase
+else:
+    TestCaseMixinBase = object
+
+
+class RedisTestCaseMixin(TestCaseMixinBase):
+    """Gives every test its own ``REDIS_KEY_PREFIX`` and deletes the keys it wrote."""
+
+    def setUp(self):
+        prefix = f"test:{uuid.uuid4().hex}:"
+        override = override_settings(REDIS_KEY_PREFIX=prefix)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(self.delete_redis_keys, prefix)
+        super().setUp()
+
+    @staticmethod
+    def delete_redis_keys(prefix: str) -> None:
+        redis = get_redis_connection()
+        keys = list(redis.scan_iter(f"{prefix}*"))
+        if keys:
+            redis.delete(*keys)
+
+
+class QueryCountTestCaseMixin(TestCaseMixinBase):
+    @contextmanager
+    def assertNumStatements(self, num: int):
+        """``assertNumQueries`` without the savepoints of ATOMIC_REQUESTS, only statements that reach a table count."""
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        statements = [
+            query["sql"] for query in queries if "SAVEPOINT" not in query["sql"].upper()
+        ]
+        self.assertEqual(len(statements), num, "\n".join(statements))
 
 
-class AppAPITestCase(APITestCase):
+class AppAPITestCase(RedisTestCaseMixin, APITestCase):
     def setUp(self):
+        super().setUp()
         self.faker = Faker()
         self.customer: User = UserFactory()
         token = RefreshToken().for_user(self.customer)
@@ -18,7 +64,7 @@ class AppAPITestCase(APITestCase):
 class DashboardAPITestCase(APITransactionTestCase):
     def setUp(self):
         self.faker = Faker()
-        self.admin: User = UserFactory(is_superuser=True)
+        self.admin: User = UserFactory(is_superuser=True, is_staff=True)
         token = RefreshToken().for_user(self.admin)
         self.client = APIClient()
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
@@ -0,0 +1,62 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+from utils.redis import get_redis_connection, redis_key
+
+# Sliding window counter: the count of the previous fixed window is weighted by how much of it still overlaps the
+# sliding window, so every check costs two GETs and an INCR no matter how many requests were made. The clock is the
+# one of redis, which keeps all workers and nodes on the same windows.
+# KEYS: key of the counters (the window index is appended). ARGV: allowed requests, window in seconds.
+# Returns 0 when the request is allowed, or the seconds to wait.
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local index = math.floor(now / window)
+local current_key = KEYS[1] .. ":" .. index
+local current = tonumber(redis.call("get", current_key) or "0")
+local previous = tonumber(redis.call("get", KEYS[1] .. ":" .. (index - 1)) or "0")
+local elapsed = now - index * window
+if previous * (window - elapsed) / window + current >= limit then
+    return math.max(1, math.ceil(window - elapsed))
+end
+redis.call("incr", current_key)
+redis.call("expire", current_key, window * 2)
+return 0
+"""
+
+
+class RedisSlidingWindowThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` that counts requests in redis with an atomic sliding window, instead of keeping the
+    timestamps of every request in the cache.
+    """
+
+    # Parsed from the rate by ``SimpleRateThrottle.__init__``.
+    num_requests: int
+    duration: int
+
+    def get_cache_key(self, request, view) -> str | None:
+        ident = self.get_throttle_ident(request, view)
+        if ident is None:
+            return None
+        return redis_key("throttle", self.scope, ident)
+
+    def get_throttle_ident(self, request, view) -> str | None:
+        raise NotImplementedError(".get_throttle_ident() must be overridden")
+
+    def allow_request(self, request, view) -> bool:
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.wait_seconds = get_redis_connection().eval(
+            SLIDING_WINDOW_SCRIPT, 1, self.key, self.num_requests, self.duration
+        )
+        return self.wait_seconds == 0
+
+    def wait(self) -> float | None:
+        return getattr(self, "wait_seconds", None)
@@ -0,0 +1,18 @@
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (version 7 of RFC 9562): the unix time in milliseconds in the first 48 bits, followed by the
+    version, 74 random bits and the variant. Values created later sort after earlier ones, within a millisecond
+    their order is random.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(
+        os.urandom(10), "big"
+    )
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
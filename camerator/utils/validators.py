@@ -1,3 +1,7 @@
+import re
+from collections.abc import Iterable
+from operator import mul
+
 from django.core import validators
 from django.utils.deconstruct import deconstructible
 
@@ -7,3 +11,45 @@ class MobileValidator(validators.RegexValidator):
     regex = r"^09\d{9}$"
     message = "شماره موبایل باید به فرمت 09123456789 وارد شود"
     flags = 0
+
+
+# The pattern of MobileValidator, which only compiles it lazily on its instances.
+MOBILE_RE = re.compile(MobileValidator.regex, MobileValidator.flags)
+
+# Persian and Arabic-Indic digits, as typed on Persian keyboards and exported by spreadsheets.
+DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+NATIONAL_CODE_RE = re.compile(r"(?!(\d)\1{9})\d{10}", re.ASCII)
+NATIONAL_CODE_WEIGHTS = bytes(range(10, 1, -1))
+# The digits are weighted as their ASCII codes, this takes the codes of the zeros back out of the sum.
+NATIONAL_CODE_OFFSET = ord("0") * sum(NATIONAL_CODE_WEIGHTS)
+
+
+def normalize_digits(values: Iterable[str]) -> list[str]:
+    """Strip the values and write their digits as ASCII ones."""
+    return [value.strip().translate(DIGITS) for value in values]
+
+
+def validate_mobiles(mobiles: Iterable[str]) -> list[bool]:
+    """Check a batch of mobiles against ``MobileValidator`` without raising a ``ValidationError`` for each of them."""
+    search = MOBILE_RE.search
+    return [search(mobile) is not None for mobile in mobiles]
+
+
+def validate_national_codes(codes: Iterable[str]) -> list[bool]:
+    """
+    Check a batch of national codes: ten digits, not all the same, and the last one matching the checksum of the
+    others (the sum of the digits weighted 10 to 2, modulo 11).
+    """
+    valid = []
+    for code in codes:
+        if NATIONAL_CODE_RE.fullmatch(code) is None:
+            valid.append(False)
+            continue
+        digits = code.encode()
+        remainder = (
+            sum(map(mul, digits[:9], NATIONAL_CODE_WEIGHTS)) - NATIONAL_CODE_OFFSET
+        ) % 11
+        valid.append(
+            digits[9] - ord("0") == (remainder if remainder < 2 else 11 - remainder)
+        )
+    return valid